@@ -6,20 +6,21 @@ including container discovery, agent deployment, and cluster monitoring.
 """
 
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 import asyncio
 import httpx
 import docker
 
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Query
 from pydantic import BaseModel, Field
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import json
 
 from ..dependencies import get_current_user, get_redis
 from ..core.orchestration.container_discovery import container_discovery_service
 from ..core.orchestration.container_registry import container_registry, ContainerRegistration
+from ..core.orchestration.heartbeat_history import heartbeat_history
 from ..core.agents.distributed_agent_manager import (
     distributed_agent_manager,
     AgentDeploymentRequest,
@@ -27,7 +28,13 @@ from ..core.agents.distributed_agent_manager import (
     AgentDeploymentStrategy,
 )
 from ..infrastructure.messaging.container_hub import container_hub
-from ..db_models import get_db, register_cluster, update_heartbeat, get_active_clusters, mark_cluster_inactive
+from ..db_async import (
+    get_async_db,
+    register_cluster,
+    update_heartbeat,
+    get_active_clusters,
+    mark_cluster_inactive,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -232,6 +239,52 @@ async def get_all_containers(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/containers/query")
+async def query_containers(
+    status: Optional[str] = "active",
+    capability: Optional[List[str]] = Query(None),
+    host: Optional[str] = None,
+    min_health: Optional[float] = None,
+    max_health: Optional[float] = None,
+    min_free_memory: Optional[float] = None,
+    heartbeat_within: Optional[int] = Query(
+        None, description="Only containers with a heartbeat in the last N seconds"
+    ),
+    sort_by: Optional[str] = Query(
+        None, description="health_score, last_heartbeat or free_memory"
+    ),
+    descending: bool = True,
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[List[str]] = Query(None),
+    user: dict = Depends(get_current_user),
+    redis=Depends(get_redis),
+) -> List[Dict[str, Any]]:
+    """Query containers through the registry's secondary indexes"""
+    try:
+        heartbeat_since = None
+        if heartbeat_within:
+            heartbeat_since = datetime.utcnow() - timedelta(seconds=heartbeat_within)
+        return await container_registry.query_containers(
+            status=status,
+            capabilities=capability or [],
+            host=host,
+            min_health=min_health,
+            max_health=max_health,
+            min_free_memory=min_free_memory,
+            heartbeat_since=heartbeat_since,
+            sort_by=sort_by,
+            descending=descending,
+            limit=limit,
+            fields=fields,
+        )
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error querying containers: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/containers/{container_id}")
 async def get_container_details(
     container_id: str, user: dict = Depends(get_current_user), redis=Depends(get_redis)
@@ -260,7 +313,7 @@ async def register_container(
     request: ContainerRegistrationRequest,
     user: dict = Depends(get_current_user),
     redis=Depends(get_redis),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Dict[str, Any]:
     """Register a new container with the cluster"""
     try:
@@ -307,7 +360,7 @@ async def register_container(
             await container_discovery_service.register_container_manually(container_info)
             
             # Register in database
-            db_cluster = register_cluster(
+            db_cluster = await register_cluster(
                 db,
                 container_id=container_id,
                 cluster_name=request.container_name,
@@ -342,7 +395,7 @@ async def container_heartbeat(
     request: ContainerHeartbeatRequest,
     user: dict = Depends(get_current_user),
     redis=Depends(get_redis),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Dict[str, str]:
     """Update container heartbeat"""
     try:
@@ -356,15 +409,17 @@ async def container_heartbeat(
         )
 
         if success:
-            # Update heartbeat in database
-            db_success = update_heartbeat(
-                db,
-                container_id=container_id,
+            # History is buffered and written in batches by heartbeat_history
+            heartbeat_history.record(
+                container_id,
                 health_score=request.health_score,
                 active_agents=request.active_agents,
-                resources=json.dumps(request.resources) if request.resources else None
+                resources=json.dumps(request.resources) if request.resources else None,
             )
             
+            # Update heartbeat in database
+            db_success = await update_heartbeat(db, container_id=container_id)
+            
             if db_success:
                 logger.debug(f"Updated heartbeat for {container_id} in database")
             
@@ -379,6 +434,30 @@ async def container_heartbeat(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/containers/{container_id}/heartbeats")
+async def get_container_heartbeats(
+    container_id: str,
+    hours: float = Query(1, gt=0, le=24 * 90, description="How far back to look"),
+    resolution: str = Query("auto", description="auto, raw, 1m or 1h"),
+    limit: int = Query(2000, ge=1, le=10000),
+    user: dict = Depends(get_current_user),
+) -> Dict[str, Any]:
+    """Heartbeat history for charts, served from the coarsest tier that covers the range"""
+    try:
+        return await heartbeat_history.query(
+            container_id,
+            since=datetime.utcnow() - timedelta(hours=hours),
+            resolution=resolution,
+            limit=limit,
+        )
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting heartbeat history: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.delete("/containers/{container_id}")
 async def deregister_container(
     container_id: str, user: dict = Depends(get_current_user), redis=Depends(get_redis)
@@ -592,7 +671,7 @@ async def perform_cluster_action(
 
         elif request.action == "health_check":
             # Perform cluster-wide health check
-            containers = await container_registry.get_all_containers()
+            containers = await container_registry.get_all_containers(fields=["status"])
             health_status = {
                 "healthy": len([c for c in containers if c.get("status") == "active"]),
                 "unhealthy": len([c for c in containers if c.get("status") != "active"]),
@@ -688,7 +767,9 @@ async def get_cluster_distribution(
 ) -> Dict[str, Any]:
     """Get agent distribution across the cluster"""
     try:
-        containers = await container_registry.get_all_containers()
+        containers = await container_registry.get_all_containers(
+            fields=["container_name", "health_score", "resources"]
+        )
         deployments = await distributed_agent_manager.get_all_deployments()
 
         # Calculate distribution
@@ -12,7 +12,7 @@ from datetime import datetime
 import asyncio
 
 from ..dependencies import get_current_user, security
-import httpx
+from ..infrastructure.network.http_pool import http_pool
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
@@ -800,124 +800,124 @@ async def dashboard_data(
         headers = {"Authorization": f"Bearer {authorization.credentials}"}
         
         # Make internal API calls to get trading data
-        async with httpx.AsyncClient() as client:
-            try:
-                # Get trading status
-                trading_response = await client.get("http://localhost:8000/api/v1/trading/status", headers=headers, timeout=5.0)
-                if trading_response.status_code == 200:
-                    trading_data = trading_response.json()
-                elif trading_response.status_code == 429:
-                    # Rate limited - use default stopped state
-                    trading_data = {
-                        "is_running": False,
-                        "overall_health": "rate_limited",
-                        "last_check": datetime.now().isoformat(),
-                        "portfolio_value": 0,
-                        "total_trades": 0,
-                        "message": "Rate limited - trading temporarily restricted"
-                    }
-                else:
-                    trading_data = {"is_running": False, "overall_health": "error"}
-                
-                # Get portfolio data
-                portfolio_response = await client.get("http://localhost:8000/api/v1/trading/portfolio", headers=headers, timeout=5.0)  
-                if portfolio_response.status_code == 200:
-                    portfolio_data = portfolio_response.json()
-                
-                # Get cluster data
-                cluster_response = await client.get("http://localhost:8000/api/v1/cluster/status", headers=headers, timeout=5.0)
-                if cluster_response.status_code == 200:
-                    cluster_data = cluster_response.json()
-                else:
-                    cluster_data = {"error": "Cluster API unavailable"}
-                
-                if portfolio_response.status_code == 429:
-                    # Rate limited - show basic portfolio structure
-                    portfolio_data = {
-                        "portfolio_id": "system-portfolio",
-                        "initial_capital": 1000,
-                        "current_value": 1000,
-                        "available_cash": 1000,
-                        "positions": {},
-                        "performance": {
-                            "total_return": 0,
-                            "total_return_pct": 0,
-                            "daily_pnl": 0,
-                            "total_trades": 0
-                        },
-                        "is_trading": False,
-                        "last_updated": datetime.now().isoformat(),
-                        "status": "rate_limited"
-                    }
-                else:
-                    portfolio_data = {"error": "Portfolio API unavailable"}
-                
-                # Extract nested data from API responses
-                trading_info = trading_data.get("data", {}) if trading_data.get("status") == "success" else {}
-                portfolio_info = portfolio_data.get("data", {}) if portfolio_data.get("status") == "success" else portfolio_data
-                
-                dashboard_data = {
-                    "timestamp": datetime.now().isoformat(),
-                    "status": "success",
-                    "portfolio": {
-                        "portfolio_id": portfolio_info.get("portfolio_id"),
-                        "initial_capital": portfolio_info.get("initial_capital", 1000),
-                        "current_value": portfolio_info.get("current_value", 0),
-                        "available_cash": portfolio_info.get("available_cash", 0),
-                        "positions": portfolio_info.get("positions", {}),
-                        "total_return": portfolio_info.get("performance", {}).get("total_return", 0),
-                        "total_return_pct": portfolio_info.get("performance", {}).get("total_return_pct", 0),
-                        "daily_pnl": portfolio_info.get("performance", {}).get("daily_pnl", 0),
-                        "total_trades": portfolio_info.get("performance", {}).get("total_trades", 0),
-                        "is_trading": portfolio_info.get("is_trading", False),
-                        "last_updated": portfolio_info.get("last_updated")
-                    },
-                    "trading_status": {
-                        "is_running": trading_info.get("is_running", False),
-                        "overall_health": trading_info.get("overall_health", "unknown"),
-                        "last_check": trading_info.get("last_check"),
-                        "portfolio_value": trading_info.get("portfolio_value", 0),
-                        "total_trades": trading_info.get("total_trades", 0)
-                    },
-                    "clusters": cluster_data
+        client = http_pool.client("http://localhost:8000")
+        try:
+            # Get trading status
+            trading_response = await client.get("http://localhost:8000/api/v1/trading/status", headers=headers, timeout=5.0)
+            if trading_response.status_code == 200:
+                trading_data = trading_response.json()
+            elif trading_response.status_code == 429:
+                # Rate limited - use default stopped state
+                trading_data = {
+                    "is_running": False,
+                    "overall_health": "rate_limited",
+                    "last_check": datetime.now().isoformat(),
+                    "portfolio_value": 0,
+                    "total_trades": 0,
+                    "message": "Rate limited - trading temporarily restricted"
                 }
-                
-                return dashboard_data
-                
-            except Exception as api_error:
-                # Handle API errors gracefully (including rate limits)
-                error_message = str(api_error)
-                
-                # Check if it's a rate limit error
-                if "429" in error_message or "rate limit" in error_message.lower():
-                    error_type = "rate_limited"
-                else:
-                    error_type = "api_error"
-                
-                # Return error state but still show what we can
-                return {
-                    "timestamp": datetime.now().isoformat(),
-                    "status": "error", 
-                    "error": error_message,
-                    "error_type": error_type,
-                    "portfolio": {
-                        "initial_capital": 1000.0,
-                        "current_value": 0,
-                        "available_cash": 0,
-                        "positions": {},
+            else:
+                trading_data = {"is_running": False, "overall_health": "error"}
+            
+            # Get portfolio data
+            portfolio_response = await client.get("http://localhost:8000/api/v1/trading/portfolio", headers=headers, timeout=5.0)  
+            if portfolio_response.status_code == 200:
+                portfolio_data = portfolio_response.json()
+            
+            # Get cluster data
+            cluster_response = await client.get("http://localhost:8000/api/v1/cluster/status", headers=headers, timeout=5.0)
+            if cluster_response.status_code == 200:
+                cluster_data = cluster_response.json()
+            else:
+                cluster_data = {"error": "Cluster API unavailable"}
+            
+            if portfolio_response.status_code == 429:
+                # Rate limited - show basic portfolio structure
+                portfolio_data = {
+                    "portfolio_id": "system-portfolio",
+                    "initial_capital": 1000,
+                    "current_value": 1000,
+                    "available_cash": 1000,
+                    "positions": {},
+                    "performance": {
                         "total_return": 0,
                         "total_return_pct": 0,
                         "daily_pnl": 0,
-                        "total_trades": 0,
-                        "is_trading": False
+                        "total_trades": 0
                     },
-                    "trading_status": {
-                        "is_running": False,
-                        "overall_health": "error",
-                        "last_check": datetime.now().isoformat()
-                    }
+                    "is_trading": False,
+                    "last_updated": datetime.now().isoformat(),
+                    "status": "rate_limited"
                 }
-                
+            else:
+                portfolio_data = {"error": "Portfolio API unavailable"}
+            
+            # Extract nested data from API responses
+            trading_info = trading_data.get("data", {}) if trading_data.get("status") == "success" else {}
+            portfolio_info = portfolio_data.get("data", {}) if portfolio_data.get("status") == "success" else portfolio_data
+            
+            dashboard_data = {
+                "timestamp": datetime.now().isoformat(),
+                "status": "success",
+                "portfolio": {
+                    "portfolio_id": portfolio_info.get("portfolio_id"),
+                    "initial_capital": portfolio_info.get("initial_capital", 1000),
+                    "current_value": portfolio_info.get("current_value", 0),
+                    "available_cash": portfolio_info.get("available_cash", 0),
+                    "positions": portfolio_info.get("positions", {}),
+                    "total_return": portfolio_info.get("performance", {}).get("total_return", 0),
+                    "total_return_pct": portfolio_info.get("performance", {}).get("total_return_pct", 0),
+                    "daily_pnl": portfolio_info.get("performance", {}).get("daily_pnl", 0),
+                    "total_trades": portfolio_info.get("performance", {}).get("total_trades", 0),
+                    "is_trading": portfolio_info.get("is_trading", False),
+                    "last_updated": portfolio_info.get("last_updated")
+                },
+                "trading_status": {
+                    "is_running": trading_info.get("is_running", False),
+                    "overall_health": trading_info.get("overall_health", "unknown"),
+                    "last_check": trading_info.get("last_check"),
+                    "portfolio_value": trading_info.get("portfolio_value", 0),
+                    "total_trades": trading_info.get("total_trades", 0)
+                },
+                "clusters": cluster_data
+            }
+            
+            return dashboard_data
+            
+        except Exception as api_error:
+            # Handle API errors gracefully (including rate limits)
+            error_message = str(api_error)
+            
+            # Check if it's a rate limit error
+            if "429" in error_message or "rate limit" in error_message.lower():
+                error_type = "rate_limited"
+            else:
+                error_type = "api_error"
+            
+            # Return error state but still show what we can
+            return {
+                "timestamp": datetime.now().isoformat(),
+                "status": "error", 
+                "error": error_message,
+                "error_type": error_type,
+                "portfolio": {
+                    "initial_capital": 1000.0,
+                    "current_value": 0,
+                    "available_cash": 0,
+                    "positions": {},
+                    "total_return": 0,
+                    "total_return_pct": 0,
+                    "daily_pnl": 0,
+                    "total_trades": 0,
+                    "is_trading": False
+                },
+                "trading_status": {
+                    "is_running": False,
+                    "overall_health": "error",
+                    "last_check": datetime.now().isoformat()
+                }
+            }
+            
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Dashboard data error: {str(e)}")
 
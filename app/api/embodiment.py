@@ -3,7 +3,6 @@ from __future__ import annotations
 from typing import Any, Dict, List, Optional
 from datetime import datetime
 import logging
-import httpx
 
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel, Field
@@ -12,6 +11,7 @@ from ..dependencies import get_current_user
 from ..core.embodiment.registry import EmbodiedAgent, embodiment_registry
 from ..core.embodiment.command_bus import EmbodimentCommand, command_bus
 from ..core.embodiment.autonomy import autonomy_controller
+from ..core.embodiment.health_probe import endpoint_health_prober
 
 logger = logging.getLogger(__name__)
 
@@ -43,21 +43,58 @@ async def register_agent(req: RegisterAgentRequest, user: dict = Depends(get_cur
     return {"success": True, "agent_id": req.agent_id}
 
 
+class HeartbeatRequest(BaseModel):
+    agent_id: str
+    status: str = "online"
+    metadata: Dict[str, Any] = {}
+
+
+class BatchHeartbeatRequest(BaseModel):
+    heartbeats: List[HeartbeatRequest]
+
+
+@router.post("/agents/heartbeat")
+async def agent_heartbeat(
+    req: HeartbeatRequest,
+    user: dict = Depends(get_current_user),
+) -> Dict[str, Any]:
+    ok = await embodiment_registry.heartbeat(req.agent_id, req.status, req.metadata)
+    if not ok:
+        raise HTTPException(status_code=404, detail=f"Agent {req.agent_id} is not registered")
+    return {"success": True, "agent_id": req.agent_id}
+
+
+@router.post("/agents/heartbeat/batch")
+async def batch_heartbeat(
+    req: BatchHeartbeatRequest,
+    user: dict = Depends(get_current_user),
+) -> Dict[str, Any]:
+    """Report heartbeats for many agents (e.g. everything behind one orchestrator) at once"""
+    results = await embodiment_registry.heartbeat_many([hb.dict() for hb in req.heartbeats])
+    unknown = [agent_id for agent_id, ok in results.items() if not ok]
+    return {"success": not unknown, "updated": len(results) - len(unknown), "unknown": unknown}
+
+
 @router.get("/agents")
 async def list_agents(user: dict = Depends(get_current_user)) -> List[Dict[str, Any]]:
     return await embodiment_registry.list_agents()
 
 
+NEUROSYNC_CURRENT_CHARACTER_URL = "http://localhost:5001/character/current"
+
+
 async def check_orchestrator_health(endpoint: str) -> bool:
-    """Check if an orchestrator endpoint is reachable"""
+    """Check if an orchestrator endpoint is reachable (served from the probe cache)"""
     if not endpoint:
         return False
-    try:
-        async with httpx.AsyncClient(timeout=2.0) as client:
-            response = await client.get(f"{endpoint}/health")
-            return response.status_code == 200
-    except:
-        return False
+    result = await endpoint_health_prober.get(f"{endpoint}/health")
+    return result.ok
+
+
+@router.get("/health/probes")
+async def get_probe_state(user: dict = Depends(get_current_user)) -> List[Dict[str, Any]]:
+    """Cached endpoint health as seen by the background prober"""
+    return endpoint_health_prober.snapshot()
 
 
 @router.get("/agents/categorized")
@@ -76,6 +113,7 @@ async def get_categorized_agents(user: dict = Depends(get_current_user)) -> Dict
     orchestrators = []
     agents = []
     infrastructure = []
+    orchestrator_health_urls = []
     
     for entity in all_entities:
         entity_id = entity.get("agent_id", "")
@@ -85,23 +123,23 @@ async def get_categorized_agents(user: dict = Depends(get_current_user)) -> Dict
         if entity_id in infrastructure_ids or entity_type in ["streaming_server", "message_broker", "avatar_controller", "cognitive_engine"]:
             infrastructure.append(entity)
         elif "orchestrator" in entity_id.lower() or entity_type == "orchestrator" or entity_id.startswith("orch:"):
-            # Check if orchestrator is active
-            entity["is_active"] = await check_orchestrator_health(entity.get("endpoint", ""))
+            endpoint = entity.get("endpoint", "")
+            orchestrator_health_urls.append(f"{endpoint}/health" if endpoint else "")
             orchestrators.append(entity)
         else:
             # This is an actual agent (character)
             agents.append(entity)
     
+    # Check which orchestrators are active; cached results return immediately
+    health = await endpoint_health_prober.get_many(url for url in orchestrator_health_urls if url)
+    for orchestrator, url in zip(orchestrators, orchestrator_health_urls):
+        orchestrator["is_active"] = bool(url) and health[url].ok
+    
     # Get active character from NeuroSync
     active_agent_id = None
-    try:
-        async with httpx.AsyncClient(timeout=2.0) as client:
-            response = await client.get("http://localhost:5001/character/current")
-            if response.status_code == 200:
-                data = response.json()
-                active_agent_id = data.get("current_character", {}).get("id")
-    except:
-        pass
+    character = await endpoint_health_prober.get(NEUROSYNC_CURRENT_CHARACTER_URL, parse_json=True)
+    if character.ok and isinstance(character.data, dict):
+        active_agent_id = (character.data.get("current_character") or {}).get("id")
     
     # Mark active agent
     for agent in agents:
@@ -131,6 +169,8 @@ class CommandRequest(BaseModel):
     priority: int = 5
     timeout_ms: int = 5000
     correlation_id: Optional[str] = None
+    wait: bool = Field(False, description="Block until the agent acknowledges and return its result")
+    coalesce: bool = Field(False, description="Drop this command if a newer one with the same action is queued")
 
 
 @router.post("/agents/{agent_id}/commands")
@@ -142,11 +182,29 @@ async def send_command(agent_id: str, req: CommandRequest, user: dict = Depends(
         priority=req.priority,
         timeout_ms=req.timeout_ms,
         correlation_id=req.correlation_id or "",
+        coalesce=req.coalesce,
     )
+    if req.wait:
+        result = await command_bus.submit_and_wait(cmd)
+        return {"queued": True, "correlation_id": cmd.correlation_id, "result": result}
     cid = await command_bus.enqueue(cmd)
     return {"queued": True, "correlation_id": cid}
 
 
+@router.get("/agents/{agent_id}/queue")
+async def get_agent_queue(agent_id: str, user: dict = Depends(get_current_user)) -> Dict[str, Any]:
+    """Undelivered command count and drop counters for one agent"""
+    return await command_bus.agent_queue_stats(agent_id)
+
+
+@router.get("/commands/{correlation_id}/result")
+async def get_command_result(correlation_id: str, user: dict = Depends(get_current_user)) -> Dict[str, Any]:
+    result = await command_bus.get_result(correlation_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Result not available (pending or expired)")
+    return result
+
+
 class AutonomyRequest(BaseModel):
     enabled: bool
     policy: Dict[str, Any] = {}
@@ -161,6 +219,12 @@ async def configure_autonomy(agent_id: str, req: AutonomyRequest, user: dict = D
     return {"success": True, "enabled": req.enabled}
 
 
+@router.get("/autonomy/metrics")
+async def get_autonomy_metrics(user: dict = Depends(get_current_user)) -> Dict[str, Any]:
+    """Per-policy fire counts and scheduling lag"""
+    return autonomy_controller.metrics()
+
+
 @router.post("/orchestrators/register")
 async def register_orchestrator(orchestrator_id: str, endpoint: str, user: dict = Depends(get_current_user)) -> Dict[str, Any]:
     # Store orchestrator as a special agent-type record for now
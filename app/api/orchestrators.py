@@ -7,12 +7,12 @@ from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Request
 from pydantic import BaseModel, Field
 import structlog
-import httpx
 import asyncio
 from redis import Redis
 
 from ..config import settings
 from ..dependencies import get_redis, get_current_user
+from ..infrastructure.network.http_pool import http_pool
 
 logger = structlog.get_logger()
 
@@ -70,18 +70,18 @@ def get_orchestrator_list_key() -> str:
 
 async def send_control_command(url: str, command: OrchestratorControl) -> Dict[str, Any]:
     """Send control command to orchestrator"""
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.post(
-                f"{url}/control",
-                json=command.dict(),
-                headers={"Authorization": f"Bearer {settings.master_secret_key}"}
-            )
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            logger.error("Failed to send control command", error=str(e), url=url)
-            raise HTTPException(status_code=502, detail=f"Failed to communicate with orchestrator: {str(e)}")
+    try:
+        response = await http_pool.post(
+            f"{url}/control",
+            json=command.dict(),
+            headers={"Authorization": f"Bearer {settings.master_secret_key}"},
+            timeout=30.0
+        )
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        logger.error("Failed to send control command", error=str(e), url=url)
+        raise HTTPException(status_code=502, detail=f"Failed to communicate with orchestrator: {str(e)}")
 
 
 # API Endpoints
@@ -54,6 +54,15 @@ class Settings(BaseSettings):
     # Performance Tuning
     update_frequency: int = 30
     
+    # Embodiment command queue: "sorted_set" (single dispatcher) or "stream" (consumer groups)
+    embodiment_command_transport: str = "sorted_set"
+    embodiment_max_queue_depth: int = 50
+    
+    # WebSocket fan-out through Redis pub/sub so several workers/replicas share broadcasts
+    websocket_broker: bool = False
+    # Seconds over which market data / agent status updates are merged into one delta
+    websocket_conflation_window: float = 0.5
+    
     # Master Configuration (for distributed systems)
     master_secret_key: Optional[str] = None
     enable_distributed: bool = False
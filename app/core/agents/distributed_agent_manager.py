@@ -146,8 +146,15 @@ class DistributedAgentManager:
     
     async def _select_deployment_container(self, request: AgentDeploymentRequest) -> Optional[Dict[str, Any]]:
         """Select the best container for agent deployment"""
-        # Get available containers
-        containers = await container_registry.get_containers_by_capability("agent_runner")
+        # Get available containers, filtering by capability and free memory in the registry indexes
+        required_capabilities = (request.constraints or {}).get("required_capabilities", [])
+        min_free_memory = None
+        if request.deployment_strategy == AgentDeploymentStrategy.RESOURCE_BASED:
+            min_free_memory = (request.resource_requirements or {}).get("memory")
+        containers = await container_registry.query_containers(
+            capabilities=list(dict.fromkeys(["agent_runner", *required_capabilities])),
+            min_free_memory=min_free_memory,
+        )
         
         if not containers:
             logger.warning("No containers with agent_runner capability found")
@@ -1,43 +1,192 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Dict, Any
+import heapq
+import itertools
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
 import logging
 
-from .command_bus import EmbodimentCommand, command_bus
+from .command_bus import CommandBus, EmbodimentCommand, command_bus
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class AutonomyPolicy:
+    agent_id: str
+    interval_seconds: float = 10.0
+    prompt: str = "Introduce yourself briefly."
+    jitter: float = 0.1
+    priority: int = 5
+    timeout_ms: int = 8000
+    skip_if_behind: bool = True
+    generation: int = 0
+    fires: int = 0
+    skipped: int = 0
+    last_lag_ms: float = 0.0
+    max_lag_ms: float = 0.0
+    total_lag_ms: float = 0.0
+    started_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_dict(cls, agent_id: str, policy: Dict[str, Any]) -> "AutonomyPolicy":
+        return cls(
+            agent_id=agent_id,
+            interval_seconds=max(0.1, float(policy.get("interval_seconds", 10))),
+            prompt=policy.get("prompt", "Introduce yourself briefly."),
+            jitter=min(1.0, max(0.0, float(policy.get("jitter", 0.1)))),
+            priority=int(policy.get("priority", 5)),
+            timeout_ms=int(policy.get("timeout_ms", 8000)),
+            skip_if_behind=bool(policy.get("skip_if_behind", True)),
+        )
+
+    def command(self) -> EmbodimentCommand:
+        return EmbodimentCommand(
+            agent_id=self.agent_id,
+            action="speak",
+            payload={"text": self.prompt},
+            priority=self.priority,
+            timeout_ms=self.timeout_ms,
+            coalesce=True,
+        )
+
+
 class AutonomyController:
-    def __init__(self) -> None:
-        self._running: Dict[str, bool] = {}
+    """Drives every autonomy policy from one scheduler task.
+
+    Next-fire times live in a min-heap; the scheduler sleeps until the earliest
+    one, enqueues all due commands in a single CommandBus batch and pushes each
+    policy back with its interval (plus jitter). Stopping or restarting a
+    policy bumps its generation, so stale heap entries are skipped lazily and
+    start/stop are idempotent.
+
+    Autonomous speech is coalesced, and with `skip_if_behind` a tick is
+    skipped while the agent still has undelivered commands queued.
+    """
+
+    def __init__(self, bus: CommandBus = command_bus) -> None:
+        self.bus = bus
+        self._policies: Dict[str, AutonomyPolicy] = {}
+        self._heap: List[Tuple[float, int, str, int]] = []
+        self._seq = itertools.count()
+        self._generations = itertools.count(1)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
 
     async def start(self, agent_id: str, policy: Dict[str, Any] | None = None) -> None:
-        self._running[agent_id] = True
-        asyncio.create_task(self._loop(agent_id, policy or {}))
+        entry = AutonomyPolicy.from_dict(agent_id, policy or {})
+        entry.generation = next(self._generations)
+        self._policies[agent_id] = entry
+        self._push(entry, time.monotonic() + self._next_delay(entry))
+        self._ensure_scheduler()
         logger.info("[autonomy] started", extra={"agent_id": agent_id})
 
     async def stop(self, agent_id: str) -> None:
-        self._running[agent_id] = False
-        logger.info("[autonomy] stopped", extra={"agent_id": agent_id})
-
-    async def _loop(self, agent_id: str, policy: Dict[str, Any]) -> None:
-        interval = int(policy.get("interval_seconds", 10))
-        prompt = policy.get("prompt", "Introduce yourself briefly.")
-        while self._running.get(agent_id, False):
-            cmd = EmbodimentCommand(
-                agent_id=agent_id,
-                action="speak",
-                payload={"text": prompt},
-                priority=5,
-                timeout_ms=8000,
-            )
-            await command_bus.enqueue(cmd)
-            await asyncio.sleep(interval)
+        if self._policies.pop(agent_id, None) is not None:
+            logger.info("[autonomy] stopped", extra={"agent_id": agent_id})
 
+    async def shutdown(self) -> None:
+        self._policies.clear()
+        self._heap.clear()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
 
-autonomy_controller = AutonomyController()
+    def is_running(self, agent_id: str) -> bool:
+        return agent_id in self._policies
 
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            agent_id: {
+                "interval_seconds": p.interval_seconds,
+                "fires": p.fires,
+                "skipped": p.skipped,
+                "last_lag_ms": round(p.last_lag_ms, 3),
+                "max_lag_ms": round(p.max_lag_ms, 3),
+                "avg_lag_ms": round(p.total_lag_ms / p.fires, 3) if p.fires else 0.0,
+            }
+            for agent_id, p in self._policies.items()
+        }
 
+    def _next_delay(self, policy: AutonomyPolicy) -> float:
+        spread = policy.interval_seconds * policy.jitter
+        return max(0.0, policy.interval_seconds + random.uniform(-spread, spread))
 
+    def _push(self, policy: AutonomyPolicy, fire_at: float) -> None:
+        heapq.heappush(self._heap, (fire_at, next(self._seq), policy.agent_id, policy.generation))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _ensure_scheduler(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def _pop_due(self, now: float) -> List[Tuple[AutonomyPolicy, float]]:
+        due: List[Tuple[AutonomyPolicy, float]] = []
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, _, agent_id, generation = heapq.heappop(self._heap)
+            policy = self._policies.get(agent_id)
+            if policy is None or policy.generation != generation:
+                continue  # stopped or restarted since this entry was scheduled
+            due.append((policy, fire_at))
+        return due
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self._wakeup.clear()
+                now = time.monotonic()
+                due = self._pop_due(now)
+                if due:
+                    await self._fire(due, now)
+                    continue
+                timeout = self._heap[0][0] - now if self._heap else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("[autonomy] scheduler_error", extra={"error": str(e)})
+                await asyncio.sleep(1)
+
+    async def _fire(self, due: List[Tuple[AutonomyPolicy, float]], now: float) -> None:
+        for policy, fire_at in due:
+            # Schedule from the intended fire time to avoid drift; if far behind, skip the missed slots
+            delay = self._next_delay(policy)
+            next_at = fire_at + delay
+            self._push(policy, next_at if next_at > now else now + delay)
+        try:
+            ready = await self._skip_behind([policy for policy, _ in due])
+            # Skipped ticks are counted in `skipped` only; fires and lag cover ticks that enqueue
+            fire_times = {id(policy): fire_at for policy, fire_at in due}
+            for policy in ready:
+                lag_ms = (now - fire_times[id(policy)]) * 1000
+                policy.fires += 1
+                policy.last_lag_ms = lag_ms
+                policy.max_lag_ms = max(policy.max_lag_ms, lag_ms)
+                policy.total_lag_ms += lag_ms
+            await self.bus.enqueue_many([policy.command() for policy in ready])
+        except Exception as e:
+            logger.error("[autonomy] enqueue_error", extra={"count": len(due), "error": str(e)})
+
+    async def _skip_behind(self, policies: List[AutonomyPolicy]) -> List[AutonomyPolicy]:
+        """Drop this tick for agents whose earlier commands have not been delivered yet."""
+        checked = [p.agent_id for p in policies if p.skip_if_behind]
+        pending = await self.bus.pending_counts(checked) if checked else {}
+        ready: List[AutonomyPolicy] = []
+        for policy in policies:
+            if pending.get(policy.agent_id, 0) > 0:
+                policy.skipped += 1
+            else:
+                ready.append(policy)
+        return ready
+
+
+autonomy_controller = AutonomyController()
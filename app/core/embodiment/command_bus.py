@@ -2,18 +2,33 @@ from __future__ import annotations
 
 import asyncio
 import json
+import time
 import uuid
 from dataclasses import dataclass, asdict
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 import logging
 
-import httpx
+from redis.exceptions import WatchError
 
+from ...config import settings
 from ...dependencies import get_redis
+from ...errors import AgentError, ErrorCodes
+from ...infrastructure.network.http_pool import http_pool
+from .transports import create_transport
 
 logger = logging.getLogger(__name__)
 
+# Releases one pending slot; the field is dropped rather than left at zero or
+# driven negative when a reconciliation already accounted for the command
+_RELEASE_LUA = """
+local left = redis.call('HINCRBY', KEYS[1], ARGV[1], -1)
+if left <= 0 then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+end
+return left
+"""
+
 
 @dataclass
 class EmbodimentCommand:
@@ -23,6 +38,7 @@ class EmbodimentCommand:
     priority: int = 5
     timeout_ms: int = 5000
     correlation_id: str = ""
+    coalesce: bool = False
 
     def ensure_correlation(self) -> None:
         if not self.correlation_id:
@@ -30,28 +46,284 @@ class EmbodimentCommand:
 
 
 class CommandBus:
+    """Priority-ordered command queue with one Redis queue per priority level.
+
+    Priority 1 is the most urgent and 10 the least; within a level commands are
+    delivered in enqueue order. The storage is pluggable: sorted sets (default)
+    or Redis streams with a consumer group for multi-replica dispatch.
+
+    Each agent may have at most `max_queue_depth` undelivered commands; further
+    commands are rejected. The per-agent counters are rebuilt from the queues
+    by `reconcile_pending`, since commands lost by a crashed dispatcher or
+    trimmed from a stream are never released otherwise. Commands marked
+    `coalesce` are dropped at dispatch time if a newer command with the same
+    agent and action was enqueued.
+    """
+
     QUEUE_KEY = "embodiment:commands"
     RESULT_PREFIX = "embodiment:command_result:"
+    RESULT_CHANNEL = "embodiment:command_results"
+    RESULT_TTL_SECONDS = 300
+    PENDING_KEY = "embodiment:pending"
+    LATEST_KEY = "embodiment:latest"
+    STATS_PREFIX = "embodiment:stats:"
+    MIN_PRIORITY = 1
+    MAX_PRIORITY = 10
 
-    async def enqueue(self, cmd: EmbodimentCommand) -> str:
+    def __init__(self, transport: str = "sorted_set", max_queue_depth: int = 50) -> None:
+        self.transport = create_transport(transport)
+        self.max_queue_depth = max_queue_depth
+        self._waiters: Dict[str, asyncio.Future] = {}
+        self._pubsub = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self._listener_lock = asyncio.Lock()
+        self._release_script = None
+
+    def queue_key(self, priority: int) -> str:
+        return f"{self.QUEUE_KEY}:{self.transport.key_segment}p{self._clamp_priority(priority)}"
+
+    def queue_keys(self) -> List[str]:
+        return [self.queue_key(p) for p in range(self.MIN_PRIORITY, self.MAX_PRIORITY + 1)]
+
+    def _clamp_priority(self, priority: int) -> int:
+        return max(self.MIN_PRIORITY, min(self.MAX_PRIORITY, int(priority)))
+
+    def _prepare(self, cmd: EmbodimentCommand) -> Dict[str, Any]:
         cmd.ensure_correlation()
-        redis = await get_redis()
         data = asdict(cmd)
         data["enqueued_at"] = datetime.utcnow().isoformat()
-        await redis.lpush(self.QUEUE_KEY, json.dumps(data))
+        data["deadline"] = time.time() + cmd.timeout_ms / 1000.0
+        return data
+
+    async def enqueue(self, cmd: EmbodimentCommand) -> str:
+        cid = (await self.enqueue_many([cmd]))[0]
+        if cid is None:
+            raise AgentError(
+                f"Command queue for agent {cmd.agent_id} is full",
+                ErrorCodes.AGENT_QUEUE_FULL,
+                status_code=429,
+                details={"agent_id": cmd.agent_id, "max_queue_depth": self.max_queue_depth},
+            )
         logger.info("[command_bus] enqueued", extra={"cid": cmd.correlation_id, "agent": cmd.agent_id, "action": cmd.action})
-        return cmd.correlation_id
+        return cid
 
-    async def dispatch_one(self) -> Optional[Dict[str, Any]]:
+    async def enqueue_many(self, cmds: List[EmbodimentCommand]) -> List[Optional[str]]:
+        """Enqueue several commands in pipelined round-trips.
+
+        Returns the correlation id per command, or None where the agent's
+        queue was full and the command was rejected.
+        """
+        if not cmds:
+            return []
+        redis = await get_redis()
+        admitted = await self._admit(redis, cmds)
+        async with redis.pipeline(transaction=False) as pipe:
+            for cmd, ok in zip(cmds, admitted):
+                if not ok:
+                    continue
+                await self.transport.push(pipe, self.queue_key(cmd.priority), self._prepare(cmd))
+                if cmd.coalesce:
+                    pipe.hset(self.LATEST_KEY, f"{cmd.agent_id}:{cmd.action}", cmd.correlation_id)
+            await pipe.execute()
+        return [cmd.correlation_id if ok else None for cmd, ok in zip(cmds, admitted)]
+
+    async def _admit(self, redis, cmds: List[EmbodimentCommand]) -> List[bool]:
+        """Reserve a per-agent queue slot for each command; roll back the ones over the limit."""
+        async with redis.pipeline(transaction=False) as pipe:
+            for cmd in cmds:
+                pipe.hincrby(self.PENDING_KEY, cmd.agent_id, 1)
+            depths = await pipe.execute()
+        admitted = [depth <= self.max_queue_depth for depth in depths]
+        if not all(admitted):
+            async with redis.pipeline(transaction=False) as pipe:
+                for cmd, ok in zip(cmds, admitted):
+                    if not ok:
+                        pipe.hincrby(self.PENDING_KEY, cmd.agent_id, -1)
+                        pipe.hincrby(f"{self.STATS_PREFIX}{cmd.agent_id}", "rejected", 1)
+                await pipe.execute()
+            logger.warning("[command_bus] rejected", extra={"count": admitted.count(False)})
+        return admitted
+
+    async def pending_counts(self, agent_ids: List[str]) -> Dict[str, int]:
+        """Undelivered commands per agent, in one round-trip."""
+        if not agent_ids:
+            return {}
+        redis = await get_redis()
+        values = await redis.hmget(self.PENDING_KEY, agent_ids)
+        return {agent_id: max(0, int(v or 0)) for agent_id, v in zip(agent_ids, values)}
+
+    async def reconcile_pending(self, attempts: int = 3) -> Optional[Dict[str, int]]:
+        """Reset the per-agent pending counters to what the transport actually holds.
+
+        Runs under WATCH so a concurrent enqueue or release forces a recount;
+        returns the new counts, or None if the counters kept changing.
+        """
+        redis = await get_redis()
+        for _ in range(attempts):
+            async with redis.pipeline(transaction=True) as pipe:
+                try:
+                    await pipe.watch(self.PENDING_KEY)
+                    current = await pipe.hgetall(self.PENDING_KEY)
+                    depths = await self.transport.agent_depths(redis, self.queue_keys())
+                    pipe.multi()
+                    pipe.delete(self.PENDING_KEY)
+                    if depths:
+                        pipe.hset(self.PENDING_KEY, mapping=depths)
+                    await pipe.execute()
+                except WatchError:
+                    continue
+            current = {
+                (k.decode() if isinstance(k, bytes) else k): int(v)
+                for k, v in (current or {}).items()
+            }
+            drifted = {
+                agent_id for agent_id in set(current) | set(depths)
+                if current.get(agent_id, 0) != depths.get(agent_id, 0)
+            }
+            if drifted:
+                logger.warning("[command_bus] pending_reconciled", extra={"agents": len(drifted)})
+            return depths
+        logger.warning("[command_bus] pending_reconcile_skipped", extra={"attempts": attempts})
+        return None
+
+    async def agent_queue_stats(self, agent_id: str) -> Dict[str, Any]:
         redis = await get_redis()
-        raw = await redis.rpop(self.QUEUE_KEY)
-        if not raw:
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.hget(self.PENDING_KEY, agent_id)
+            pipe.hgetall(f"{self.STATS_PREFIX}{agent_id}")
+            pending, counters = await pipe.execute()
+        stats = {"agent_id": agent_id, "pending": max(0, int(pending or 0)), "max_queue_depth": self.max_queue_depth}
+        for name in ("delivered", "failed", "rejected", "superseded", "expired"):
+            stats[name] = 0
+        for name, value in (counters or {}).items():
+            stats[name.decode() if isinstance(name, bytes) else name] = int(value)
+        return stats
+
+    async def submit_and_wait(self, cmd: EmbodimentCommand, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Enqueue a command and wait for its delivery result.
+
+        The result is pushed over pub/sub by whichever dispatcher delivers the
+        command, so no polling is needed. Waits `timeout_ms` plus a grace period
+        unless `timeout` (seconds) is given.
+        """
+        cmd.ensure_correlation()
+        await self._ensure_result_listener()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[cmd.correlation_id] = future
+        try:
+            await self.enqueue(cmd)
+            wait_for = timeout if timeout is not None else cmd.timeout_ms / 1000.0 + 5.0
+            return await asyncio.wait_for(future, wait_for)
+        except asyncio.TimeoutError:
+            # The notification may have been missed (e.g. listener reconnect); check the stored copy once
+            stored = await self.get_result(cmd.correlation_id)
+            if stored is not None:
+                return stored
+            return {"success": False, "error": "timeout", "agent_id": cmd.agent_id, "correlation_id": cmd.correlation_id}
+        finally:
+            self._waiters.pop(cmd.correlation_id, None)
+
+    async def get_result(self, correlation_id: str) -> Optional[Dict[str, Any]]:
+        redis = await get_redis()
+        raw = await redis.get(f"{self.RESULT_PREFIX}{correlation_id}")
+        return json.loads(raw) if raw else None
+
+    def _resolve(self, correlation_id: str, result: Dict[str, Any]) -> None:
+        future = self._waiters.get(correlation_id)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    async def _ensure_result_listener(self) -> None:
+        async with self._listener_lock:
+            if self._listener_task is not None and not self._listener_task.done():
+                return
+            redis = await get_redis()
+            self._pubsub = redis.pubsub()
+            await self._pubsub.subscribe(self.RESULT_CHANNEL)
+            self._listener_task = asyncio.create_task(self._listen_results())
+
+    async def _listen_results(self) -> None:
+        try:
+            async for message in self._pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                try:
+                    notice = json.loads(message["data"])
+                    self._resolve(notice["correlation_id"], notice["result"])
+                except Exception as e:
+                    logger.error("[command_bus] bad_result_notice", extra={"error": str(e)})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("[command_bus] result_listener_error", extra={"error": str(e)})
+
+    async def pop_batch(self, count: int) -> List[Dict[str, Any]]:
+        """Pop up to `count` commands, highest priority first."""
+        redis = await get_redis()
+        return await self.transport.pop_batch(redis, self.queue_keys(), count)
+
+    async def queue_depth(self) -> Dict[int, int]:
+        redis = await get_redis()
+        counts = await self.transport.depth(redis, self.queue_keys())
+        return dict(zip(range(self.MIN_PRIORITY, self.MAX_PRIORITY + 1), counts))
+
+    async def dispatch_one(self) -> Optional[Dict[str, Any]]:
+        batch = await self.pop_batch(1)
+        if not batch:
             return None
-        data = json.loads(raw)
-        result = await self._deliver(data)
-        await redis.set(f"{self.RESULT_PREFIX}{data['correlation_id']}", json.dumps(result))
+        return await self.process(batch[0])
+
+    async def process(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Deliver a popped command, or drop it if expired or superseded, and store the result."""
+        redis = await get_redis()
+        drop_reason = await self._drop_reason(redis, data)
+        if drop_reason:
+            logger.warning(f"[command_bus] {drop_reason}", extra={"cid": data["correlation_id"], "agent": data["agent_id"]})
+            result = {"success": False, "error": drop_reason, "agent_id": data["agent_id"], "correlation_id": data["correlation_id"]}
+            outcome = drop_reason
+        else:
+            result = await self._deliver(data)
+            outcome = "delivered" if result.get("success") else "failed"
+        await self._finish(redis, data, result, outcome)
         return result
 
+    async def _drop_reason(self, redis, data: Dict[str, Any]) -> Optional[str]:
+        deadline = data.get("deadline")
+        if deadline is not None and time.time() > deadline:
+            return "expired"
+        if data.get("coalesce"):
+            latest = await redis.hget(self.LATEST_KEY, f"{data['agent_id']}:{data['action']}")
+            latest = latest.decode() if isinstance(latest, bytes) else latest
+            if latest and latest != data["correlation_id"]:
+                return "superseded"
+        return None
+
+    async def _finish(self, redis, data: Dict[str, Any], result: Dict[str, Any], outcome: str) -> None:
+        """Publish the result, release the agent's queue slot, count the outcome and ack, in one round-trip."""
+        correlation_id = data["correlation_id"]
+        # Local waiters are resolved directly; other replicas hear about it over pub/sub
+        self._resolve(correlation_id, result)
+        if self._release_script is None:
+            self._release_script = redis.register_script(_RELEASE_LUA)
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.set(f"{self.RESULT_PREFIX}{correlation_id}", json.dumps(result), ex=self.RESULT_TTL_SECONDS)
+            pipe.publish(self.RESULT_CHANNEL, json.dumps({"correlation_id": correlation_id, "result": result}))
+            await self._release_script(
+                keys=[self.PENDING_KEY], args=[data["agent_id"]], client=pipe
+            )
+            pipe.hincrby(f"{self.STATS_PREFIX}{data['agent_id']}", outcome, 1)
+            await self.transport.ack(pipe, data)
+            await pipe.execute()
+
+    async def aclose(self) -> None:
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            await asyncio.gather(self._listener_task, return_exceptions=True)
+            self._listener_task = None
+        if self._pubsub is not None:
+            await self._pubsub.close()
+            self._pubsub = None
+
     async def _deliver(self, data: Dict[str, Any]) -> Dict[str, Any]:
         # Fetch agent endpoint from registry
         from .registry import embodiment_registry
@@ -60,21 +332,21 @@ class CommandBus:
             return {"success": False, "error": "agent_not_found", "data": data}
         endpoint = agent.get("endpoint")
         try:
-            async with httpx.AsyncClient(timeout=data.get("timeout_ms", 5000) / 1000.0) as client:
-                resp = await client.post(
-                    f"{endpoint}/commands",
-                    json={"action": data["action"], "payload": data["payload"], "correlation_id": data["correlation_id"]},
-                )
-                ok = resp.status_code in (200, 202)
-                body = resp.json() if ok else {"status_code": resp.status_code, "text": resp.text}
-                logger.info("[command_bus] delivered", extra={"cid": data["correlation_id"], "status": ok})
-                return {"success": ok, "result": body, "agent_id": data["agent_id"], "correlation_id": data["correlation_id"]}
+            resp = await http_pool.post(
+                f"{endpoint}/commands",
+                json={"action": data["action"], "payload": data["payload"], "correlation_id": data["correlation_id"]},
+                timeout=data.get("timeout_ms", 5000) / 1000.0,
+            )
+            ok = resp.status_code in (200, 202)
+            body = resp.json() if ok else {"status_code": resp.status_code, "text": resp.text}
+            logger.info("[command_bus] delivered", extra={"cid": data["correlation_id"], "status": ok})
+            return {"success": ok, "result": body, "agent_id": data["agent_id"], "correlation_id": data["correlation_id"]}
         except Exception as e:
             logger.error("[command_bus] delivery_error", extra={"cid": data["correlation_id"], "error": str(e)})
             return {"success": False, "error": str(e), "agent_id": data["agent_id"], "correlation_id": data["correlation_id"]}
 
 
-command_bus = CommandBus()
-
-
-
+command_bus = CommandBus(
+    transport=settings.embodiment_command_transport,
+    max_queue_depth=settings.embodiment_max_queue_depth,
+)
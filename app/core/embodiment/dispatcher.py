@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, List, Optional
+import logging
+
+from .command_bus import CommandBus, command_bus
+
+logger = logging.getLogger(__name__)
+
+
+class CommandDispatcher:
+    """Long-running consumer pool draining the CommandBus.
+
+    Each worker pops a batch of commands (highest priority first) and delivers
+    them concurrently. A per-agent semaphore bounds how many commands are in
+    flight against a single agent endpoint at once; it is dropped again once
+    no command for that agent is in flight or waiting. Every `reconcile_interval`
+    seconds the bus's per-agent pending counters are rebuilt from the queues.
+    """
+
+    def __init__(
+        self,
+        bus: CommandBus,
+        workers: int = 4,
+        batch_size: int = 32,
+        max_inflight_per_agent: int = 4,
+        idle_sleep: float = 0.05,
+        reconcile_interval: float = 30.0,
+    ) -> None:
+        self.bus = bus
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_inflight_per_agent = max_inflight_per_agent
+        self.idle_sleep = idle_sleep
+        self.reconcile_interval = reconcile_interval
+        self._running = False
+        self._tasks: List[asyncio.Task] = []
+        self._agent_slots: Dict[str, asyncio.Semaphore] = {}
+        self._agent_users: Dict[str, int] = {}  # commands holding or waiting for each agent's semaphore
+        self.stats: Dict[str, int] = {"delivered": 0, "failed": 0, "expired": 0, "superseded": 0}
+
+    async def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._tasks = [asyncio.create_task(self._consume(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._reconcile()))
+        logger.info("[dispatcher] started", extra={"workers": self.workers, "batch_size": self.batch_size})
+
+    async def stop(self) -> None:
+        self._running = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.bus.aclose()
+        logger.info("[dispatcher] stopped")
+
+    async def _consume(self, worker_id: int) -> None:
+        while self._running:
+            try:
+                batch = await self.bus.pop_batch(self.batch_size)
+                if not batch:
+                    await asyncio.sleep(self.idle_sleep)
+                    continue
+                await asyncio.gather(*(self._dispatch(data) for data in batch))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("[dispatcher] worker_error", extra={"worker": worker_id, "error": str(e)})
+                await asyncio.sleep(1)
+
+    async def _reconcile(self) -> None:
+        while self._running:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                await self.bus.reconcile_pending()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("[dispatcher] reconcile_error", extra={"error": str(e)})
+
+    async def _dispatch(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        agent_id = data["agent_id"]
+        slots = self._agent_slots.get(agent_id)
+        if slots is None:
+            slots = self._agent_slots[agent_id] = asyncio.Semaphore(self.max_inflight_per_agent)
+        self._agent_users[agent_id] = self._agent_users.get(agent_id, 0) + 1
+        try:
+            async with slots:
+                try:
+                    result = await self.bus.process(data)
+                except Exception as e:
+                    logger.error("[dispatcher] process_error", extra={"cid": data.get("correlation_id"), "error": str(e)})
+                    self.stats["failed"] += 1
+                    return None
+        finally:
+            # Evict the semaphore once it is back at full capacity so idle agents cost nothing
+            self._agent_users[agent_id] -= 1
+            if not self._agent_users[agent_id]:
+                del self._agent_users[agent_id]
+                del self._agent_slots[agent_id]
+        if result.get("error") in ("expired", "superseded"):
+            self.stats[result["error"]] += 1
+        elif result.get("success"):
+            self.stats["delivered"] += 1
+        else:
+            self.stats["failed"] += 1
+        return result
+
+
+command_dispatcher = CommandDispatcher(command_bus)
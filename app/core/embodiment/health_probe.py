@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+
+from ...infrastructure.network.http_pool import http_pool
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProbeResult:
+    url: str
+    ok: bool
+    checked_at: float
+    latency_ms: float = 0.0
+    data: Any = None
+    error: Optional[str] = None
+
+
+class EndpointHealthProber:
+    """In-memory, stale-while-revalidate cache of endpoint probes.
+
+    Callers get the cached result immediately; results older than `ttl` are
+    refreshed in the background, and only never-seen URLs are probed inline.
+    A background loop keeps every tracked URL warm, probing with bounded
+    parallelism over the shared HTTP connection pool.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 10.0,
+        timeout: float = 2.0,
+        max_parallel: int = 16,
+        refresh_interval: float = 5.0,
+        forget_after: float = 600.0,
+    ) -> None:
+        self.ttl = ttl
+        self.timeout = timeout
+        self.max_parallel = max_parallel
+        self.refresh_interval = refresh_interval
+        self.forget_after = forget_after
+        self._results: Dict[str, ProbeResult] = {}
+        self._json_urls: set = set()
+        self._last_requested: Dict[str, float] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+
+    async def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._refresh_loop())
+        logger.info("[health_probe] started", extra={"ttl": self.ttl, "max_parallel": self.max_parallel})
+
+    async def stop(self) -> None:
+        self._running = False
+        tasks = list(self._inflight.values()) + ([self._task] if self._task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._inflight.clear()
+
+    async def get(self, url: str, parse_json: bool = False) -> ProbeResult:
+        return (await self.get_many([url], parse_json=parse_json))[url]
+
+    async def get_many(self, urls: Iterable[str], parse_json: bool = False) -> Dict[str, ProbeResult]:
+        """Return a result for every URL, probing concurrently only those never seen before."""
+        now = time.time()
+        results: Dict[str, ProbeResult] = {}
+        missing: List[str] = []
+        for url in dict.fromkeys(urls):
+            self._last_requested[url] = now
+            if parse_json:
+                self._json_urls.add(url)
+            cached = self._results.get(url)
+            if cached is None:
+                missing.append(url)
+                continue
+            results[url] = cached
+            if now - cached.checked_at > self.ttl:
+                self._schedule(url)
+        if missing:
+            probed = await asyncio.gather(*(asyncio.shield(self._schedule(url)) for url in missing))
+            results.update(zip(missing, probed))
+        return results
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        return [
+            {**asdict(result), "age_seconds": round(now - result.checked_at, 3), "stale": now - result.checked_at > self.ttl}
+            for result in self._results.values()
+        ]
+
+    def _schedule(self, url: str) -> asyncio.Task:
+        """Start a probe for `url` unless one is already running, and return it."""
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.create_task(self._refresh(url))
+            self._inflight[url] = task
+        return task
+
+    async def _refresh(self, url: str) -> ProbeResult:
+        try:
+            result = await self._probe(url)
+            self._results[url] = result
+            return result
+        finally:
+            self._inflight.pop(url, None)
+
+    async def _probe(self, url: str) -> ProbeResult:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_parallel)
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                response = await http_pool.get(url, timeout=self.timeout)
+                latency_ms = (time.perf_counter() - started) * 1000
+                ok = response.status_code == 200
+                data = response.json() if ok and url in self._json_urls else None
+                return ProbeResult(url=url, ok=ok, checked_at=time.time(), latency_ms=latency_ms, data=data)
+            except Exception as e:
+                latency_ms = (time.perf_counter() - started) * 1000
+                return ProbeResult(url=url, ok=False, checked_at=time.time(), latency_ms=latency_ms, error=str(e))
+
+    async def _refresh_loop(self) -> None:
+        while self._running:
+            try:
+                now = time.time()
+                # Stop tracking URLs nobody has asked about for a while
+                for url, requested in list(self._last_requested.items()):
+                    if now - requested > self.forget_after:
+                        self._last_requested.pop(url, None)
+                        self._results.pop(url, None)
+                        self._json_urls.discard(url)
+                due = [
+                    url for url in self._last_requested
+                    if url not in self._results or now - self._results[url].checked_at > self.ttl - self.refresh_interval
+                ]
+                for url in due:
+                    self._schedule(url)
+            except Exception as e:
+                logger.error("[health_probe] refresh_error", extra={"error": str(e)})
+            await asyncio.sleep(self.refresh_interval)
+
+
+endpoint_health_prober = EndpointHealthProber()
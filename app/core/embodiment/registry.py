@@ -1,16 +1,37 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import uuid
 from dataclasses import dataclass, asdict
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Any, Dict, List, Optional
 import logging
 
+from redis.exceptions import ResponseError
+
 from ...dependencies import get_redis
 
 logger = logging.getLogger(__name__)
 
 
+# Heartbeat in one atomic round-trip: only the supplied hash fields are written.
+# ARGV[1] = invalidation channel, ARGV[2] = notice, ARGV[3..] = field/value pairs
+_HEARTBEAT_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+redis.call('PUBLISH', ARGV[1], ARGV[2])
+return 1
+"""
+
+
+def _is_wrongtype(result: Any) -> bool:
+    """True for the error Redis returns when a hash command hits a legacy string record"""
+    return isinstance(result, ResponseError) and str(result).startswith("WRONGTYPE")
+
+
 @dataclass
 class EmbodiedAgent:
     agent_id: str
@@ -24,52 +45,269 @@ class EmbodiedAgent:
 
 
 class EmbodimentRegistry:
+    """Agent records in Redis, fronted by a write-through in-process cache.
+
+    Each agent is a Redis hash whose values are JSON-encoded; metadata entries
+    are flattened into `metadata.<key>` fields so a heartbeat only writes the
+    fields it changes. Every write publishes a notice on INVALIDATION_CHANNEL:
+    heartbeats carry the changed fields so other replicas patch their copy in
+    place, registrations make them drop it and re-read on next access. The
+    cache is only trusted while the invalidation listener is running.
+    """
+
     KEY_PREFIX = "embodiment:agent:"
+    INDEX_KEY = "embodiment:agents"
+    INVALIDATION_CHANNEL = "embodiment:registry:invalidate"
+    METADATA_PREFIX = "metadata."
+
+    def __init__(self) -> None:
+        self._instance_id = str(uuid.uuid4())
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._known_ids: set = set()
+        self._index_loaded = False
+        self._pubsub = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self._listener_lock = asyncio.Lock()
+        self._heartbeat_script = None
+
+    @property
+    def cache_active(self) -> bool:
+        return self._listener_task is not None and not self._listener_task.done()
 
     async def register(self, agent: EmbodiedAgent) -> bool:
         redis = await get_redis()
-        key = f"{self.KEY_PREFIX}{agent.agent_id}"
         data = asdict(agent)
         if data.get("metadata") is None:
             data["metadata"] = {}
         data["registered_at"] = datetime.utcnow().isoformat()
-        await redis.set(key, json.dumps(data))
+        await self._write(redis, agent.agent_id, data)
         logger.info("[registry] registered agent", extra={"agent_id": agent.agent_id})
         return True
 
     async def heartbeat(self, agent_id: str, status: str = "online", metadata: Dict[str, Any] = None) -> bool:
+        results = await self.heartbeat_many([{"agent_id": agent_id, "status": status, "metadata": metadata}])
+        return results.get(agent_id, False)
+
+    async def heartbeat_many(self, heartbeats: List[Dict[str, Any]]) -> Dict[str, bool]:
+        """Apply several heartbeats in one pipelined round-trip.
+
+        Each item needs `agent_id` and may carry `status` and `metadata`.
+        Returns agent_id -> False for agents that are not registered or whose
+        heartbeat failed; one bad item never fails the rest of the batch.
+        """
+        if not heartbeats:
+            return {}
         redis = await get_redis()
+        if self._heartbeat_script is None:
+            self._heartbeat_script = redis.register_script(_HEARTBEAT_LUA)
+        now = datetime.utcnow().isoformat()
+        patches: List[Dict[str, Any]] = []
+        for hb in heartbeats:
+            fields: Dict[str, Any] = {"last_heartbeat": now, "status": hb.get("status") or "online"}
+            for meta_key, meta_value in (hb.get("metadata") or {}).items():
+                fields[f"{self.METADATA_PREFIX}{meta_key}"] = meta_value
+            patches.append(fields)
+
+        applied = await self._run_heartbeats(redis, [hb["agent_id"] for hb in heartbeats], patches)
+        # Legacy JSON string records reject HSET: convert them and retry just those
+        legacy = [i for i, result in enumerate(applied) if _is_wrongtype(result)]
+        if legacy:
+            for i in legacy:
+                await self._migrate_legacy_record(redis, f"{self.KEY_PREFIX}{heartbeats[i]['agent_id']}")
+            retried = await self._run_heartbeats(
+                redis, [heartbeats[i]["agent_id"] for i in legacy], [patches[i] for i in legacy]
+            )
+            for i, result in zip(legacy, retried):
+                applied[i] = result
+
+        results: Dict[str, bool] = {}
+        for hb, fields, ok in zip(heartbeats, patches, applied):
+            if isinstance(ok, Exception):
+                logger.warning("[registry] heartbeat failed", extra={"agent_id": hb["agent_id"], "error": str(ok)})
+                ok = False
+            results[hb["agent_id"]] = bool(ok)
+            if ok:
+                self._apply_patch(hb["agent_id"], fields)
+        return results
+
+    async def _run_heartbeats(self, redis, agent_ids: List[str], patches: List[Dict[str, Any]]) -> List[Any]:
+        """One pipelined script call per heartbeat; errors come back in place of results"""
+        async with redis.pipeline(transaction=False) as pipe:
+            for agent_id, fields in zip(agent_ids, patches):
+                notice = json.dumps({"agent_id": agent_id, "origin": self._instance_id, "fields": fields})
+                args: List[str] = [self.INVALIDATION_CHANNEL, notice]
+                for field, value in fields.items():
+                    args.extend((field, json.dumps(value)))
+                await self._heartbeat_script(keys=[f"{self.KEY_PREFIX}{agent_id}"], args=args, client=pipe)
+            return await pipe.execute(raise_on_error=False)
+
+    async def _write(self, redis, agent_id: str, data: Dict[str, Any]) -> None:
         key = f"{self.KEY_PREFIX}{agent_id}"
-        val = await redis.get(key)
-        if not val:
-            return False
-        obj = json.loads(val)
-        obj["last_heartbeat"] = datetime.utcnow().isoformat()
-        obj["status"] = status
-        if metadata:
-            meta = obj.get("metadata", {})
-            meta.update(metadata)
-            obj["metadata"] = meta
-        await redis.set(key, json.dumps(obj))
-        return True
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping=self._encode(data))
+            pipe.sadd(self.INDEX_KEY, agent_id)
+            pipe.publish(self.INVALIDATION_CHANNEL, json.dumps({"agent_id": agent_id, "origin": self._instance_id}))
+            await pipe.execute()
+        self._cache[agent_id] = data
+        self._known_ids.add(agent_id)
+
+    def _encode(self, data: Dict[str, Any]) -> Dict[str, str]:
+        fields = {k: json.dumps(v) for k, v in data.items() if k != "metadata"}
+        for meta_key, meta_value in (data.get("metadata") or {}).items():
+            fields[f"{self.METADATA_PREFIX}{meta_key}"] = json.dumps(meta_value)
+        return fields
+
+    def _decode(self, raw: Dict[Any, Any]) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"metadata": {}}
+        for field, value in raw.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            if field.startswith(self.METADATA_PREFIX):
+                data["metadata"][field[len(self.METADATA_PREFIX):]] = json.loads(value)
+            else:
+                data[field] = json.loads(value)
+        return data
+
+    def _apply_patch(self, agent_id: str, fields: Dict[str, Any]) -> None:
+        cached = self._cache.get(agent_id)
+        if cached is None:
+            return
+        for field, value in fields.items():
+            if field.startswith(self.METADATA_PREFIX):
+                cached.setdefault("metadata", {})[field[len(self.METADATA_PREFIX):]] = value
+            else:
+                cached[field] = value
 
     async def list_agents(self) -> List[Dict[str, Any]]:
+        await self._ensure_listener()
         redis = await get_redis()
-        keys = await redis.keys(f"{self.KEY_PREFIX}*")
-        result: List[Dict[str, Any]] = []
-        for key in keys:
-            raw = await redis.get(key)
-            if raw:
-                result.append(json.loads(raw))
-        return result
+        if not (self.cache_active and self._index_loaded):
+            await self._load_index(redis)
+        missing = [agent_id for agent_id in self._known_ids if agent_id not in self._cache]
+        if missing:
+            await self._fetch_many(redis, missing)
+        # Shallow copies so callers annotating records (e.g. is_active) don't touch the cache
+        return [dict(self._cache[agent_id]) for agent_id in sorted(self._known_ids) if agent_id in self._cache]
 
     async def get(self, agent_id: str) -> Optional[Dict[str, Any]]:
+        await self._ensure_listener()
+        if self.cache_active and agent_id in self._cache:
+            return dict(self._cache[agent_id])
         redis = await get_redis()
-        raw = await redis.get(f"{self.KEY_PREFIX}{agent_id}")
-        return json.loads(raw) if raw else None
+        if not self._index_loaded:
+            await self._load_index(redis)
+        key = f"{self.KEY_PREFIX}{agent_id}"
+        try:
+            raw = await redis.hgetall(key)
+        except ResponseError as e:
+            if not _is_wrongtype(e):
+                raise
+            await self._migrate_legacy_record(redis, key)
+            raw = await redis.hgetall(key)
+        if not raw:
+            return None
+        data = self._decode(raw)
+        self._cache[agent_id] = data
+        self._known_ids.add(agent_id)
+        return dict(data)
 
+    async def _load_index(self, redis) -> None:
+        members = await redis.smembers(self.INDEX_KEY)
+        ids = {m.decode() if isinstance(m, bytes) else m for m in members}
+        if not ids:
+            # Records written before the index existed: backfill once with SCAN
+            async for key in redis.scan_iter(match=f"{self.KEY_PREFIX}*", count=500):
+                key = key.decode() if isinstance(key, bytes) else key
+                ids.add(key[len(self.KEY_PREFIX):])
+                await self._migrate_legacy_record(redis, key)
+            if ids:
+                await redis.sadd(self.INDEX_KEY, *ids)
+        self._known_ids = ids
+        self._cache = {k: v for k, v in self._cache.items() if k in ids}
+        self._index_loaded = True
 
-embodiment_registry = EmbodimentRegistry()
+    async def _migrate_legacy_record(self, redis, key: str) -> None:
+        """Convert a pre-hash JSON string record into the hash layout."""
+        key_type = await redis.type(key)
+        if (key_type.decode() if isinstance(key_type, bytes) else key_type) != "string":
+            return
+        raw = await redis.get(key)
+        if raw:
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                pipe.hset(key, mapping=self._encode(json.loads(raw)))
+                await pipe.execute()
+
+    async def _fetch_many(self, redis, agent_ids: List[str]) -> None:
+        async with redis.pipeline(transaction=False) as pipe:
+            for agent_id in agent_ids:
+                pipe.hgetall(f"{self.KEY_PREFIX}{agent_id}")
+            values = await pipe.execute(raise_on_error=False)
+        for agent_id, raw in zip(agent_ids, values):
+            if _is_wrongtype(raw):
+                key = f"{self.KEY_PREFIX}{agent_id}"
+                await self._migrate_legacy_record(redis, key)
+                raw = await redis.hgetall(key)
+            elif isinstance(raw, Exception):
+                logger.warning("[registry] agent read failed", extra={"agent_id": agent_id, "error": str(raw)})
+                continue
+            if raw:
+                self._cache[agent_id] = self._decode(raw)
+            else:
+                self._known_ids.discard(agent_id)
 
+    async def _ensure_listener(self) -> None:
+        if self.cache_active:
+            return
+        async with self._listener_lock:
+            if self.cache_active:
+                return
+            try:
+                redis = await get_redis()
+                self._pubsub = redis.pubsub()
+                await self._pubsub.subscribe(self.INVALIDATION_CHANNEL)
+            except Exception as e:
+                logger.warning("[registry] invalidation listener unavailable", extra={"error": str(e)})
+                return
+            # Anything cached before the subscription may have missed invalidations
+            self._cache.clear()
+            self._index_loaded = False
+            self._listener_task = asyncio.create_task(self._listen_invalidations())
 
+    async def _listen_invalidations(self) -> None:
+        try:
+            async for message in self._pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                try:
+                    notice = json.loads(message["data"])
+                except Exception:
+                    continue
+                agent_id = notice.get("agent_id")
+                if not agent_id or notice.get("origin") == self._instance_id:
+                    continue
+                self._known_ids.add(agent_id)
+                if "fields" in notice:
+                    self._apply_patch(agent_id, notice["fields"])
+                else:
+                    self._cache.pop(agent_id, None)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("[registry] invalidation listener stopped", extra={"error": str(e)})
+        finally:
+            # Without invalidations the cache can no longer be trusted
+            self._cache.clear()
+            self._index_loaded = False
 
+    async def aclose(self) -> None:
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            await asyncio.gather(self._listener_task, return_exceptions=True)
+            self._listener_task = None
+        if self._pubsub is not None:
+            await self._pubsub.close()
+            self._pubsub = None
+
+
+embodiment_registry = EmbodimentRegistry()
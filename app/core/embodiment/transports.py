@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import json
+import os
+import socket
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Pops up to ARGV[1] members across KEYS in order (highest priority first) in one round-trip
+_POP_BATCH_LUA = """
+local remaining = tonumber(ARGV[1])
+local out = {}
+for _, key in ipairs(KEYS) do
+    if remaining <= 0 then break end
+    local items = redis.call('ZPOPMIN', key, remaining)
+    for i = 1, #items, 2 do
+        out[#out + 1] = items[i]
+        remaining = remaining - 1
+    end
+end
+return out
+"""
+
+
+class SortedSetTransport:
+    """One sorted set per priority level, scored by enqueue time.
+
+    Popping removes the command from Redis, so delivery is at-most-once: a
+    dispatcher that dies mid-batch loses what it popped. Popped commands are
+    tracked in memory until acked so `agent_depths` can still count them.
+    """
+
+    name = "sorted_set"
+    key_segment = ""
+
+    def __init__(self) -> None:
+        self._pop_script = None
+        self._inflight: Counter = Counter()
+
+    async def push(self, redis, key: str, data: Dict[str, Any]) -> None:
+        await redis.zadd(key, {json.dumps(data): time.time()})
+
+    async def pop_batch(self, redis, keys: List[str], count: int) -> List[Dict[str, Any]]:
+        if self._pop_script is None:
+            self._pop_script = redis.register_script(_POP_BATCH_LUA)
+        raw_items = await self._pop_script(keys=keys, args=[count])
+        batch = [json.loads(raw) for raw in raw_items or []]
+        self._inflight.update(data["agent_id"] for data in batch)
+        return batch
+
+    async def ack(self, redis, data: Dict[str, Any]) -> None:
+        agent_id = data["agent_id"]
+        self._inflight[agent_id] -= 1
+        if self._inflight[agent_id] <= 0:
+            del self._inflight[agent_id]
+
+    async def depth(self, redis, keys: List[str]) -> List[int]:
+        async with redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.zcard(key)
+            return await pipe.execute()
+
+    async def agent_depths(self, redis, keys: List[str]) -> Dict[str, int]:
+        """Queued plus locally in-flight commands per agent"""
+        async with redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.zrange(key, 0, -1)
+            queues = await pipe.execute()
+        depths = Counter(json.loads(raw)["agent_id"] for members in queues for raw in members)
+        depths.update(self._inflight)
+        return dict(depths)
+
+
+class StreamTransport:
+    """One Redis stream per priority level, consumed through a consumer group.
+
+    Entries stay in the group's pending list until acknowledged after delivery,
+    and entries left pending by a crashed consumer are reclaimed with
+    XAUTOCLAIM, so several manager replicas can share the load with
+    at-least-once semantics.
+    """
+
+    name = "stream"
+    key_segment = "stream:"
+    GROUP = "embodiment-dispatchers"
+    FIELD = "data"
+
+    def __init__(
+        self,
+        consumer: Optional[str] = None,
+        block_ms: int = 100,
+        maxlen: int = 100000,
+        reclaim_idle_ms: int = 30000,
+        reclaim_interval: float = 5.0,
+    ) -> None:
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.block_ms = block_ms
+        self.maxlen = maxlen
+        self.reclaim_idle_ms = reclaim_idle_ms
+        self.reclaim_interval = reclaim_interval
+        self._groups_ready: set = set()
+        self._last_reclaim = 0.0
+
+    async def _ensure_groups(self, redis, keys: List[str]) -> None:
+        for key in keys:
+            if key in self._groups_ready:
+                continue
+            try:
+                await redis.xgroup_create(key, self.GROUP, id="0", mkstream=True)
+            except Exception as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+            self._groups_ready.add(key)
+
+    def _decode(self, key: Any, entry_id: Any, fields: Dict[Any, Any]) -> Optional[Dict[str, Any]]:
+        raw = fields.get(self.FIELD.encode()) or fields.get(self.FIELD)
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        data["_stream"] = key.decode() if isinstance(key, bytes) else key
+        data["_entry_id"] = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+        return data
+
+    async def push(self, redis, key: str, data: Dict[str, Any]) -> None:
+        # Entries trimmed by MAXLEN never reach CommandBus._finish; reconcile_pending recounts them
+        await redis.xadd(key, {self.FIELD: json.dumps(data)}, maxlen=self.maxlen, approximate=True)
+
+    async def pop_batch(self, redis, keys: List[str], count: int) -> List[Dict[str, Any]]:
+        await self._ensure_groups(redis, keys)
+        batch: List[Dict[str, Any]] = []
+        if time.monotonic() - self._last_reclaim >= self.reclaim_interval:
+            self._last_reclaim = time.monotonic()
+            batch.extend(await self.reclaim(redis, keys, count))
+            if batch:
+                return batch
+        response = await redis.xreadgroup(
+            self.GROUP,
+            self.consumer,
+            {key: ">" for key in keys},
+            count=count,
+            block=self.block_ms,
+        )
+        for key, entries in response or []:
+            for entry_id, fields in entries:
+                data = self._decode(key, entry_id, fields)
+                if data is not None:
+                    batch.append(data)
+        # Each stream returns up to `count` entries; deliver the most urgent first
+        batch.sort(key=lambda d: d.get("priority", 5))
+        return batch
+
+    async def reclaim(self, redis, keys: List[str], count: int) -> List[Dict[str, Any]]:
+        """Take over entries left pending by consumers that stopped acknowledging."""
+        reclaimed: List[Dict[str, Any]] = []
+        for key in keys:
+            try:
+                result = await redis.xautoclaim(
+                    key, self.GROUP, self.consumer, self.reclaim_idle_ms, start_id="0-0", count=count
+                )
+            except Exception as e:
+                logger.error("[command_bus] reclaim_error", extra={"stream": key, "error": str(e)})
+                continue
+            for entry_id, fields in result[1] if result else []:
+                # Entries trimmed away by MAXLEN come back without fields (and without
+                # an agent id, so their pending slot is only released by reconciliation)
+                if not fields:
+                    await redis.xack(key, self.GROUP, entry_id)
+                    continue
+                data = self._decode(key, entry_id, fields)
+                if data is not None:
+                    reclaimed.append(data)
+        if reclaimed:
+            logger.warning("[command_bus] reclaimed", extra={"count": len(reclaimed), "consumer": self.consumer})
+        return reclaimed
+
+    async def ack(self, redis, data: Dict[str, Any]) -> None:
+        stream = data.get("_stream")
+        entry_id = data.get("_entry_id")
+        if stream and entry_id:
+            # Delete after ack so XLEN reflects outstanding work rather than history
+            await redis.xack(stream, self.GROUP, entry_id)
+            await redis.xdel(stream, entry_id)
+
+    async def depth(self, redis, keys: List[str]) -> List[int]:
+        async with redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.xlen(key)
+            return await pipe.execute()
+
+    async def agent_depths(self, redis, keys: List[str]) -> Dict[str, int]:
+        """Commands per agent still in the streams, read or not (acks delete entries)"""
+        async with redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.xrange(key, "-", "+")
+            streams = await pipe.execute()
+        depths: Counter = Counter()
+        for key, entries in zip(keys, streams):
+            for entry_id, fields in entries or []:
+                data = self._decode(key, entry_id, fields)
+                if data is not None:
+                    depths[data["agent_id"]] += 1
+        return dict(depths)
+
+
+def create_transport(name: str):
+    if name == StreamTransport.name:
+        return StreamTransport()
+    if name == SortedSetTransport.name:
+        return SortedSetTransport()
+    raise ValueError(f"Unknown embodiment command transport: {name}")
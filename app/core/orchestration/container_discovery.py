@@ -6,8 +6,10 @@ Provides health monitoring, capability assessment, and network topology mapping.
 """
 
 import asyncio
+import hashlib
 import json
 import logging
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Set, Any
 from enum import Enum
@@ -18,6 +20,9 @@ import redis.asyncio as aioredis
 
 from ...config import settings
 from ...dependencies import get_redis
+from ...infrastructure.containers.docker_adapter import AsyncDockerClient
+from .container_registry import ContainerRegistry
+from .container_stats import ContainerStatsCollector, container_stats_collector
 
 logger = logging.getLogger(__name__)
 
@@ -46,15 +51,50 @@ class ContainerDiscoveryService:
     Service for discovering and monitoring container instances in the cluster.
     """
     
-    def __init__(self, redis_url: str = None):
+    HEALTH_DEADLINES_KEY = "containers:health_deadlines"
+    # Container lifecycle events that drive discovery; containers compatible only by image,
+    # env or network (not label) are picked up by the periodic resync
+    EVENT_FILTERS = {
+        "type": "container",
+        "event": ["start", "die", "destroy"],
+        "label": ["autogen.agent.capable=true"],
+    }
+    # In-container commands whose exit status decides a capability. Their answers depend on the
+    # image (plus mounts and GPU runtime), so they are cached per image fingerprint
+    EXEC_PROBES = {
+        ContainerCapability.AGENT_RUNNER: "test -f /app/agent_runner.py",
+        ContainerCapability.GPU_COMPUTE: "nvidia-smi",
+        ContainerCapability.STORAGE: "df -h /data",
+    }
+    CAPABILITY_CACHE_PREFIX = "containers:capability_cache:"
+    # Labels that differ between replicas of the same service and must not split the cache
+    REPLICA_LABEL_PREFIXES = (
+        "com.docker.compose.container-number",
+        "com.docker.compose.oneoff",
+        "com.docker.swarm.task",
+    )
+    
+    def __init__(self, redis_url: str = None, stats_collector: Optional[ContainerStatsCollector] = None,
+                 registry: Optional[ContainerRegistry] = None):
         self.redis_url = redis_url or settings.redis_url
         self.redis: Optional[aioredis.Redis] = None
-        self.docker_client: Optional[docker.DockerClient] = None
-        self.discovery_interval = 30  # seconds
+        # Container records are written through the registry so its summary and indexes stay in step
+        self.registry = registry or ContainerRegistry(self.redis_url)
+        self.docker: Optional[AsyncDockerClient] = None
+        self.stats_collector = stats_collector or container_stats_collector
+        self.discovery_interval = 30  # seconds, full scans while the event stream is down
+        self.resync_interval = 300  # seconds, full scans while the event stream is up
+        self.event_retry_interval = 5  # seconds
         self.health_check_interval = 15  # seconds
+        self.capability_cache_ttl = 7 * 24 * 3600  # seconds
         self.discovery_task: Optional[asyncio.Task] = None
+        self.events_task: Optional[asyncio.Task] = None
         self.health_monitor_task: Optional[asyncio.Task] = None
         self.known_containers: Set[str] = set()
+        self.events_connected = False
+        self._inspecting: Set[str] = set()
+        self._event_handlers: Set[asyncio.Task] = set()
+        self._probes_inflight: Dict[str, asyncio.Task] = {}
         
     async def start(self):
         """Start the container discovery service"""
@@ -62,35 +102,39 @@ class ContainerDiscoveryService:
             # Initialize Redis connection
             self.redis = await aioredis.from_url(self.redis_url)
             await self.redis.ping()
+            self.registry.redis = self.redis
             logger.info("Container discovery service connected to Redis")
             
-            # Initialize Docker client with explicit unix socket
+            # Initialize Docker client with explicit unix socket; all SDK calls go through the async adapter
             docker_connected = False
             try:
                 # Try unix socket first (most common in containers)
-                self.docker_client = docker.DockerClient(base_url='unix:///var/run/docker.sock')
-                self.docker_client.ping()  # Test connection
+                self.docker = await AsyncDockerClient.connect(
+                    lambda: docker.DockerClient(base_url='unix:///var/run/docker.sock')
+                )
                 logger.info("Container discovery service connected to Docker via unix socket")
                 docker_connected = True
             except Exception as e:
                 logger.warning(f"Failed to connect via unix socket: {e}")
                 try:
                     # Fallback to environment detection
-                    self.docker_client = docker.from_env()
-                    self.docker_client.ping()  # Test connection
+                    self.docker = await AsyncDockerClient.connect(docker.from_env)
                     logger.info("Container discovery service connected to Docker via environment")
                     docker_connected = True
                 except Exception as env_error:
                     logger.warning(f"Failed to connect to Docker: {env_error}")
                     logger.info("Container discovery will run in fallback mode - relying on agent self-registration")
-                    self.docker_client = None
+                    self.docker = None
             
             # Start discovery and monitoring tasks
             if docker_connected:
+                self.stats_collector.docker = self.docker
                 self.discovery_task = asyncio.create_task(self._discovery_loop())
+                self.events_task = asyncio.create_task(self._event_loop())
             else:
                 logger.info("Docker discovery disabled - using agent self-registration only")
                 
+            await self._seed_health_deadlines()
             self.health_monitor_task = asyncio.create_task(self._health_monitoring_loop())
             
             logger.info("Container discovery service started successfully")
@@ -103,26 +147,74 @@ class ContainerDiscoveryService:
         """Stop the container discovery service"""
         if self.discovery_task:
             self.discovery_task.cancel()
+        if self.events_task:
+            self.events_task.cancel()
+        for handler in list(self._event_handlers):
+            handler.cancel()
         if self.health_monitor_task:
             self.health_monitor_task.cancel()
         
+        if self.docker:
+            await self.stats_collector.stop()
+            await self.docker.close()
         if self.redis:
             await self.redis.close()
         
         logger.info("Container discovery service stopped")
     
     async def _discovery_loop(self):
-        """Main discovery loop that scans for new containers"""
+        """Full scan loop: a low-frequency resync behind the event stream, or polling without it"""
         while True:
             try:
                 await self._discover_containers()
-                await asyncio.sleep(self.discovery_interval)
+                await asyncio.sleep(self.resync_interval if self.events_connected else self.discovery_interval)
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error(f"Error in discovery loop: {e}")
                 await asyncio.sleep(self.discovery_interval)
     
+    async def _event_loop(self):
+        """Apply container lifecycle events from the Docker events stream as they arrive"""
+        reconnecting = False
+        while True:
+            try:
+                stream = await self.docker.events(filters=self.EVENT_FILTERS)
+                try:
+                    self.events_connected = True
+                    logger.info("Container discovery subscribed to Docker events")
+                    if reconnecting:
+                        # Events were missed while disconnected
+                        await self._discover_containers()
+                    async for event in stream:
+                        # Handle each event in its own task so a slow inspect doesn't hold up the stream
+                        handler = asyncio.create_task(self._handle_container_event(event))
+                        self._event_handlers.add(handler)
+                        handler.add_done_callback(self._event_handlers.discard)
+                finally:
+                    stream.close()
+                    self.events_connected = False
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.warning(f"Docker event stream interrupted: {e}")
+            reconnecting = True
+            await asyncio.sleep(self.event_retry_interval)
+    
+    async def _handle_container_event(self, event: Dict[str, Any]):
+        """Register started containers and unregister stopped or removed ones"""
+        action = event.get("Action") or event.get("status")
+        container_id = (event.get("id") or event.get("Actor", {}).get("ID", ""))[:12]
+        if not container_id:
+            return
+        
+        if action == "start":
+            await self._discover_container(container_id)
+        elif action in ("die", "destroy") and container_id in self.known_containers:
+            self.known_containers.discard(container_id)
+            await self._unregister_container(container_id)
+            logger.info(f"Container removed: {container_id}")
+    
     async def _health_monitoring_loop(self):
         """Health monitoring loop for known containers"""
         while True:
@@ -139,32 +231,21 @@ class ContainerDiscoveryService:
         """Discover containers in the network"""
         try:
             # Skip if Docker client is not available
-            if not self.docker_client:
+            if not self.docker:
                 return
                 
-            # Get all running containers
-            containers = self.docker_client.containers.list(all=False)
-            
-            for container in containers:
-                container_id = container.id[:12]
-                
-                # Skip if already known
-                if container_id in self.known_containers:
-                    continue
-                
-                # Check if container is compatible (has agent capabilities)
-                if await self._is_compatible_container(container):
-                    await self._register_container(container)
-                    self.known_containers.add(container_id)
-                    logger.info(f"Discovered new container: {container.name} ({container_id})")
+            # Get all running containers (ids only); only unknown ones are inspected, concurrently
+            containers = await self.docker.list_containers(all=False)
+            current_containers = {c.id[:12] for c in containers}
+            new_containers = [cid for cid in current_containers if cid not in self.known_containers]
+            await asyncio.gather(*(self._discover_container(cid) for cid in new_containers))
             
             # Check for removed containers
-            current_containers = {c.id[:12] for c in containers}
             removed_containers = self.known_containers - current_containers
             
             for container_id in removed_containers:
                 await self._unregister_container(container_id)
-                self.known_containers.remove(container_id)
+                self.known_containers.discard(container_id)
                 logger.info(f"Container removed: {container_id}")
                 
         except DockerException as e:
@@ -172,6 +253,28 @@ class ContainerDiscoveryService:
         except Exception as e:
             logger.error(f"Error discovering containers: {e}")
     
+    async def _discover_container(self, container_id: str):
+        """Inspect a newly seen container and register it if compatible"""
+        # The event stream and a resync can both report the same new container
+        if container_id in self.known_containers or container_id in self._inspecting:
+            return
+        self._inspecting.add(container_id)
+        try:
+            container = await self.docker.get_container(container_id)
+            
+            # Check if container is compatible (has agent capabilities)
+            if await self._is_compatible_container(container):
+                await self._register_container(container)
+                self.known_containers.add(container_id)
+                logger.info(f"Discovered new container: {container.name} ({container_id})")
+        except docker.errors.NotFound:
+            # Stopped between the listing and the inspect
+            pass
+        except Exception as e:
+            logger.error(f"Error inspecting container {container_id}: {e}")
+        finally:
+            self._inspecting.discard(container_id)
+    
     async def _is_compatible_container(self, container) -> bool:
         """Check if container is compatible with our agent system"""
         try:
@@ -183,7 +286,8 @@ class ContainerDiscoveryService:
                 return True
             
             # Check container image
-            if "autogen-agent" in container.image.tags[0] if container.image.tags else False:
+            image_tags = await self.docker.image_tags(container)
+            if "autogen-agent" in image_tags[0] if image_tags else False:
                 return True
             
             # Check environment variables
@@ -208,38 +312,106 @@ class ContainerDiscoveryService:
     async def _probe_container_capabilities(self, container) -> bool:
         """Probe container to check if it has agent capabilities"""
         try:
-            # Try to execute a capability check command
-            result = container.exec_run("test -f /app/agent_runner.py", demux=True)
-            return result.exit_code == 0
+            probes = await self._exec_probes(container)
+            return probes.get(ContainerCapability.AGENT_RUNNER.value, False)
         except:
             return False
     
+    def _probe_fingerprint(self, container) -> Optional[str]:
+        """Cache key for exec probe results: image ID plus the labels, mounts and GPU runtime
+        that can change the answers. None when the image ID is unknown (never cached)."""
+        attrs = container.attrs or {}
+        image_id = attrs.get("Image")
+        if not image_id:
+            return None
+        host_config = attrs.get("HostConfig") or {}
+        basis = {
+            "labels": {
+                k: v for k, v in (container.labels or {}).items()
+                if not k.startswith(self.REPLICA_LABEL_PREFIXES)
+            },
+            "mounts": sorted(m.get("Destination", "") for m in attrs.get("Mounts") or []),
+            "runtime": host_config.get("Runtime"),
+            "device_requests": host_config.get("DeviceRequests"),
+        }
+        digest = hashlib.sha256(json.dumps(basis, sort_keys=True, default=str).encode()).hexdigest()[:16]
+        return f"{image_id}:{digest}"
+    
+    async def _exec_probes(self, container) -> Dict[str, bool]:
+        """Exec probe results for the container, from the Redis cache when its image was seen before.
+        
+        Replicas starting together share one in-flight probe, so scaling a service out
+        runs the exec probes once per image rather than once per replica.
+        """
+        fingerprint = self._probe_fingerprint(container)
+        if fingerprint is None:
+            return await self._run_exec_probes(container, None)
+        
+        cache_key = f"{self.CAPABILITY_CACHE_PREFIX}{fingerprint}"
+        cached = await self.redis.get(cache_key)
+        if cached:
+            return json.loads(cached)
+        
+        task = self._probes_inflight.get(fingerprint)
+        if task is None:
+            task = asyncio.create_task(self._run_exec_probes(container, cache_key))
+            self._probes_inflight[fingerprint] = task
+            task.add_done_callback(lambda _: self._probes_inflight.pop(fingerprint, None))
+        return await asyncio.shield(task)
+    
+    async def _run_exec_probes(self, container, cache_key: Optional[str]) -> Dict[str, bool]:
+        """Run every exec probe concurrently and cache the answers if all of them completed"""
+        results = await asyncio.gather(
+            *(self.docker.exec_run(container, command) for command in self.EXEC_PROBES.values()),
+            return_exceptions=True,
+        )
+        probes = {
+            capability.value: not isinstance(result, BaseException) and result.exit_code == 0
+            for capability, result in zip(self.EXEC_PROBES, results)
+        }
+        # A probe that errored or timed out says nothing about the image
+        if cache_key and not any(isinstance(result, BaseException) for result in results):
+            await self.redis.set(cache_key, json.dumps(probes), ex=self.capability_cache_ttl)
+        return probes
+    
     async def _register_container(self, container):
         """Register a discovered container"""
         try:
+            # A one-shot stats sample skips dockerd's second sampling cycle so the container is
+            # registered well within a second; the first health check takes a proper CPU reading
+            image_tags, stats = await asyncio.gather(
+                self.docker.image_tags(container),
+                self.docker.stats(container, one_shot=True),
+                return_exceptions=True,
+            )
+            if isinstance(image_tags, BaseException):
+                image_tags = []
+            if isinstance(stats, BaseException):
+                logger.warning(f"Could not read stats of container {container.id[:12]}: {stats}")
+                stats = None
+            capabilities = await self._assess_capabilities(container, stats)
+            resources = await self._get_container_resources(container, stats) if stats else {}
             container_info = {
                 "id": container.id[:12],
                 "name": container.name,
-                "image": container.image.tags[0] if container.image.tags else "unknown",
+                "image": image_tags[0] if image_tags else "unknown",
                 "status": ContainerStatus.DISCOVERED,
                 "discovered_at": datetime.utcnow().isoformat(),
                 "last_health_check": datetime.utcnow().isoformat(),
-                "capabilities": await self._assess_capabilities(container),
-                "resources": await self._get_container_resources(container),
+                "last_heartbeat": datetime.utcnow().isoformat(),
+                "capabilities": capabilities,
+                "resources": resources,
                 "network_info": self._get_network_info(container),
                 "labels": container.labels,
                 "health_score": 100
             }
             
-            # Store in Redis
-            container_key = f"container:registry:{container.id[:12]}"
-            await self.redis.hset(container_key, mapping={
-                k: json.dumps(v) if isinstance(v, (dict, list)) else str(v)
-                for k, v in container_info.items()
-            })
-            
-            # Add to active containers set
-            await self.redis.sadd("containers:active", container.id[:12])
+            # Store in Redis, active and due for a health check one interval from now
+            await self.registry.update_fields(
+                container.id[:12], container_info, queue=self._activate(container.id[:12]), create=True
+            )
+            # Health checks read resources from the streaming stats buffer from here on
+            self.stats_collector.track(container.id[:12])
             
             # Publish discovery event
             await self.redis.publish("events:container:discovered", json.dumps({
@@ -254,16 +426,19 @@ class ContainerDiscoveryService:
     
     async def _unregister_container(self, container_id: str):
         """Unregister a removed container"""
+        self.stats_collector.untrack(container_id)
         try:
-            # Update status
-            container_key = f"container:registry:{container_id}"
-            await self.redis.hset(container_key, "status", ContainerStatus.TERMINATED)
-            
-            # Remove from active set
-            await self.redis.srem("containers:active", container_id)
-            
-            # Add to terminated set
-            await self.redis.sadd("containers:terminated", container_id)
+            # Mark terminated, move from the active to the terminated set and stop health checks
+            def terminate(pipe):
+                pipe.srem("containers:active", container_id)
+                pipe.sadd("containers:terminated", container_id)
+                pipe.zrem(self.HEALTH_DEADLINES_KEY, container_id)
+            
+            if not await self.registry.update_fields(container_id, {"status": ContainerStatus.TERMINATED}, queue=terminate):
+                # Already gone from the registry; only the discovery sets are left to clean up
+                async with self.redis.pipeline(transaction=True) as pipe:
+                    terminate(pipe)
+                    await pipe.execute()
             
             # Publish removal event
             await self.redis.publish("events:container:removed", json.dumps({
@@ -275,30 +450,43 @@ class ContainerDiscoveryService:
         except Exception as e:
             logger.error(f"Error unregistering container: {e}")
     
-    async def _assess_capabilities(self, container) -> List[str]:
-        """Assess container capabilities"""
+    async def _forget_container(self, container_id: str):
+        """
+        Stop tracking a container whose registry record is gone (e.g. reaped after
+        failed health checks), so the next discovery pass registers it afresh.
+        """
+        self.known_containers.discard(container_id)
+        self.stats_collector.untrack(container_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.srem("containers:active", container_id)
+            pipe.zrem(self.HEALTH_DEADLINES_KEY, container_id)
+            await pipe.execute()
+        logger.info(f"Container {container_id} no longer in the registry, will be rediscovered")
+    
+    async def _assess_capabilities(self, container, stats: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Assess container capabilities, reusing `stats` when the caller already has a sample"""
         capabilities = []
         
         try:
-            # Check for agent runner capability
-            result = container.exec_run("test -f /app/agent_runner.py", demux=True)
-            if result.exit_code == 0:
-                capabilities.append(ContainerCapability.AGENT_RUNNER)
-            
-            # Check for GPU support
-            result = container.exec_run("nvidia-smi", demux=True)
-            if result.exit_code == 0:
-                capabilities.append(ContainerCapability.GPU_COMPUTE)
-            
-            # Check memory resources
-            stats = container.stats(stream=False)
-            memory_limit = stats.get("memory_stats", {}).get("limit", 0)
+            # Exec probes (cached per image) and the memory reading run concurrently; a failed
+            # probe only loses its own capability
+            probes, stats = await asyncio.gather(
+                self._exec_probes(container),
+                self.docker.stats(container) if stats is None else asyncio.sleep(0, result=stats),
+                return_exceptions=True,
+            )
+            
+            if isinstance(probes, BaseException):
+                logger.error(f"Error probing container capabilities: {probes}")
+                probes = {}
+            for capability in (ContainerCapability.AGENT_RUNNER, ContainerCapability.GPU_COMPUTE):
+                if probes.get(capability.value):
+                    capabilities.append(capability)
+            # Memory limits are per container, so this is never cached
+            memory_limit = stats.get("memory_stats", {}).get("limit", 0) if isinstance(stats, dict) else 0
             if memory_limit > 8 * 1024 * 1024 * 1024:  # 8GB
                 capabilities.append(ContainerCapability.HIGH_MEMORY)
-            
-            # Check for storage capability
-            result = container.exec_run("df -h /data", demux=True)
-            if result.exit_code == 0:
+            if probes.get(ContainerCapability.STORAGE.value):
                 capabilities.append(ContainerCapability.STORAGE)
             
         except Exception as e:
@@ -306,17 +494,25 @@ class ContainerDiscoveryService:
         
         return capabilities
     
-    async def _get_container_resources(self, container) -> Dict[str, Any]:
-        """Get container resource information"""
+    async def _get_container_resources(self, container, stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Get container resource information: from `stats` if given, else the streaming stats
+        buffer, sampling dockerd directly only when the buffer has nothing current"""
+        if stats is None:
+            buffered = self.stats_collector.resources(container.id[:12])
+            if buffered is not None:
+                return buffered
         try:
-            stats = container.stats(stream=False)
-            
-            # Calculate CPU percentage
-            cpu_delta = stats["cpu_stats"]["cpu_usage"]["total_usage"] - \
-                       stats["precpu_stats"]["cpu_usage"]["total_usage"]
-            system_delta = stats["cpu_stats"]["system_cpu_usage"] - \
-                          stats["precpu_stats"]["system_cpu_usage"]
-            cpu_percent = (cpu_delta / system_delta) * 100.0 if system_delta > 0 else 0.0
+            if stats is None:
+                stats = await self.docker.stats(container)
+            
+            # Calculate CPU percentage (a one-shot sample has no previous reading: report 0)
+            precpu = stats.get("precpu_stats", {})
+            if precpu.get("system_cpu_usage"):
+                cpu_delta = stats["cpu_stats"]["cpu_usage"]["total_usage"] - precpu["cpu_usage"]["total_usage"]
+                system_delta = stats["cpu_stats"]["system_cpu_usage"] - precpu["system_cpu_usage"]
+                cpu_percent = (cpu_delta / system_delta) * 100.0 if system_delta > 0 else 0.0
+            else:
+                cpu_percent = 0.0
             
             return {
                 "cpu_count": stats["cpu_stats"]["online_cpus"],
@@ -351,15 +547,37 @@ class ContainerDiscoveryService:
             logger.error(f"Error getting network info: {e}")
             return {}
     
+    def _schedule_health_check(self, pipe, container_id: str, delay: Optional[float] = None):
+        """Queue the container's next health-check deadline on `pipe`"""
+        due = time.time() + (self.health_check_interval if delay is None else delay)
+        pipe.zadd(self.HEALTH_DEADLINES_KEY, {container_id: due})
+    
+    def _activate(self, container_id: str):
+        """Registry `queue` callback adding the container to the active set with a health-check deadline"""
+        def queue(pipe):
+            pipe.sadd("containers:active", container_id)
+            self._schedule_health_check(pipe, container_id)
+        return queue
+    
+    async def _seed_health_deadlines(self):
+        """Give active containers registered before the deadline index existed a deadline"""
+        active_containers = await self.redis.smembers("containers:active")
+        if active_containers:
+            await self.redis.zadd(self.HEALTH_DEADLINES_KEY, {cid: time.time() for cid in active_containers}, nx=True)
+    
     async def _check_container_health(self):
-        """Check health of all active containers"""
+        """Check the containers whose health-check deadline has passed"""
         try:
-            # Get active containers from Redis
-            active_containers = await self.redis.smembers("containers:active")
-            
-            for container_id_bytes in active_containers:
-                container_id = container_id_bytes.decode() if isinstance(container_id_bytes, bytes) else container_id_bytes
-                await self._health_check_container(container_id)
+            # Only due containers are read: cost scales with the number due, not the cluster size
+            due_containers = await self.redis.zrangebyscore(self.HEALTH_DEADLINES_KEY, "-inf", time.time())
+            
+            # Check them concurrently; the Docker adapter bounds how many SDK calls run at once
+            await asyncio.gather(*(
+                self._health_check_container(
+                    container_id_bytes.decode() if isinstance(container_id_bytes, bytes) else container_id_bytes
+                )
+                for container_id_bytes in due_containers
+            ))
                 
         except Exception as e:
             logger.error(f"Error in container health check: {e}")
@@ -367,65 +585,72 @@ class ContainerDiscoveryService:
     async def _health_check_container(self, container_id: str):
         """Perform health check on a specific container"""
         try:
+            def schedule(pipe):
+                self._schedule_health_check(pipe, container_id)
+            
             # Skip Docker-based health checks if client is not available
-            if not self.docker_client:
-                # Use Redis-based health checks only
-                container_key = f"container:registry:{container_id}"
-                container_data = await self.redis.hgetall(container_key)
-                if container_data:
-                    await self.redis.hset(container_key, mapping={
-                        "last_health_check": datetime.utcnow().isoformat()
-                    })
+            if not self.docker:
+                # Use Redis-based health checks only; self-registered containers heartbeat on their own
+                if not await self.registry.update_fields(
+                    container_id, {"last_health_check": datetime.utcnow().isoformat()}, queue=schedule
+                ):
+                    await self._forget_container(container_id)
                 return
                 
-            container = self.docker_client.containers.get(container_id)
-            container_key = f"container:registry:{container_id}"
+            container = await self.docker.get_container(container_id)
             
             # Get current container info
-            container_data = await self.redis.hgetall(container_key)
-            if not container_data:
+            if not await self.redis.exists(f"container:registry:{container_id}"):
+                await self._forget_container(container_id)
                 return
             
+            # Docker still knowing the container counts as a heartbeat for the registry's reaper
+            now = datetime.utcnow().isoformat()
+            
             # Check container status
             if container.status != "running":
-                await self.redis.hset(container_key, mapping={
+                await self.registry.update_fields(container_id, {
                     "status": ContainerStatus.UNHEALTHY,
                     "health_score": 0,
-                    "last_health_check": datetime.utcnow().isoformat()
-                })
+                    "last_health_check": now,
+                    "last_heartbeat": now,
+                }, queue=schedule)
                 return
             
             # Calculate health score
             health_score = 100
             
-            # Check resource usage
-            resources = await self._get_container_resources(container)
+            # Read resource usage and ping the agent endpoint concurrently
+            resources, endpoint = await asyncio.gather(
+                self._get_container_resources(container),
+                self.docker.exec_run(container, "curl -f http://localhost:8001/health"),
+                return_exceptions=True,
+            )
             if resources.get("cpu_usage_percent", 0) > 90:
                 health_score -= 20
             if resources.get("memory_percent", 0) > 90:
                 health_score -= 20
             
-            # Try to ping agent endpoint if available
-            try:
-                result = container.exec_run("curl -f http://localhost:8001/health", demux=True)
-                if result.exit_code != 0:
-                    health_score -= 30
-            except:
-                pass
-            
-            # Update health information
-            await self.redis.hset(container_key, mapping={
+            # An endpoint that could not be probed is not penalized
+            if not isinstance(endpoint, BaseException) and endpoint.exit_code != 0:
+                health_score -= 30
+            
+            # Update health information and schedule the next check
+            await self.registry.update_fields(container_id, {
                 "status": ContainerStatus.ACTIVE if health_score > 50 else ContainerStatus.UNHEALTHY,
                 "health_score": health_score,
-                "last_health_check": datetime.utcnow().isoformat(),
-                "resources": json.dumps(resources)
-            })
+                "last_health_check": now,
+                "last_heartbeat": now,
+                "resources": resources,
+            }, queue=schedule)
             
         except docker.errors.NotFound:
             # Container no longer exists
             await self._unregister_container(container_id)
         except Exception as e:
             logger.error(f"Error checking health of container {container_id}: {e}")
+            # Retry on the next regular interval rather than on every pass
+            await self.redis.zadd(self.HEALTH_DEADLINES_KEY, {container_id: time.time() + self.health_check_interval}, xx=True)
     
     async def get_available_containers(self, capability: Optional[ContainerCapability] = None) -> List[Dict[str, Any]]:
         """Get list of available containers, optionally filtered by capability"""
@@ -475,9 +700,12 @@ class ContainerDiscoveryService:
         return {
             "known_containers": len(self.known_containers),
             "discovery_interval": self.discovery_interval,
+            "resync_interval": self.resync_interval,
+            "event_stream_connected": self.events_connected,
             "health_check_interval": self.health_check_interval,
             "discovery_running": self.discovery_task is not None and not self.discovery_task.done(),
             "health_monitoring_running": self.health_monitor_task is not None and not self.health_monitor_task.done(),
+            "stats_collector": self.stats_collector.get_stats(),
         }
     
     async def force_discovery_scan(self):
@@ -577,6 +805,7 @@ class ContainerDiscoveryService:
                 "status": ContainerStatus.ACTIVE,
                 "discovered_at": datetime.utcnow().isoformat(),
                 "last_health_check": datetime.utcnow().isoformat(),
+                "last_heartbeat": datetime.utcnow().isoformat(),
                 "capabilities": container_info.get("capabilities", [ContainerCapability.AGENT_RUNNER]),
                 "resources": container_info.get("resources", {}),
                 "network_info": container_info.get("network_info", {}),
@@ -587,15 +816,10 @@ class ContainerDiscoveryService:
                 "registration_method": "self_registration"
             }
             
-            # Store in Redis
-            container_key = f"container:registry:{container_id}"
-            await self.redis.hset(container_key, mapping={
-                k: json.dumps(v) if isinstance(v, (dict, list)) else str(v)
-                for k, v in registration_data.items()
-            })
-            
-            # Add to active containers set
-            await self.redis.sadd("containers:active", container_id)
+            # Store in Redis, active and due for a health check one interval from now
+            await self.registry.update_fields(
+                container_id, registration_data, queue=self._activate(container_id), create=True
+            )
             self.known_containers.add(container_id)
             
             # Publish discovery event
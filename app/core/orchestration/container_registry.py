@@ -8,11 +8,13 @@ Provides container capability tracking, resource monitoring, and health status m
 import asyncio
 import json
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Set
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 from enum import Enum
 
 import redis.asyncio as aioredis
+from redis.exceptions import WatchError
 from pydantic import BaseModel, Field
 
 from ...config import settings
@@ -49,12 +51,36 @@ class ContainerRegistry:
     Central registry for managing container registrations and lifecycle.
     """
     
+    JSON_FIELDS = ("capabilities", "resources", "metadata")
+    ACTIVE_STATUSES = ("active", "ContainerStatus.ACTIVE")
+    BULK_CHUNK_SIZE = 500
+    SUMMARY_KEY = "containers:summary"
+    SUMMARY_CAPABILITIES_KEY = "containers:summary:capabilities"
+    SUMMARY_COUNTERS = ("total_containers", "active_containers")
+    SUMMARY_WRITE_RETRIES = 5
+    STATE_FIELDS = ("status", "resources", "capabilities", "host_address", "health_score", "last_heartbeat")
+    STATUS_INDEX_PREFIX = "containers:status:"
+    HOST_INDEX_PREFIX = "containers:host:"
+    HEALTH_INDEX_KEY = "containers:by_health"
+    HEARTBEAT_INDEX_KEY = "containers:by_heartbeat"
+    FREE_MEMORY_INDEX_KEY = "containers:by_free_memory"
+    SORT_INDEXES = {
+        "health_score": HEALTH_INDEX_KEY,
+        "last_heartbeat": HEARTBEAT_INDEX_KEY,
+        "free_memory": FREE_MEMORY_INDEX_KEY,
+    }
+    DEADLINE_INDEX_KEY = "containers:heartbeat_deadlines"
+    ZSET_INDEXES = (HEALTH_INDEX_KEY, HEARTBEAT_INDEX_KEY, FREE_MEMORY_INDEX_KEY, DEADLINE_INDEX_KEY)
+    REAP_BATCH_SIZE = 100
+    
     def __init__(self, redis_url: str = None):
         self.redis_url = redis_url or settings.redis_url
         self.redis: Optional[aioredis.Redis] = None
         self.heartbeat_timeout = 60  # seconds
         self.cleanup_interval = 30  # seconds
         self.cleanup_task: Optional[asyncio.Task] = None
+        self.reconcile_interval = 300  # seconds
+        self.reconcile_task: Optional[asyncio.Task] = None
         self.event_handlers: Dict[str, List[callable]] = {}
         
     async def start(self):
@@ -63,8 +89,9 @@ class ContainerRegistry:
             self.redis = await aioredis.from_url(self.redis_url)
             await self.redis.ping()
             
-            # Start cleanup task
+            # Start cleanup and summary reconciliation tasks
             self.cleanup_task = asyncio.create_task(self._cleanup_loop())
+            self.reconcile_task = asyncio.create_task(self._reconcile_loop())
             
             # Subscribe to container events
             asyncio.create_task(self._event_listener())
@@ -77,8 +104,9 @@ class ContainerRegistry:
     
     async def stop(self):
         """Stop the container registry service"""
-        if self.cleanup_task:
-            self.cleanup_task.cancel()
+        for task in (self.cleanup_task, self.reconcile_task):
+            if task:
+                task.cancel()
         
         if self.redis:
             await self.redis.close()
@@ -96,28 +124,32 @@ class ContainerRegistry:
                 logger.warning(f"Container {registration.container_id} already registered")
                 return await self.update_container(registration)
             
-            # Store registration
-            await self.redis.hset(container_key, mapping={
-                "container_id": registration.container_id,
-                "container_name": registration.container_name,
-                "host_address": registration.host_address,
-                "api_endpoint": registration.api_endpoint,
-                "capabilities": json.dumps(registration.capabilities),
-                "resources": json.dumps(registration.resources),
-                "metadata": json.dumps(registration.metadata),
-                "registered_at": registration.registered_at,
-                "last_heartbeat": registration.last_heartbeat,
-                "status": registration.status,
-                "health_score": registration.health_score
-            })
-            
-            # Add to indices
-            await self.redis.sadd("containers:registered", registration.container_id)
-            await self.redis.hset("containers:by_name", registration.container_name, registration.container_id)
-            
-            # Add to capability indices
-            for capability in registration.capabilities:
-                await self.redis.sadd(f"containers:capability:{capability}", registration.container_id)
+            def write(pipe, old):
+                # Store registration
+                pipe.hset(container_key, mapping={
+                    "container_id": registration.container_id,
+                    "container_name": registration.container_name,
+                    "host_address": registration.host_address,
+                    "api_endpoint": registration.api_endpoint,
+                    "capabilities": json.dumps(registration.capabilities),
+                    "resources": json.dumps(registration.resources),
+                    "metadata": json.dumps(registration.metadata),
+                    "registered_at": registration.registered_at,
+                    "last_heartbeat": registration.last_heartbeat,
+                    "status": registration.status,
+                    "health_score": registration.health_score
+                })
+                
+                # Add to indices
+                pipe.sadd("containers:registered", registration.container_id)
+                pipe.hset("containers:by_name", registration.container_name, registration.container_id)
+                
+                # Add to capability indices
+                for capability in registration.capabilities:
+                    pipe.sadd(f"containers:capability:{capability}", registration.container_id)
+                return self._container_state(registration.dict())
+            
+            await self._transact(registration.container_id, write)
             
             # Publish registration event
             await self._publish_event(ContainerEvent(
@@ -138,27 +170,27 @@ class ContainerRegistry:
         try:
             container_key = f"container:registry:{registration.container_id}"
             
-            # Update registration
-            await self.redis.hset(container_key, mapping={
-                "host_address": registration.host_address,
-                "api_endpoint": registration.api_endpoint,
-                "capabilities": json.dumps(registration.capabilities),
-                "resources": json.dumps(registration.resources),
-                "metadata": json.dumps(registration.metadata),
-                "last_heartbeat": registration.last_heartbeat,
-                "status": registration.status,
-                "health_score": registration.health_score
-            })
-            
-            # Update capability indices
-            # First remove from all capability sets
-            all_capabilities = await self.redis.keys("containers:capability:*")
-            for cap_key in all_capabilities:
-                await self.redis.srem(cap_key, registration.container_id)
-            
-            # Then add to new capability sets
-            for capability in registration.capabilities:
-                await self.redis.sadd(f"containers:capability:{capability}", registration.container_id)
+            def write(pipe, old):
+                # Update registration
+                pipe.hset(container_key, mapping={
+                    "host_address": registration.host_address,
+                    "api_endpoint": registration.api_endpoint,
+                    "capabilities": json.dumps(registration.capabilities),
+                    "resources": json.dumps(registration.resources),
+                    "metadata": json.dumps(registration.metadata),
+                    "last_heartbeat": registration.last_heartbeat,
+                    "status": registration.status,
+                    "health_score": registration.health_score
+                })
+                
+                # Update capability indices: leave the previous capability sets, join the new ones
+                for capability in (old or {}).get("capabilities", []):
+                    pipe.srem(f"containers:capability:{capability}", registration.container_id)
+                for capability in registration.capabilities:
+                    pipe.sadd(f"containers:capability:{capability}", registration.container_id)
+                return self._container_state(registration.dict())
+            
+            await self._transact(registration.container_id, write)
             
             # Publish update event
             await self._publish_event(ContainerEvent(
@@ -173,8 +205,15 @@ class ContainerRegistry:
             logger.error(f"Error updating container: {e}")
             return False
     
-    async def deregister_container(self, container_id: str, reason: str = "manual") -> bool:
-        """Deregister a container"""
+    async def deregister_container(self, container_id: str, reason: str = "manual",
+                                   expired_before: Optional[float] = None) -> bool:
+        """
+        Deregister a container.
+        
+        With `expired_before` (epoch seconds) the container is only removed if
+        its heartbeat deadline is still at or before that time, so a heartbeat
+        racing the reaper keeps it registered.
+        """
         try:
             container_key = f"container:registry:{container_id}"
             
@@ -184,34 +223,40 @@ class ContainerRegistry:
                 logger.warning(f"Container {container_id} not found")
                 return False
             
-            # Update status
-            await self.redis.hset(container_key, "status", "deregistered")
+            container_name = self._decode(container_data.get(b"container_name", b""))
             
-            # Remove from indices
-            await self.redis.srem("containers:registered", container_id)
-            
-            # Remove from capability indices
-            capabilities_raw = container_data.get(b"capabilities", b"[]")
-            capabilities = json.loads(capabilities_raw.decode() if isinstance(capabilities_raw, bytes) else capabilities_raw)
-            for capability in capabilities:
-                await self.redis.srem(f"containers:capability:{capability}", container_id)
-            
-            # Remove from name index
-            container_name = container_data.get(b"container_name", b"").decode()
-            if container_name:
-                await self.redis.hdel("containers:by_name", container_name)
+            def write(pipe, old):
+                # Remove from indices
+                pipe.srem("containers:registered", container_id)
+                
+                # Remove from capability indices
+                for capability in (old or {}).get("capabilities", []):
+                    pipe.srem(f"containers:capability:{capability}", container_id)
+                
+                # Remove from name index
+                if container_name:
+                    pipe.hdel("containers:by_name", container_name)
+                
+                # Archive the container data
+                archive = {self._decode(k): self._decode(v) for k, v in container_data.items()}
+                archive.update({
+                    "deregistered_at": datetime.utcnow().isoformat(),
+                    "deregister_reason": reason,
+                })
+                pipe.hset(f"container:archive:{container_id}", mapping=archive)
+                
+                # Delete active registration
+                pipe.delete(container_key)
+                return None
             
-            # Archive the container data
-            await self.redis.hset(f"container:archive:{container_id}", mapping={
-                k.decode() if isinstance(k, bytes) else k: v.decode() if isinstance(v, bytes) else v
-                for k, v in container_data.items()
-            })
-            await self.redis.hset(f"container:archive:{container_id}", 
-                                "deregistered_at", datetime.utcnow().isoformat(),
-                                "deregister_reason", reason)
+            def still_expired(old):
+                return old is not None and (
+                    expired_before is None or self._deadline(old) <= expired_before
+                )
             
-            # Delete active registration
-            await self.redis.delete(container_key)
+            if not await self._transact(container_id, write, precondition=still_expired):
+                logger.info(f"Container {container_id} not deregistered: heartbeat arrived or already gone")
+                return False
             
             # Publish deregistration event
             await self._publish_event(ContainerEvent(
@@ -232,14 +277,8 @@ class ContainerRegistry:
         try:
             container_key = f"container:registry:{container_id}"
             
-            # Check if container exists
-            exists = await self.redis.exists(container_key)
-            if not exists:
-                logger.warning(f"Heartbeat from unknown container: {container_id}")
-                return False
-            
             # Update heartbeat
-            updates = {
+            changes = {
                 "last_heartbeat": datetime.utcnow().isoformat(),
                 "status": "active"
             }
@@ -247,11 +286,19 @@ class ContainerRegistry:
             # Update health data if provided
             if health_data:
                 if "health_score" in health_data:
-                    updates["health_score"] = health_data["health_score"]
+                    changes["health_score"] = health_data["health_score"]
                 if "resources" in health_data:
-                    updates["resources"] = json.dumps(health_data["resources"])
+                    changes["resources"] = health_data["resources"]
+            updates = {k: json.dumps(v) if k in self.JSON_FIELDS else v for k, v in changes.items()}
             
-            await self.redis.hset(container_key, mapping=updates)
+            def write(pipe, old):
+                pipe.hset(container_key, mapping=updates)
+                return self._container_state({**old, **changes})
+            
+            # Only existing containers are updated
+            if not await self._transact(container_id, write, precondition=lambda old: old is not None):
+                logger.warning(f"Heartbeat from unknown container: {container_id}")
+                return False
             
             return True
             
@@ -259,73 +306,209 @@ class ContainerRegistry:
             logger.error(f"Error updating heartbeat: {e}")
             return False
     
-    async def get_container(self, container_id: str) -> Optional[Dict[str, Any]]:
+    async def update_fields(self, container_id: str, fields: Dict[str, Any],
+                            queue: Optional[Callable] = None, create: bool = False) -> bool:
+        """
+        Write some fields of a container record, keeping the summary and indexes in step.
+        
+        Dict and list values are stored as JSON and enum values by their value.
+        `queue(pipe)` may add the caller's own writes to the same MULTI. With
+        `create` the container is registered if it is not yet; otherwise nothing
+        is written, and False returned, for a container that is not registered.
+        """
+        container_key = f"container:registry:{container_id}"
+        fields = {k: v.value if isinstance(v, Enum) else v for k, v in fields.items()}
+        encoded = {k: json.dumps(v) if isinstance(v, (dict, list)) else v for k, v in fields.items()}
+        
+        def write(pipe, old):
+            pipe.hset(container_key, mapping=encoded)
+            if old is None:
+                pipe.sadd("containers:registered", container_id)
+            if queue is not None:
+                queue(pipe)
+            return self._container_state({**(old or {}), **fields})
+        
+        precondition = None if create else (lambda old: old is not None)
+        return await self._transact(container_id, write, precondition=precondition)
+    
+    async def get_container(self, container_id: str, fields: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
         """Get container information"""
         try:
-            container_key = f"container:registry:{container_id}"
-            container_data = await self.redis.hgetall(container_key)
-            
-            if not container_data:
-                return None
-            
-            # Parse container data
-            container_info = {}
-            for key, value in container_data.items():
-                key_str = key.decode() if isinstance(key, bytes) else key
-                value_str = value.decode() if isinstance(value, bytes) else value
-                
-                if key_str in ["capabilities", "resources", "metadata"]:
-                    try:
-                        container_info[key_str] = json.loads(value_str)
-                    except:
-                        container_info[key_str] = value_str
-                else:
-                    container_info[key_str] = value_str
-            
-            return container_info
+            async for container_info in self.iter_containers([container_id], fields):
+                return container_info
+            return None
             
         except Exception as e:
             logger.error(f"Error getting container info: {e}")
             return None
     
-    async def get_containers_by_capability(self, capability: str) -> List[Dict[str, Any]]:
-        """Get all containers with a specific capability"""
+    async def get_containers(self, container_ids: Iterable[str],
+                             fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Bulk fetch: one pipelined round-trip per BULK_CHUNK_SIZE ids, unknown ids skipped"""
+        return [container async for container in self.iter_containers(container_ids, fields)]
+    
+    async def iter_containers(self, container_ids: Optional[Iterable[str]] = None,
+                              fields: Optional[Sequence[str]] = None,
+                              active_only: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield containers, fetched in pipelined chunks and parsed one row at a time.
+        
+        With `fields`, only those hash fields (plus container_id) are read with
+        HMGET and JSON-decoded. Defaults to every registered container.
+        """
+        if container_ids is None:
+            container_ids = await self.redis.smembers("containers:registered")
+        ids = [cid.decode() if isinstance(cid, bytes) else cid for cid in container_ids]
+        read_fields = None
+        if fields is not None:
+            read_fields = list(dict.fromkeys(["container_id", *fields, *(["status"] if active_only else [])]))
+        
+        for offset in range(0, len(ids), self.BULK_CHUNK_SIZE):
+            chunk = ids[offset:offset + self.BULK_CHUNK_SIZE]
+            for container_id, row in zip(chunk, await self._fetch_rows(chunk, read_fields)):
+                if not row:
+                    continue
+                if active_only and self._decode(row.get(b"status", row.get("status"))) not in self.ACTIVE_STATUSES:
+                    continue
+                container = self._parse_row(row, fields)
+                container.setdefault("container_id", container_id)
+                yield container
+    
+    async def _fetch_rows(self, container_ids: Sequence[str],
+                          fields: Optional[Sequence[str]] = None) -> List[Dict[Any, Any]]:
+        """Raw hashes for `container_ids` in one pipeline (HMGET when projecting); {} for unknown ids"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for container_id in container_ids:
+                if fields is None:
+                    pipe.hgetall(f"container:registry:{container_id}")
+                else:
+                    pipe.hmget(f"container:registry:{container_id}", list(fields))
+            results = await pipe.execute()
+        if fields is None:
+            return results
+        return [
+            {field: value for field, value in zip(fields, values) if value is not None}
+            for values in results
+        ]
+    
+    @staticmethod
+    def _decode(value: Any) -> Any:
+        return value.decode() if isinstance(value, bytes) else value
+    
+    def _parse_row(self, row: Dict[Any, Any], fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """Decode a raw hash, JSON-parsing only the structured fields that were asked for"""
+        wanted = None if fields is None else set(fields) | {"container_id"}
+        container_info = {}
+        for key, value in row.items():
+            key_str = self._decode(key)
+            if wanted is not None and key_str not in wanted:
+                continue
+            value_str = self._decode(value)
+            if key_str in self.JSON_FIELDS:
+                try:
+                    container_info[key_str] = json.loads(value_str)
+                except (TypeError, ValueError):
+                    container_info[key_str] = value_str
+            else:
+                container_info[key_str] = value_str
+        return container_info
+    
+    async def get_containers_by_capability(self, capability: str,
+                                           fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Get all active containers with a specific capability"""
         try:
             container_ids = await self.redis.smembers(f"containers:capability:{capability}")
-            containers = []
-            
-            for container_id_bytes in container_ids:
-                container_id = container_id_bytes.decode() if isinstance(container_id_bytes, bytes) else container_id_bytes
-                container_info = await self.get_container(container_id)
-                if container_info and container_info.get("status") in ["active", "ContainerStatus.ACTIVE"]:
-                    containers.append(container_info)
-            
-            return containers
+            return [
+                container async for container in
+                self.iter_containers(container_ids, fields, active_only=True)
+            ]
             
         except Exception as e:
             logger.error(f"Error getting containers by capability: {e}")
             return []
     
-    async def get_all_containers(self, include_inactive: bool = False) -> List[Dict[str, Any]]:
-        """Get all registered containers"""
+    async def get_all_containers(self, include_inactive: bool = False,
+                                 fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Get all registered containers, optionally projected to `fields`"""
         try:
-            container_ids = await self.redis.smembers("containers:registered")
-            containers = []
-            
-            for container_id_bytes in container_ids:
-                container_id = container_id_bytes.decode() if isinstance(container_id_bytes, bytes) else container_id_bytes
-                container_info = await self.get_container(container_id)
-                
-                if container_info:
-                    if include_inactive or container_info.get("status") in ["active", "ContainerStatus.ACTIVE"]:
-                        containers.append(container_info)
-            
-            return containers
+            return [
+                container async for container in
+                self.iter_containers(fields=fields, active_only=not include_inactive)
+            ]
             
         except Exception as e:
             logger.error(f"Error getting all containers: {e}")
             return []
     
+    async def query_containers(
+        self,
+        status: Optional[str] = "active",
+        capabilities: Sequence[str] = (),
+        host: Optional[str] = None,
+        min_health: Optional[float] = None,
+        max_health: Optional[float] = None,
+        min_free_memory: Optional[float] = None,
+        heartbeat_since: Optional[datetime] = None,
+        sort_by: Optional[str] = None,
+        descending: bool = True,
+        limit: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Containers matching every given filter, answered from the secondary indexes.
+        
+        Set filters (status, capabilities, host) are intersected with SINTER and
+        range filters read with ZRANGEBYSCORE in one pipeline; only the rows of
+        the final page are fetched. `sort_by` is a key of SORT_INDEXES, e.g.
+        active containers with capability X and health > 70 by free memory:
+        
+            query_containers(capabilities=["X"], min_health=70, sort_by="free_memory")
+        """
+        if sort_by is not None and sort_by not in self.SORT_INDEXES:
+            raise ValueError(f"Unknown sort key: {sort_by} (expected one of {sorted(self.SORT_INDEXES)})")
+        
+        set_keys = [f"containers:capability:{capability}" for capability in capabilities]
+        if status:
+            set_keys.append(f"{self.STATUS_INDEX_PREFIX}{self._status_index(status)}")
+        if host:
+            set_keys.append(f"{self.HOST_INDEX_PREFIX}{host}")
+        
+        ranges = []
+        if min_health is not None or max_health is not None:
+            ranges.append((self.HEALTH_INDEX_KEY,
+                           "-inf" if min_health is None else min_health,
+                           "+inf" if max_health is None else max_health))
+        if min_free_memory is not None:
+            ranges.append((self.FREE_MEMORY_INDEX_KEY, min_free_memory, "+inf"))
+        if heartbeat_since is not None:
+            ranges.append((self.HEARTBEAT_INDEX_KEY, self._epoch(heartbeat_since.isoformat()), "+inf"))
+        
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if set_keys:
+                pipe.sinter(set_keys)
+            else:
+                pipe.smembers("containers:registered")
+            for key, low, high in ranges:
+                pipe.zrangebyscore(key, low, high)
+            results = await pipe.execute()
+        
+        matching = set(results[0])
+        for members in results[1:]:
+            matching &= set(members)
+        container_ids = sorted(self._decode(container_id) for container_id in matching)
+        
+        if sort_by is not None and container_ids:
+            scores = await self.redis.zmscore(self.SORT_INDEXES[sort_by], container_ids)
+            missing = float("-inf") if descending else float("inf")
+            ranked = sorted(zip(container_ids, scores),
+                            key=lambda item: missing if item[1] is None else item[1],
+                            reverse=descending)
+            container_ids = [container_id for container_id, _ in ranked]
+        if limit is not None:
+            container_ids = container_ids[:limit]
+        
+        return await self.get_containers(container_ids, fields)
+    
     async def get_container_by_name(self, container_name: str) -> Optional[Dict[str, Any]]:
         """Get container by name"""
         try:
@@ -353,26 +536,30 @@ class ContainerRegistry:
                 await asyncio.sleep(self.cleanup_interval)
     
     async def _cleanup_inactive_containers(self):
-        """Remove containers that haven't sent heartbeat"""
+        """Deregister containers whose heartbeat deadline has passed"""
         try:
-            container_ids = await self.redis.smembers("containers:registered")
-            timeout_threshold = datetime.utcnow() - timedelta(seconds=self.heartbeat_timeout)
-            
-            for container_id_bytes in container_ids:
-                container_id = container_id_bytes.decode() if isinstance(container_id_bytes, bytes) else container_id_bytes
-                container_info = await self.get_container(container_id)
-                
-                if not container_info:
-                    continue
-                
-                # Check last heartbeat
-                last_heartbeat_str = container_info.get("last_heartbeat")
-                if last_heartbeat_str:
-                    last_heartbeat = datetime.fromisoformat(last_heartbeat_str)
-                    
-                    if last_heartbeat < timeout_threshold:
-                        logger.warning(f"Container {container_id} timed out (last heartbeat: {last_heartbeat_str})")
-                        await self.deregister_container(container_id, reason="heartbeat_timeout")
+            now = time.time()
+            # Expired entries left in place (deregistration failed) are paged past, not retried
+            skipped = 0
+            while True:
+                # Cost scales with the number of expired containers, not the cluster size
+                expired = await self.redis.zrangebyscore(
+                    self.DEADLINE_INDEX_KEY, "-inf", now, start=skipped, num=self.REAP_BATCH_SIZE
+                )
+                if not expired:
+                    break
+                for container_id_bytes in expired:
+                    container_id = self._decode(container_id_bytes)
+                    logger.warning(f"Container {container_id} timed out (no heartbeat for {self.heartbeat_timeout}s)")
+                    if await self.deregister_container(container_id, reason="heartbeat_timeout", expired_before=now):
+                        continue
+                    # Drop leftover deadlines of containers that are already gone
+                    if not await self.redis.exists(f"container:registry:{container_id}"):
+                        await self.redis.zrem(self.DEADLINE_INDEX_KEY, container_id)
+                        continue
+                    skipped += 1
+                if len(expired) < self.REAP_BATCH_SIZE:
+                    break
                         
         except Exception as e:
             logger.error(f"Error cleaning up inactive containers: {e}")
@@ -423,30 +610,243 @@ class ContainerRegistry:
             self.event_handlers[event_type] = []
         self.event_handlers[event_type].append(handler)
     
+    # Cluster summary and secondary indexes
+    
+    @classmethod
+    def _container_state(cls, data: Dict[str, Any]) -> Dict[str, Any]:
+        """The fields of a (parsed) container that feed the summary and the indexes"""
+        resources = data.get("resources")
+        capabilities = data.get("capabilities")
+        return {
+            "status": data.get("status"),
+            "resources": resources if isinstance(resources, dict) else {},
+            "capabilities": capabilities if isinstance(capabilities, list) else [],
+            "host_address": data.get("host_address"),
+            "health_score": data.get("health_score"),
+            "last_heartbeat": data.get("last_heartbeat"),
+        }
+    
+    @classmethod
+    def _status_index(cls, status: Any) -> str:
+        """Status set a container belongs to; every spelling of active shares one set"""
+        return "active" if status in cls.ACTIVE_STATUSES else str(status)
+    
+    @staticmethod
+    def _epoch(timestamp: Optional[str]) -> float:
+        """Seconds since the epoch for the naive UTC ISO timestamps stored in the registry"""
+        if not timestamp:
+            return 0.0
+        parsed = datetime.fromisoformat(timestamp)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    
+    def _deadline(self, state: Dict[str, Any]) -> float:
+        """When the next heartbeat is due before the container is reaped"""
+        return self._epoch(state["last_heartbeat"]) + self.heartbeat_timeout
+    
+    def _index_scores(self, state: Dict[str, Any]) -> Dict[str, float]:
+        """Score of a container in each sorted index"""
+        resources = state["resources"]
+        try:
+            health = float(state["health_score"] or 0)
+        except (TypeError, ValueError):
+            health = 0.0
+        return {
+            self.HEALTH_INDEX_KEY: health,
+            self.HEARTBEAT_INDEX_KEY: self._epoch(state["last_heartbeat"]),
+            self.FREE_MEMORY_INDEX_KEY: float((resources.get("memory_limit", 0) or 0) - (resources.get("memory_usage", 0) or 0)),
+            self.DEADLINE_INDEX_KEY: self._deadline(state),
+        }
+    
+    @classmethod
+    def _contribution(cls, state: Optional[Dict[str, Any]]) -> Tuple[Dict[str, float], Dict[str, int]]:
+        """What one container adds to the summary totals and capability distribution"""
+        if state is None:
+            return {}, {}
+        if state["status"] not in cls.ACTIVE_STATUSES:
+            return {"total_containers": 1, "active_containers": 0}, {}
+        resources = state["resources"]
+        totals = {
+            "total_containers": 1,
+            "active_containers": 1,
+            "total_cpu_cores": resources.get("cpu_count", 0) or 0,
+            "total_memory_bytes": resources.get("memory_limit", 0) or 0,
+        }
+        return totals, {capability: 1 for capability in state["capabilities"]}
+    
+    def _queue_summary_delta(self, pipe, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+        """Queue HINCRBY/HINCRBYFLOAT commands moving the summary from `old` to `new`"""
+        old_totals, old_caps = self._contribution(old)
+        new_totals, new_caps = self._contribution(new)
+        for field in set(old_totals) | set(new_totals):
+            delta = new_totals.get(field, 0) - old_totals.get(field, 0)
+            if not delta:
+                continue
+            if field in self.SUMMARY_COUNTERS:
+                pipe.hincrby(self.SUMMARY_KEY, field, delta)
+            else:
+                # Resource totals may be fractional (e.g. 0.5 CPU)
+                pipe.hincrbyfloat(self.SUMMARY_KEY, field, delta)
+        for capability in set(old_caps) | set(new_caps):
+            delta = new_caps.get(capability, 0) - old_caps.get(capability, 0)
+            if delta:
+                pipe.hincrby(self.SUMMARY_CAPABILITIES_KEY, capability, delta)
+    
+    def _queue_index_delta(self, pipe, container_id: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+        """Queue the status/host set moves and sorted-index scores for a container change"""
+        old_sets = set()
+        if old is not None:
+            old_sets.add(f"{self.STATUS_INDEX_PREFIX}{self._status_index(old['status'])}")
+            if old["host_address"]:
+                old_sets.add(f"{self.HOST_INDEX_PREFIX}{old['host_address']}")
+        new_sets = set()
+        if new is not None:
+            new_sets.add(f"{self.STATUS_INDEX_PREFIX}{self._status_index(new['status'])}")
+            if new["host_address"]:
+                new_sets.add(f"{self.HOST_INDEX_PREFIX}{new['host_address']}")
+        for key in old_sets - new_sets:
+            pipe.srem(key, container_id)
+        for key in new_sets:
+            pipe.sadd(key, container_id)
+        
+        if new is None:
+            for key in self.ZSET_INDEXES:
+                pipe.zrem(key, container_id)
+        else:
+            for key, score in self._index_scores(new).items():
+                pipe.zadd(key, {container_id: score})
+    
+    async def _transact(self, container_id: str, write: Callable,
+                        precondition: Optional[Callable[[Optional[Dict[str, Any]]], bool]] = None) -> bool:
+        """
+        Apply a container write plus the matching summary and index updates in one MULTI.
+        
+        `write(pipe, old)` queues the writes and returns the container's new
+        state (None once it leaves the registry); `old` is the current state,
+        read under WATCH so concurrent writers retry instead of double-counting.
+        Nothing is written, and False returned, if `precondition(old)` fails.
+        """
+        container_key = f"container:registry:{container_id}"
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for attempt in range(self.SUMMARY_WRITE_RETRIES):
+                try:
+                    await pipe.watch(container_key)
+                    row = dict(zip(self.STATE_FIELDS, await pipe.hmget(container_key, list(self.STATE_FIELDS))))
+                    old = self._container_state(self._parse_row(row)) if row["status"] is not None else None
+                    if precondition is not None and not precondition(old):
+                        await pipe.reset()
+                        return False
+                    pipe.multi()
+                    new = write(pipe, old)
+                    self._queue_summary_delta(pipe, old, new)
+                    self._queue_index_delta(pipe, container_id, old, new)
+                    await pipe.execute()
+                    return True
+                except WatchError:
+                    continue
+        raise RuntimeError(f"Container {container_id} changed concurrently {self.SUMMARY_WRITE_RETRIES} times")
+    
+    async def reconcile(self) -> Dict[str, Any]:
+        """
+        Rebuild the cluster summary and secondary indexes from a full scan, correcting any drift.
+        
+        The summary, index keys and registered set are WATCHed across the scan;
+        a container write landing in between touches at least one of them, so
+        the rebuild is retried rather than overwriting that write.
+        """
+        for attempt in range(self.SUMMARY_WRITE_RETRIES):
+            async with self.redis.pipeline(transaction=True) as pipe:
+                try:
+                    index_sets_before = []
+                    for prefix in (self.STATUS_INDEX_PREFIX, self.HOST_INDEX_PREFIX):
+                        async for key in self.redis.scan_iter(match=f"{prefix}*", count=500):
+                            index_sets_before.append(key)
+                    await pipe.watch(self.SUMMARY_KEY, self.SUMMARY_CAPABILITIES_KEY, "containers:registered",
+                                     *self.ZSET_INDEXES, *index_sets_before)
+                    
+                    totals: Dict[str, float] = {"total_containers": 0, "active_containers": 0,
+                                                "total_cpu_cores": 0, "total_memory_bytes": 0}
+                    capability_counts: Dict[str, int] = {}
+                    index_sets: Dict[str, List[str]] = {}
+                    index_scores: Dict[str, Dict[str, float]] = {key: {} for key in self.ZSET_INDEXES}
+                    async for container in self.iter_containers(fields=list(self.STATE_FIELDS)):
+                        container_id = container["container_id"]
+                        state = self._container_state(container)
+                        container_totals, container_caps = self._contribution(state)
+                        for field, value in container_totals.items():
+                            totals[field] += value
+                        for capability, count in container_caps.items():
+                            capability_counts[capability] = capability_counts.get(capability, 0) + count
+                        index_sets.setdefault(
+                            f"{self.STATUS_INDEX_PREFIX}{self._status_index(state['status'])}", []
+                        ).append(container_id)
+                        if state["host_address"]:
+                            index_sets.setdefault(
+                                f"{self.HOST_INDEX_PREFIX}{state['host_address']}", []
+                            ).append(container_id)
+                        for key, score in self._index_scores(state).items():
+                            index_scores[key][container_id] = score
+                    
+                    pipe.multi()
+                    pipe.delete(self.SUMMARY_KEY, self.SUMMARY_CAPABILITIES_KEY,
+                                *index_sets_before, *index_scores)
+                    pipe.hset(self.SUMMARY_KEY, mapping=totals)
+                    if capability_counts:
+                        pipe.hset(self.SUMMARY_CAPABILITIES_KEY, mapping=capability_counts)
+                    for key, members in index_sets.items():
+                        pipe.sadd(key, *members)
+                    for key, scores in index_scores.items():
+                        if scores:
+                            pipe.zadd(key, scores)
+                    await pipe.execute()
+                    return {**totals, "capability_distribution": capability_counts}
+                except WatchError:
+                    continue
+        raise RuntimeError(
+            f"Container registry changed concurrently {self.SUMMARY_WRITE_RETRIES} times during reconcile"
+        )
+    
+    async def _reconcile_loop(self):
+        """Periodically rebuild the summary and indexes (also seeds them on startup)"""
+        while True:
+            try:
+                await self.reconcile()
+                await asyncio.sleep(self.reconcile_interval)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error reconciling cluster summary: {e}")
+                await asyncio.sleep(self.reconcile_interval)
+    
+    @staticmethod
+    def _number(value: Any) -> Any:
+        number = float(value)
+        return int(number) if number.is_integer() else number
+    
     async def get_cluster_status(self) -> Dict[str, Any]:
-        """Get overall cluster status"""
+        """Get overall cluster status from the incrementally maintained summary"""
         try:
-            all_containers = await self.get_all_containers(include_inactive=True)
-            active_containers = [c for c in all_containers if c.get("status") == "active"]
-            
-            # Calculate resource totals
-            total_cpu = sum(c.get("resources", {}).get("cpu_count", 0) for c in active_containers)
-            total_memory = sum(c.get("resources", {}).get("memory_limit", 0) for c in active_containers)
-            
-            # Get capability distribution
-            capability_counts = {}
-            for container in active_containers:
-                for capability in container.get("capabilities", []):
-                    capability_counts[capability] = capability_counts.get(capability, 0) + 1
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hgetall(self.SUMMARY_KEY)
+                pipe.hgetall(self.SUMMARY_CAPABILITIES_KEY)
+                summary_raw, capabilities_raw = await pipe.execute()
+            
+            summary = {self._decode(k): self._number(v) for k, v in summary_raw.items()}
+            capability_counts = {
+                self._decode(k): int(v) for k, v in capabilities_raw.items() if int(v) > 0
+            }
+            total = summary.get("total_containers", 0)
+            active = summary.get("active_containers", 0)
             
             return {
-                "total_containers": len(all_containers),
-                "active_containers": len(active_containers),
-                "inactive_containers": len(all_containers) - len(active_containers),
-                "total_cpu_cores": total_cpu,
-                "total_memory_bytes": total_memory,
+                "total_containers": total,
+                "active_containers": active,
+                "inactive_containers": total - active,
+                "total_cpu_cores": summary.get("total_cpu_cores", 0),
+                "total_memory_bytes": summary.get("total_memory_bytes", 0),
                 "capability_distribution": capability_counts,
-                "cluster_health": "healthy" if len(active_containers) > 0 else "unhealthy",
+                "cluster_health": "healthy" if active > 0 else "unhealthy",
                 "timestamp": datetime.utcnow().isoformat()
             }
             
@@ -0,0 +1,166 @@
+"""
+Container Stats Collector
+
+Keeps one long-lived streaming stats subscription per tracked container and
+folds each sample into a small per-container ring buffer. CPU% is computed
+from the deltas between consecutive samples, so readers (health scoring,
+resource management) get current figures without asking dockerd to sample
+again, which costs about a second per container.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Any, Deque, Dict, List, Optional
+
+import docker
+
+from ...infrastructure.containers.docker_adapter import AsyncDockerClient
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StatsSample:
+    """Compact resource sample for one container"""
+    timestamp: float
+    cpu_count: int
+    cpu_usage_percent: float
+    memory_usage: int
+    memory_limit: int
+    memory_percent: float
+    network_rx_bytes: int
+    network_tx_bytes: int
+
+
+class ContainerStatsCollector:
+    """Streaming stats subscriptions feeding per-container ring buffers"""
+
+    def __init__(
+        self,
+        docker_client: Optional[AsyncDockerClient] = None,
+        buffer_size: int = 120,
+        max_age: float = 30.0,
+        retry_interval: float = 5.0,
+    ):
+        self.docker = docker_client
+        self.buffer_size = buffer_size  # samples (about one per second) kept per container
+        self.max_age = max_age  # seconds before the latest sample no longer counts as current
+        self.retry_interval = retry_interval
+        self._buffers: Dict[str, Deque[StatsSample]] = {}
+        self._cpu_totals: Dict[str, tuple] = {}
+        self._streams: Dict[str, asyncio.Task] = {}
+
+    def track(self, container_id: str):
+        """Start streaming stats for `container_id` (idempotent)"""
+        if self.docker is None or container_id in self._streams:
+            return
+        self._buffers.setdefault(container_id, deque(maxlen=self.buffer_size))
+        self._streams[container_id] = asyncio.create_task(self._stream_stats(container_id))
+
+    def untrack(self, container_id: str):
+        """Stop streaming and drop the buffer for `container_id`"""
+        task = self._streams.pop(container_id, None)
+        if task:
+            task.cancel()
+        self._buffers.pop(container_id, None)
+        self._cpu_totals.pop(container_id, None)
+
+    async def stop(self):
+        tasks = list(self._streams.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._streams.clear()
+
+    def latest(self, container_id: str) -> Optional[StatsSample]:
+        """Most recent sample, or None if there is none younger than `max_age`"""
+        buffer = self._buffers.get(container_id)
+        if not buffer or time.time() - buffer[-1].timestamp > self.max_age:
+            return None
+        return buffer[-1]
+
+    def window(self, container_id: str, seconds: Optional[float] = None) -> List[StatsSample]:
+        """Buffered samples, optionally only those from the last `seconds`"""
+        samples = list(self._buffers.get(container_id, ()))
+        if seconds is not None:
+            cutoff = time.time() - seconds
+            samples = [s for s in samples if s.timestamp >= cutoff]
+        return samples
+
+    def resources(self, container_id: str) -> Optional[Dict[str, Any]]:
+        """Latest sample in the registry's `resources` shape, or None if not current"""
+        sample = self.latest(container_id)
+        if sample is None:
+            return None
+        resources = asdict(sample)
+        resources.pop("timestamp")
+        return resources
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "streams": len(self._streams),
+            "containers_with_samples": sum(1 for cid in self._buffers if self.latest(cid)),
+            "buffer_size": self.buffer_size,
+        }
+
+    async def _stream_stats(self, container_id: str):
+        """Hold a stats stream open for the container, reconnecting until untracked or gone"""
+        while True:
+            try:
+                container = await self.docker.get_container(container_id)
+                stream = await self.docker.stats_stream(container)
+                try:
+                    async for raw in stream:
+                        self.record(container_id, raw)
+                finally:
+                    stream.close()
+                # The stream ends when the container stops
+            except asyncio.CancelledError:
+                break
+            except docker.errors.NotFound:
+                logger.debug(f"Container {container_id} gone, stopping stats stream")
+                self._streams.pop(container_id, None)
+                self._buffers.pop(container_id, None)
+                break
+            except Exception as e:
+                logger.warning(f"Stats stream for container {container_id} interrupted: {e}")
+            await asyncio.sleep(self.retry_interval)
+
+    def record(self, container_id: str, raw: Dict[str, Any]) -> StatsSample:
+        """Fold one raw Docker stats payload into the container's buffer"""
+        cpu_stats = raw.get("cpu_stats", {})
+        memory_stats = raw.get("memory_stats", {})
+        eth0 = raw.get("networks", {}).get("eth0", {})
+
+        # CPU% from the change since the previous sample we saw, as a share of host capacity
+        totals = (cpu_stats.get("cpu_usage", {}).get("total_usage", 0), cpu_stats.get("system_cpu_usage", 0))
+        previous = self._cpu_totals.get(container_id)
+        self._cpu_totals[container_id] = totals
+        cpu_percent = 0.0
+        if previous:
+            cpu_delta = totals[0] - previous[0]
+            system_delta = totals[1] - previous[1]
+            if system_delta > 0 and cpu_delta >= 0:
+                cpu_percent = (cpu_delta / system_delta) * 100.0
+
+        usage = memory_stats.get("usage", 0)
+        limit = memory_stats.get("limit", 0)
+        sample = StatsSample(
+            timestamp=time.time(),
+            cpu_count=cpu_stats.get("online_cpus", 0),
+            cpu_usage_percent=round(cpu_percent, 2),
+            memory_usage=usage,
+            memory_limit=limit,
+            memory_percent=round(usage / limit * 100, 2) if limit > 0 else 0,
+            network_rx_bytes=eth0.get("rx_bytes", 0),
+            network_tx_bytes=eth0.get("tx_bytes", 0),
+        )
+        self._buffers.setdefault(container_id, deque(maxlen=self.buffer_size)).append(sample)
+        return sample
+
+
+# Shared by container discovery (which tracks containers) and the resource manager
+container_stats_collector = ContainerStatsCollector()
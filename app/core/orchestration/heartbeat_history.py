@@ -0,0 +1,292 @@
+"""
+Cluster Heartbeat History
+
+Heartbeats are appended to an in-memory buffer by the heartbeat endpoint and
+written by a background task in batches: raw rows plus upserts into 1-minute
+and 1-hour rollup buckets. Each tier has its own retention, so the raw table
+stays small while long-range charts read a few hundred rollup rows.
+
+All SQL goes through the async engine, so a flush never blocks the event loop.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+
+from ...db_async import AsyncSessionLocal, dialect_insert
+from ...db_models import ClusterHeartbeat, ClusterHeartbeatRollup
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class HeartbeatHistory:
+    """Buffered heartbeat writer with raw, 1-minute and 1-hour tiers"""
+
+    # Tier name -> bucket width in seconds (0 = raw rows)
+    RESOLUTIONS = {"raw": 0, "1m": 60, "1h": 3600}
+
+    def __init__(
+        self,
+        session_factory=None,
+        flush_interval: float = 5.0,
+        max_buffer: int = 50000,
+        prune_interval: float = 3600.0,
+        retention: Optional[Dict[str, timedelta]] = None,
+    ):
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.prune_interval = prune_interval
+        self.retention = retention or {
+            "raw": timedelta(hours=24),
+            "1m": timedelta(days=7),
+            "1h": timedelta(days=90),
+        }
+        self._buffer: Deque[Dict[str, Any]] = deque(maxlen=max_buffer)
+        self._flush_task: Optional[asyncio.Task] = None
+        self._prune_task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.dropped = 0
+        self.written = 0
+
+    def record(self, container_id: str, health_score: int, active_agents: int = 0,
+               resources: Optional[str] = None, timestamp: Optional[datetime] = None):
+        """Buffer one heartbeat; never touches the database"""
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1  # deque drops the oldest
+        self._buffer.append({
+            "container_id": container_id,
+            "timestamp": timestamp or datetime.utcnow(),
+            "health_score": health_score,
+            "active_agents": active_agents or 0,
+            "resources": resources,
+        })
+
+    async def start(self):
+        if self._flush_task:
+            return
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        self._prune_task = asyncio.create_task(self._prune_loop())
+        logger.info("Heartbeat history writer started")
+
+    async def stop(self):
+        """Stop background tasks and write whatever is still buffered"""
+        for task in (self._flush_task, self._prune_task):
+            if task:
+                task.cancel()
+        await asyncio.gather(*(t for t in (self._flush_task, self._prune_task) if t), return_exceptions=True)
+        self._flush_task = self._prune_task = None
+        await self.flush()
+
+    async def flush(self) -> int:
+        """Write the buffered heartbeats in one transaction; returns the number written"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self._buffer:
+                return 0
+            batch = list(self._buffer)
+            self._buffer.clear()
+            try:
+                await self._write_batch(batch)
+            except Exception as e:
+                # Put the batch back in front of newer heartbeats, within the buffer bound
+                logger.error(f"Error flushing {len(batch)} heartbeats: {e}")
+                newer = list(self._buffer)
+                self._buffer.clear()
+                overflow = len(batch) + len(newer) - self.max_buffer
+                if overflow > 0:
+                    self.dropped += overflow
+                self._buffer.extend(batch + newer)
+                return 0
+            self.written += len(batch)
+            return len(batch)
+
+    async def prune(self) -> Dict[str, int]:
+        """Delete rows older than each tier's retention"""
+        now = datetime.utcnow()
+        async with self.session_factory() as session:
+            result = await session.execute(
+                delete(ClusterHeartbeat).where(ClusterHeartbeat.timestamp < now - self.retention["raw"])
+            )
+            deleted = {"raw": result.rowcount}
+            for name, resolution in self.RESOLUTIONS.items():
+                if resolution:
+                    result = await session.execute(
+                        delete(ClusterHeartbeatRollup).where(
+                            ClusterHeartbeatRollup.resolution == resolution,
+                            ClusterHeartbeatRollup.bucket_start < now - self.retention[name],
+                        )
+                    )
+                    deleted[name] = result.rowcount
+            await session.commit()
+        return deleted
+
+    async def query(self, container_id: str, since: datetime, until: Optional[datetime] = None,
+                    resolution: str = "auto", limit: int = 2000) -> Dict[str, Any]:
+        """History points for one cluster, from the coarsest tier that still resolves the range"""
+        until = until or datetime.utcnow()
+        if resolution == "auto":
+            resolution = self.choose_resolution(since, until)
+        if resolution not in self.RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        async with self.session_factory() as session:
+            if resolution == "raw":
+                points = await self._raw_points(session, container_id, since, until, limit)
+            else:
+                points = await self._rollup_points(session, container_id, since, until, self.RESOLUTIONS[resolution], limit)
+        return {"container_id": container_id, "resolution": resolution, "points": points}
+
+    def choose_resolution(self, since: datetime, until: datetime) -> str:
+        span = until - since
+        oldest = datetime.utcnow() - since
+        if span <= timedelta(hours=6) and oldest <= self.retention["raw"]:
+            return "raw"
+        if span <= timedelta(days=7) and oldest <= self.retention["1m"]:
+            return "1m"
+        return "1h"
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+            "flush_interval": self.flush_interval,
+        }
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in heartbeat flush loop: {e}")
+
+    async def _prune_loop(self):
+        while True:
+            try:
+                await asyncio.sleep(self.prune_interval)
+                deleted = await self.prune()
+                logger.debug(f"Pruned heartbeat history: {deleted}")
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error pruning heartbeat history: {e}")
+
+    @staticmethod
+    def _bucket(timestamp: datetime, seconds: int) -> datetime:
+        """Start of the `seconds`-wide bucket containing a naive UTC timestamp"""
+        offset = int((timestamp - _EPOCH).total_seconds()) // seconds * seconds
+        return _EPOCH + timedelta(seconds=offset)
+
+    def _rollups(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Aggregate a batch into one row per (cluster, resolution, bucket)"""
+        buckets: Dict[Tuple[str, int, datetime], Dict[str, Any]] = {}
+        for hb in batch:
+            score = hb["health_score"] if hb["health_score"] is not None else 0
+            for resolution in (r for r in self.RESOLUTIONS.values() if r):
+                key = (hb["container_id"], resolution, self._bucket(hb["timestamp"], resolution))
+                row = buckets.get(key)
+                if row is None:
+                    buckets[key] = {
+                        "container_id": key[0],
+                        "resolution": resolution,
+                        "bucket_start": key[2],
+                        "samples": 1,
+                        "health_score_sum": float(score),
+                        "health_score_min": score,
+                        "health_score_max": score,
+                        "active_agents_max": hb["active_agents"],
+                    }
+                else:
+                    row["samples"] += 1
+                    row["health_score_sum"] += score
+                    row["health_score_min"] = min(row["health_score_min"], score)
+                    row["health_score_max"] = max(row["health_score_max"], score)
+                    row["active_agents_max"] = max(row["active_agents_max"], hb["active_agents"])
+        return list(buckets.values())
+
+    @staticmethod
+    def _rollup_upsert(session):
+        """INSERT into the rollup table that merges into an existing bucket row"""
+        insert_ = dialect_insert(session)
+        if session.bind.dialect.name == "postgresql":
+            least, greatest = func.least, func.greatest
+        else:
+            least, greatest = func.min, func.max  # SQLite's scalar min()/max()
+        table = ClusterHeartbeatRollup.__table__
+        stmt = insert_(table)
+        return stmt.on_conflict_do_update(
+            index_elements=["container_id", "resolution", "bucket_start"],
+            set_={
+                "samples": table.c.samples + stmt.excluded.samples,
+                "health_score_sum": table.c.health_score_sum + stmt.excluded.health_score_sum,
+                "health_score_min": least(table.c.health_score_min, stmt.excluded.health_score_min),
+                "health_score_max": greatest(table.c.health_score_max, stmt.excluded.health_score_max),
+                "active_agents_max": greatest(table.c.active_agents_max, stmt.excluded.active_agents_max),
+            },
+        )
+
+    async def _write_batch(self, batch: List[Dict[str, Any]]):
+        async with self.session_factory() as session:
+            await session.execute(insert(ClusterHeartbeat), batch)
+            await session.execute(self._rollup_upsert(session), self._rollups(batch))
+            await session.commit()
+
+    async def _raw_points(self, session, container_id: str, since: datetime, until: datetime,
+                          limit: int) -> List[Dict[str, Any]]:
+        rows = (await session.execute(
+            select(ClusterHeartbeat.timestamp, ClusterHeartbeat.health_score,
+                   ClusterHeartbeat.active_agents, ClusterHeartbeat.resources)
+            .where(ClusterHeartbeat.container_id == container_id,
+                   ClusterHeartbeat.timestamp >= since, ClusterHeartbeat.timestamp <= until)
+            .order_by(ClusterHeartbeat.timestamp)
+            .limit(limit)
+        )).all()
+        return [
+            {
+                "timestamp": row.timestamp.isoformat(),
+                "samples": 1,
+                "health_score_avg": row.health_score,
+                "health_score_min": row.health_score,
+                "health_score_max": row.health_score,
+                "active_agents_max": row.active_agents,
+                "resources": row.resources,
+            }
+            for row in rows
+        ]
+
+    async def _rollup_points(self, session, container_id: str, since: datetime, until: datetime,
+                             seconds: int, limit: int) -> List[Dict[str, Any]]:
+        rows = (await session.scalars(
+            select(ClusterHeartbeatRollup)
+            .where(ClusterHeartbeatRollup.container_id == container_id,
+                   ClusterHeartbeatRollup.resolution == seconds,
+                   ClusterHeartbeatRollup.bucket_start >= self._bucket(since, seconds),
+                   ClusterHeartbeatRollup.bucket_start <= until)
+            .order_by(ClusterHeartbeatRollup.bucket_start)
+            .limit(limit)
+        )).all()
+        return [
+            {
+                "timestamp": row.bucket_start.isoformat(),
+                "samples": row.samples,
+                "health_score_avg": round(row.health_score_sum / row.samples, 2) if row.samples else None,
+                "health_score_min": row.health_score_min,
+                "health_score_max": row.health_score_max,
+                "active_agents_max": row.active_agents_max,
+            }
+            for row in rows
+        ]
+
+
+# Global heartbeat history writer
+heartbeat_history = HeartbeatHistory()
@@ -17,7 +17,8 @@ from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass
 from urllib.parse import urlparse
-import aiohttp
+
+from ...infrastructure.network.http_pool import http_pool
 
 logger = logging.getLogger(__name__)
 
@@ -483,10 +484,9 @@ class HealthChecker:
                 
         # Perform actual health check
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
-                async with session.get(endpoint.health_url) as response:
-                    is_healthy = response.status == 200
-                    
+            response = await http_pool.get(endpoint.health_url, timeout=5.0)
+            is_healthy = response.status_code == 200
+            
         except Exception as e:
             logger.debug(f"Health check failed for {endpoint.service_name}: {e}")
             is_healthy = False
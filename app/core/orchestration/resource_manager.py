@@ -21,6 +21,7 @@ from collections import deque
 import statistics
 
 from .base_service import BaseOrchestrationService
+from .container_stats import container_stats_collector
 
 logger = logging.getLogger(__name__)
 
@@ -55,6 +56,9 @@ class ResourceManager(BaseOrchestrationService):
         self.scale_up_threshold = 80.0  # % resource usage
         self.scale_down_threshold = 30.0  # % resource usage
         
+        # Per-container usage comes from the streaming stats buffer, never a fresh sample
+        self.container_stats = container_stats_collector
+        
     async def setup(self):
         """Initialize resource manager"""
         # Subscribe to resource-related events
@@ -117,6 +121,9 @@ class ResourceManager(BaseOrchestrationService):
             cpu_count = psutil.cpu_count()
             disk_total = psutil.disk_usage('/').total
             
+            # Prime the CPU counters so later reads are deltas since the previous call
+            psutil.cpu_percent(interval=None)
+            
             baseline = {
                 "total_memory_gb": round(total_memory / (1024**3), 2),
                 "cpu_cores": cpu_count,
@@ -147,8 +154,8 @@ class ResourceManager(BaseOrchestrationService):
             }
             self.memory_history.append(memory_snapshot)
             
-            # CPU
-            cpu_percent = psutil.cpu_percent(interval=1)
+            # CPU (delta since the previous loop iteration; interval=1 would block the event loop)
+            cpu_percent = psutil.cpu_percent(interval=None)
             cpu_snapshot = {
                 "timestamp": datetime.utcnow().isoformat(),
                 "percent": cpu_percent,
@@ -266,6 +273,12 @@ class ResourceManager(BaseOrchestrationService):
                 int(memory_mb * 1.1)  # Increase by 10%
             )
             
+        # Never shrink below what the container is using right now (plus 10% headroom)
+        sample = self.container_stats.latest(container_id)
+        if sample:
+            in_use_mb = int(sample.memory_usage / (1024 * 1024) * 1.1)
+            memory_mb = max(memory_mb, min(in_use_mb, current_limits["max_memory_mb"]))
+            
         # CPU adjustment
         cpu_cores = current_limits["cpu_cores"]
         
@@ -665,7 +678,12 @@ class ResourceManager(BaseOrchestrationService):
             },
             "containers": {
                 "managed": len(self.container_limits),
-                "total_allocated_memory_mb": sum(limits.get("memory_mb", 0) for limits in self.container_limits.values())
+                "total_allocated_memory_mb": sum(limits.get("memory_mb", 0) for limits in self.container_limits.values()),
+                "usage": {
+                    container_id: self.container_stats.resources(container_id)
+                    for container_id in self.container_limits
+                    if self.container_stats.latest(container_id)
+                }
             },
             "cleanup_history": len(self.memory_cleanup_history),
             "auto_scaling_enabled": self.auto_scaling_enabled,
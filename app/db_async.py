@@ -0,0 +1,148 @@
+"""
+Async database access for cluster tracking
+
+Same tables as db_models, reached through an async engine (aiosqlite for
+SQLite, asyncpg for PostgreSQL) so request handlers never block the event
+loop on database I/O.
+"""
+from datetime import datetime, timedelta
+import os
+import logging
+
+from sqlalchemy import event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from .db_models import DATABASE_URL, ClusterRegistration
+
+logger = logging.getLogger(__name__)
+
+
+def to_async_url(url: str) -> str:
+    """Map a sync database URL onto its async driver"""
+    for prefix, async_prefix in (
+        ("sqlite:///", "sqlite+aiosqlite:///"),
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("postgres://", "postgresql+asyncpg://"),
+    ):
+        if url.startswith(prefix):
+            return async_prefix + url[len(prefix):]
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+# Create engine
+if ASYNC_DATABASE_URL.startswith("sqlite"):
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, connect_args={"timeout": 30}, echo=False)
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL lets readers proceed while a write (e.g. a heartbeat flush) is in progress
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+else:
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_size=10,
+        max_overflow=20,
+        pool_pre_ping=True,
+        echo=False
+    )
+
+# Create session factory
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+
+def dialect_insert(session: AsyncSession):
+    """The dialect's INSERT construct (with on_conflict_do_update) for the session's database"""
+    if session.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+async def get_async_db():
+    """Get async database session"""
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+# Utility functions for cluster tracking
+UPDATABLE_FIELDS = ("agent_type", "external_ip", "capabilities", "resources", "cluster_metadata")
+
+
+async def register_cluster(db: AsyncSession, container_id: str, cluster_name: str, agent_id: str,
+                           host_address: str, api_port: int, **kwargs):
+    """Register a new cluster or update existing, in a single upsert"""
+    now = datetime.utcnow()
+    values = {
+        "container_id": container_id,
+        "cluster_name": cluster_name,
+        "agent_id": agent_id,
+        "agent_type": kwargs.get('agent_type', 'orchestrator_cluster'),
+        "host_address": host_address,
+        "api_port": api_port,
+        "external_ip": kwargs.get('external_ip'),
+        "capabilities": kwargs.get('capabilities'),
+        "resources": kwargs.get('resources'),
+        "cluster_metadata": kwargs.get('cluster_metadata'),
+        "is_active": True,
+        "last_heartbeat": now,
+        "registered_at": now,
+    }
+    insert = dialect_insert(db)
+    stmt = insert(ClusterRegistration).values(**values)
+    # An existing registration keeps its name, agent and registration time
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["container_id"],
+        set_={
+            "is_active": True,
+            "last_heartbeat": now,
+            "host_address": host_address,
+            "api_port": api_port,
+            **{key: kwargs[key] for key in UPDATABLE_FIELDS if key in kwargs},
+        },
+    ).returning(ClusterRegistration)
+    cluster = (
+        await db.scalars(stmt, execution_options={"populate_existing": True})
+    ).one()
+    await db.commit()
+    return cluster
+
+
+async def update_heartbeat(db: AsyncSession, container_id: str):
+    """Mark the cluster alive; health, agents and resources are recorded by heartbeat_history"""
+    result = await db.execute(
+        update(ClusterRegistration)
+        .where(ClusterRegistration.container_id == container_id)
+        .values(last_heartbeat=datetime.utcnow(), is_active=True)
+    )
+    await db.commit()
+    return result.rowcount > 0
+
+
+async def get_active_clusters(db: AsyncSession):
+    """Get all active clusters"""
+    # Consider clusters active if heartbeat within last 2 minutes
+    cutoff_time = datetime.utcnow() - timedelta(minutes=2)
+    result = await db.scalars(
+        select(ClusterRegistration).where(
+            ClusterRegistration.is_active == True,
+            ClusterRegistration.last_heartbeat > cutoff_time
+        )
+    )
+    return result.all()
+
+
+async def mark_cluster_inactive(db: AsyncSession, container_id: str):
+    """Mark cluster as inactive"""
+    result = await db.execute(
+        update(ClusterRegistration)
+        .where(ClusterRegistration.container_id == container_id)
+        .values(is_active=False)
+    )
+    await db.commit()
+    return result.rowcount > 0
@@ -1,11 +1,12 @@
 """
 Database models for cluster tracking
 """
-from sqlalchemy import create_engine, Column, String, DateTime, Boolean, Integer, Text, Float
+from sqlalchemy import create_engine, Column, String, DateTime, Boolean, Integer, Text, Float, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
-from datetime import datetime, timedelta
+from sqlalchemy.schema import CreateIndex
+from datetime import datetime
 import os
 import logging
 
@@ -65,8 +66,11 @@ class ClusterRegistration(Base):
     cluster_metadata = Column(Text)  # JSON string
 
 class ClusterHeartbeat(Base):
-    """Track cluster heartbeat history"""
+    """Raw cluster heartbeat history (short retention, written in batches)"""
     __tablename__ = "cluster_heartbeats"
+    __table_args__ = (
+        Index("ix_cluster_heartbeats_container_time", "container_id", "timestamp"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     container_id = Column(String, index=True, nullable=False)
@@ -75,12 +79,41 @@ class ClusterHeartbeat(Base):
     active_agents = Column(Integer, default=0)
     resources = Column(Text)  # JSON string
 
+class ClusterHeartbeatRollup(Base):
+    """Downsampled cluster heartbeat history, one row per cluster per time bucket"""
+    __tablename__ = "cluster_heartbeat_rollups"
+    __table_args__ = (
+        UniqueConstraint("container_id", "resolution", "bucket_start", name="uq_heartbeat_rollup_bucket"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    container_id = Column(String, nullable=False)
+    resolution = Column(Integer, nullable=False)  # bucket width in seconds (60, 3600)
+    bucket_start = Column(DateTime, nullable=False)
+    samples = Column(Integer, nullable=False, default=0)
+    health_score_sum = Column(Float, nullable=False, default=0)
+    health_score_min = Column(Integer)
+    health_score_max = Column(Integer)
+    active_agents_max = Column(Integer, default=0)
+
+
+# Indexes added to tables that may predate them; create_all skips existing tables
+LATE_INDEXES = (
+    "ix_cluster_heartbeats_container_time",
+)
+
 
 # Database initialization
-def init_db():
-    """Initialize database tables"""
+def init_db(bind=None):
+    """Initialize database tables, and indexes added since a table was first created"""
+    bind = bind or engine
     try:
-        Base.metadata.create_all(bind=engine)
+        Base.metadata.create_all(bind=bind)
+        with bind.begin() as conn:
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    if index.name in LATE_INDEXES:
+                        conn.execute(CreateIndex(index, if_not_exists=True))
         logger.info(f"Database initialized successfully with URL: {DATABASE_URL}")
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
@@ -93,80 +126,3 @@ def get_db():
         yield db
     finally:
         db.close()
-
-# Utility functions for cluster tracking
-def register_cluster(db, container_id: str, cluster_name: str, agent_id: str, 
-                    host_address: str, api_port: int, **kwargs):
-    """Register a new cluster or update existing"""
-    cluster = db.query(ClusterRegistration).filter_by(container_id=container_id).first()
-    
-    if cluster:
-        # Update existing
-        cluster.is_active = True
-        cluster.last_heartbeat = datetime.utcnow()
-        cluster.host_address = host_address
-        cluster.api_port = api_port
-        for key, value in kwargs.items():
-            if hasattr(cluster, key):
-                setattr(cluster, key, value)
-    else:
-        # Create new
-        cluster = ClusterRegistration(
-            container_id=container_id,
-            cluster_name=cluster_name,
-            agent_id=agent_id,
-            agent_type=kwargs.get('agent_type', 'orchestrator_cluster'),
-            host_address=host_address,
-            api_port=api_port,
-            external_ip=kwargs.get('external_ip'),
-            capabilities=kwargs.get('capabilities'),
-            resources=kwargs.get('resources'),
-            cluster_metadata=kwargs.get('cluster_metadata')
-        )
-        db.add(cluster)
-    
-    db.commit()
-    return cluster
-
-def update_heartbeat(db, container_id: str, health_score: int = 100, **kwargs):
-    """Update cluster heartbeat"""
-    # Update cluster registration
-    cluster = db.query(ClusterRegistration).filter_by(container_id=container_id).first()
-    if cluster:
-        cluster.last_heartbeat = datetime.utcnow()
-        cluster.is_active = True
-        
-        # Record heartbeat history
-        heartbeat = ClusterHeartbeat(
-            container_id=container_id,
-            health_score=health_score,
-            active_agents=kwargs.get('active_agents', 0),
-            resources=kwargs.get('resources')
-        )
-        db.add(heartbeat)
-        db.commit()
-        return True
-    return False
-
-def get_active_clusters(db):
-    """Get all active clusters"""
-    # Consider clusters active if heartbeat within last 2 minutes
-    from datetime import timedelta
-    cutoff_time = datetime.utcnow() - timedelta(minutes=2)
-    
-    clusters = db.query(ClusterRegistration).filter(
-        ClusterRegistration.is_active == True,
-        ClusterRegistration.last_heartbeat > cutoff_time
-    ).all()
-    
-    return clusters
-
-def mark_cluster_inactive(db, container_id: str):
-    """Mark cluster as inactive"""
-    cluster = db.query(ClusterRegistration).filter_by(container_id=container_id).first()
-    if cluster:
-        cluster.is_active = False
-        db.commit()
-        return True
-    return False
-
@@ -52,6 +52,7 @@ class ErrorCodes:
     AGENT_NOT_FOUND = "AGENT_NOT_FOUND"
     AGENT_START_FAILED = "AGENT_START_FAILED"
     AGENT_ALREADY_RUNNING = "AGENT_ALREADY_RUNNING"
+    AGENT_QUEUE_FULL = "AGENT_QUEUE_FULL"
     
     # Task errors
     TASK_NOT_FOUND = "TASK_NOT_FOUND"
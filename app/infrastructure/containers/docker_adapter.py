@@ -0,0 +1,170 @@
+"""
+Async Docker Adapter
+
+Wraps the blocking docker SDK so event-loop code never waits on the Docker
+socket: every call runs on a small dedicated thread pool, at most
+`max_workers` at a time, and is bounded by a per-call timeout. Callers fan
+out per-container work (stats, exec probes) with asyncio.gather and the pool
+keeps the daemon from being flooded.
+
+A call that times out is abandoned, not killed: the SDK has no cancellation,
+so its worker thread finishes in the background and the caller gets
+asyncio.TimeoutError immediately.
+
+Long-lived streams (events, streaming stats) are pumped by their own daemon
+thread instead of pinning a pool worker.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DockerStream:
+    """Async iterator over a blocking docker stream (events, streaming stats)"""
+
+    def __init__(self, stream: Any, loop: asyncio.AbstractEventLoop, name: str = "docker-stream"):
+        self._stream = stream
+        self._loop = loop
+        self._closed = False
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._thread = threading.Thread(target=self._pump, name=name, daemon=True)
+        self._thread.start()
+
+    def _pump(self):
+        try:
+            for item in self._stream:
+                if self._closed:
+                    break
+                self._put(item)
+            self._put(StopAsyncIteration())
+        except Exception as e:
+            self._put(e)
+        finally:
+            if self._closed and hasattr(self._stream, "close"):
+                try:
+                    self._stream.close()
+                except Exception:
+                    pass
+
+    def _put(self, item: Any):
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+        except RuntimeError:
+            pass  # Event loop already closed
+
+    def __aiter__(self) -> "DockerStream":
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        item = await self._queue.get()
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    def close(self):
+        """Stop the pump thread: immediately for cancellable streams (events), otherwise
+        after the next item (a plain generator can't be closed from another thread)"""
+        self._closed = True
+        try:
+            self._stream.close()
+        except Exception as e:
+            logger.debug(f"Docker stream not closed from the event loop: {e}")
+
+
+class AsyncDockerClient:
+    """Non-blocking facade over a docker.DockerClient"""
+
+    def __init__(
+        self,
+        client: Any = None,
+        max_workers: int = 8,
+        call_timeout: float = 10.0,
+        stats_timeout: float = 5.0,
+        exec_timeout: float = 5.0,
+    ):
+        self.client = client
+        self.max_workers = max_workers
+        self.call_timeout = call_timeout
+        self.stats_timeout = stats_timeout
+        self.exec_timeout = exec_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="docker")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @classmethod
+    async def connect(cls, factory: Callable[[], Any], **kwargs: Any) -> "AsyncDockerClient":
+        """Create the SDK client with `factory` off the event loop and ping it"""
+        adapter = cls(**kwargs)
+        try:
+            adapter.client = await adapter.run(factory)
+            await adapter.ping()
+        except BaseException:
+            await adapter.close()
+            raise
+        return adapter
+
+    async def run(self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """Run a blocking callable on the pool; the timeout starts once a worker slot is free"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            future = loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+            return await asyncio.wait_for(future, self.call_timeout if timeout is None else timeout)
+
+    async def ping(self, timeout: Optional[float] = None) -> bool:
+        return await self.run(self.client.ping, timeout=timeout)
+
+    async def list_containers(self, sparse: bool = True, timeout: Optional[float] = None, **kwargs: Any) -> List[Any]:
+        """Running containers; sparse by default, which skips the SDK's per-container inspect"""
+        return await self.run(self.client.containers.list, sparse=sparse, timeout=timeout, **kwargs)
+
+    async def get_container(self, container_id: str, timeout: Optional[float] = None) -> Any:
+        return await self.run(self.client.containers.get, container_id, timeout=timeout)
+
+    async def image_tags(self, container: Any, timeout: Optional[float] = None) -> List[str]:
+        """Tags of the container's image (`container.image` is itself an API call)"""
+        return await self.run(lambda: container.image.tags, timeout=timeout)
+
+    async def stats(self, container: Any, one_shot: bool = False, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Stats snapshot for `container`.
+
+        By default dockerd samples twice so precpu_stats is filled in (about a
+        second); `one_shot` returns the first sample immediately, falling back
+        to the default on daemons older than API 1.41.
+        """
+        timeout = self.stats_timeout if timeout is None else timeout
+        if one_shot:
+            try:
+                return await self.run(container.stats, stream=False, one_shot=True, timeout=timeout)
+            except asyncio.TimeoutError:
+                raise
+            except Exception as e:
+                logger.debug(f"One-shot stats unavailable, sampling twice: {e}")
+        return await self.run(container.stats, stream=False, timeout=timeout)
+
+    async def exec_run(self, container: Any, cmd: str, timeout: Optional[float] = None) -> Any:
+        return await self.run(container.exec_run, cmd, demux=True, timeout=self.exec_timeout if timeout is None else timeout)
+
+    async def events(self, filters: Optional[Dict[str, Any]] = None) -> DockerStream:
+        """Open the daemon's event stream, decoded to dicts; close() it when done"""
+        stream = await self.run(self.client.events, decode=True, filters=filters)
+        return DockerStream(stream, asyncio.get_running_loop(), name="docker-events")
+
+    async def stats_stream(self, container: Any) -> DockerStream:
+        """Open a streaming stats subscription (one decoded sample per second); close() it when done"""
+        stream = await self.run(container.stats, stream=True, decode=True)
+        return DockerStream(stream, asyncio.get_running_loop(), name=f"docker-stats-{container.id[:12]}")
+
+    async def close(self):
+        """Drop queued calls, release the pool and close the SDK client"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self.client is not None:
+            try:
+                self.client.close()
+            except Exception as e:
+                logger.debug(f"Error closing Docker client: {e}")
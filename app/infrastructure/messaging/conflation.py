@@ -0,0 +1,82 @@
+"""
+Conflated Delta Streams
+
+Latest-value state for a keyed feed (quotes per symbol, status per agent).
+Updates arriving within a flush window are merged so only the newest value
+of each field survives, and a flush yields just the fields that differ from
+what subscribers were last sent. New subscribers are brought up to date
+from `snapshot()` and then follow the deltas.
+"""
+
+from typing import Any, Dict, FrozenSet, Iterable, Optional
+
+
+class ConflatedStream:
+    """Per-key field state with windowed, delta-only publication"""
+
+    def __init__(self, volatile_fields: Iterable[str] = ()):
+        # Volatile fields (e.g. a quote timestamp) ride along with a delta but never trigger one
+        self.volatile_fields: FrozenSet[str] = frozenset(volatile_fields)
+        self._published: Dict[str, Dict[str, Any]] = {}
+        self._pending: Dict[str, Optional[Dict[str, Any]]] = {}  # None = key removed
+        self.updates = 0
+        self.deltas = 0
+
+    def update(self, key: str, values: Dict[str, Any]) -> bool:
+        """Merge the latest values for `key`; returns True if a delta is now pending"""
+        self.updates += 1
+        published = self._published.get(key, {})
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = {}
+        for field, value in values.items():
+            if field in published and published[field] == value:
+                pending.pop(field, None)  # changed and changed back within the window
+            else:
+                pending[field] = value
+        return self._is_due(key, pending)
+
+    def remove(self, key: str):
+        """Drop `key`; subscribers are told at the next flush if they had seen it"""
+        if key in self._published:
+            self._pending[key] = None
+        else:
+            self._pending.pop(key, None)
+
+    def drain(self) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Pending deltas per key (None for removed keys), now counted as published"""
+        deltas: Dict[str, Optional[Dict[str, Any]]] = {}
+        for key, pending in list(self._pending.items()):
+            if pending is None:
+                self._published.pop(key, None)
+                deltas[key] = None
+            elif self._is_due(key, pending):
+                self._published.setdefault(key, {}).update(pending)
+                deltas[key] = pending
+            else:
+                continue  # only volatile fields changed; keep them for the next real delta
+            del self._pending[key]
+        self.deltas += len(deltas)
+        return deltas
+
+    def snapshot(self, keys: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Full latest value per key, including changes not yet flushed"""
+        if keys is None:
+            keys = set(self._published) | set(self._pending)
+        snapshot = {}
+        for key in keys:
+            if key in self._pending and self._pending[key] is None:
+                continue
+            value = {**self._published.get(key, {}), **(self._pending.get(key) or {})}
+            if value:
+                snapshot[key] = value
+        return snapshot
+
+    def keys(self):
+        """Keys currently known to subscribers or about to be"""
+        return (set(self._published) | set(self._pending)) - {k for k, v in self._pending.items() if v is None}
+
+    def _is_due(self, key: str, pending: Dict[str, Any]) -> bool:
+        if key not in self._published:
+            return bool(pending)
+        return any(field not in self.volatile_fields for field in pending)
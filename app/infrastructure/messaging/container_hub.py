@@ -14,12 +14,12 @@ from typing import Dict, List, Optional, Any, Callable, Set
 from dataclasses import dataclass, asdict
 from enum import Enum
 
-import aiohttp
 import redis.asyncio as aioredis
 from cryptography.fernet import Fernet
 
 from ...config import settings
 from ...dependencies import get_redis
+from ..network.http_pool import http_pool
 
 logger = logging.getLogger(__name__)
 
@@ -488,21 +488,16 @@ class ContainerCommunicationHub:
 
             api_endpoint = proxy_info.get(b"api_endpoint", b"").decode()
 
-            # Make proxied request
-            timeout = aiohttp.ClientTimeout(total=30)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                url = f"{api_endpoint}{path}"
-
-                async with session.request(method, url, **kwargs) as response:
-                    return {
-                        "status": response.status,
-                        "data": (
-                            await response.json()
-                            if response.content_type == "application/json"
-                            else await response.text()
-                        ),
-                        "headers": dict(response.headers),
-                    }
+            # Make proxied request over the shared connection pool
+            url = f"{api_endpoint}{path}"
+            kwargs.setdefault("timeout", 30.0)
+            response = await http_pool.request(method, url, **kwargs)
+            is_json = response.headers.get("content-type", "").startswith("application/json")
+            return {
+                "status": response.status_code,
+                "data": response.json() if is_json else response.text,
+                "headers": dict(response.headers),
+            }
 
         except Exception as e:
             logger.error(f"Error in proxy request: {e}")
@@ -9,11 +9,11 @@ import logging
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 from enum import Enum
-import httpx
 import hmac
 import hashlib
 
 from ...dependencies import get_redis
+from ..network.http_pool import http_pool
 from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
@@ -144,17 +144,17 @@ class CrossInstanceBridge:
             requires_response=requires_response
         )
         
-        # Route through master
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.master_url}/relay-message",
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                },
-                json=message.dict()
-            )
-            
+        # Route through master; keep the 5s timeout the bridge had before moving to the shared pool
+        response = await http_pool.post(
+            f"{self.master_url}/relay-message",
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            },
+            json=message.dict(),
+            timeout=5.0
+        )
+        
         if response.status_code == 200:
             if requires_response:
                 self.pending_responses[message.message_id] = asyncio.Event()
@@ -9,26 +9,64 @@ Advanced WebSocket management system providing:
 - Performance metrics streaming
 - Multi-room support for different data types
 - Connection pooling and management
+
+Broadcasts serialize each message once and hand the frame to every
+recipient's bounded outbound queue; a per-client writer task drains the
+queue, so a slow socket never holds up the producer or other clients.
+
+In broker mode (several workers or replicas behind a load balancer) a
+broadcast is published once to Redis pub/sub on a channel per subscription
+type or room; every replica listens on the channels its local clients are
+interested in and fans matching frames out to its own sockets. Each replica
+also publishes its connection counts so presence can be summed cluster-wide.
+
+Market data and agent status are conflated: updates are merged per symbol or
+agent and flushed once per window as field-level deltas, after a snapshot
+on subscribe. A client that lost queued frames to the drop-oldest policy
+may have missed deltas, so it is sent a fresh snapshot at the next flush.
+Each replica conflates these feeds for its own clients.
+
+Market data and agent status are routed through topic indexes (symbol or
+agent id -> client ids) kept up to date on subscribe, unsubscribe and
+disconnect, so each update costs O(interested clients) and a client only
+receives the symbols and agents it asked for.
+
+Clients may negotiate a binary frame encoding (see wire_protocol); a
+broadcast is encoded at most once per protocol in use, never per client.
 """
 
 import asyncio
 import json
 import logging
+import socket
 import uuid
 from datetime import datetime, timedelta
 from typing import Dict, List, Set, Optional, Any, Callable
 from enum import Enum
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from collections import defaultdict
 
 from fastapi import WebSocket, WebSocketDisconnect
 import redis.asyncio as redis
 
+from ...config import settings
 from ...dependencies import get_redis
 from ...core.agents.agent_manager import agent_manager
+from . import wire_protocol
+from .conflation import ConflatedStream
 
 logger = logging.getLogger(__name__)
 
+# Redis pub/sub channels for broker mode, one per subscription type and per room
+BROKER_CHANNEL_PREFIX = "ws:broadcast:"
+BROKER_ALL_CHANNEL = BROKER_CHANNEL_PREFIX + "all"
+PRESENCE_KEY_PREFIX = "ws:presence:"
+
+# Symbols streamed to a market data subscriber that did not ask for specific ones
+DEFAULT_MARKET_SYMBOLS = ["AAPL", "GOOGL", "MSFT"]
+# Topic index entry for agent status subscribers that did not filter by agent id
+ALL_AGENTS = "*"
+
 
 class MessageType(str, Enum):
     """WebSocket message types"""
@@ -46,6 +84,12 @@ class MessageType(str, Enum):
     HEARTBEAT = "heartbeat"
 
 
+class SlowConsumerPolicy(str, Enum):
+    """What to do when a client's outbound queue is full"""
+    DROP_OLDEST = "drop_oldest"
+    DISCONNECT = "disconnect"
+
+
 class SubscriptionType(str, Enum):
     """Subscription types"""
     MARKET_DATA = "market_data"
@@ -79,23 +123,58 @@ class ClientConnection:
     last_heartbeat: datetime
     user_id: Optional[str] = None
     metadata: Dict[str, Any] = None
+    outbox: Optional[asyncio.Queue] = None  # serialized frames awaiting the writer
+    writer: Optional[asyncio.Task] = None
+    protocol: str = wire_protocol.JSON  # negotiated server-to-client encoding
+    rooms: Set[str] = field(default_factory=set)
+    symbols: Set[str] = field(default_factory=set)  # market data topics
+    agent_ids: Set[str] = field(default_factory=set)  # agent status topics (ALL_AGENTS = every agent)
 
 
 class WebSocketManager:
     """Advanced WebSocket connection and broadcasting manager"""
     
-    def __init__(self):
+    def __init__(self, send_queue_size: int = 256,
+                 slow_consumer_policy: SlowConsumerPolicy = SlowConsumerPolicy.DROP_OLDEST,
+                 send_timeout: float = 10.0, broker: Optional[bool] = None,
+                 presence_interval: float = 10.0, conflation_window: Optional[float] = None,
+                 market_data_service=None):
+        self.send_queue_size = send_queue_size
+        self.slow_consumer_policy = SlowConsumerPolicy(slow_consumer_policy)
+        self.send_timeout = send_timeout  # a single send stuck longer than this drops the client
         self.connections: Dict[str, ClientConnection] = {}
         self.rooms: Dict[str, Set[str]] = defaultdict(set)  # room -> client_ids
         self.subscriptions: Dict[SubscriptionType, Set[str]] = defaultdict(set)  # type -> client_ids
+        self.symbol_index: Dict[str, Set[str]] = {}  # symbol -> market data client_ids
+        self.agent_index: Dict[str, Set[str]] = {}  # agent_id (or ALL_AGENTS) -> agent status client_ids
         self.redis = None
         self.running = False
+        self.broker = settings.websocket_broker if broker is None else broker
+        self.replica_id = f"{socket.gethostname()}:{uuid.uuid4().hex[:8]}"
+        self.presence_interval = presence_interval
+        self._pubsub = None
+        self._broker_channels: Set[str] = set()
+        self._broker_tasks: List[asyncio.Task] = []
+        self._broker_active = False
+        # Quote source: any object with `async get_quote(symbol)` (and optionally `get_system_health()`)
+        self.market_data_service = market_data_service
+        self.conflation_window = (
+            settings.websocket_conflation_window if conflation_window is None else conflation_window
+        )
+        self.market_stream = ConflatedStream(volatile_fields=("timestamp",))
+        self.agent_stream = ConflatedStream()
+        self._resync_clients: Set[str] = set()  # dropped frames; snapshot again at the next flush
         self.message_handlers: Dict[MessageType, List[Callable]] = defaultdict(list)
         self.statistics = {
             "total_connections": 0,
             "active_connections": 0,
             "messages_sent": 0,
             "messages_received": 0,
+            "messages_dropped": 0,
+            "resyncs": 0,
+            "slow_consumer_disconnects": 0,
+            "broker_published": 0,
+            "broker_received": 0,
             "errors": 0
         }
         
@@ -105,7 +184,9 @@ class WebSocketManager:
     async def initialize(self):
         """Initialize WebSocket manager"""
         self.redis = await get_redis()
-        logger.info("WebSocket Manager initialized")
+        if self.broker:
+            await self._start_broker()
+        logger.info(f"WebSocket Manager initialized (broker: {self.broker})")
         
     async def start(self):
         """Start WebSocket manager background tasks"""
@@ -117,6 +198,7 @@ class WebSocketManager:
         asyncio.create_task(self._market_data_streamer())
         asyncio.create_task(self._pnl_updater())
         asyncio.create_task(self._agent_status_broadcaster())
+        asyncio.create_task(self._conflation_flusher())
         asyncio.create_task(self._performance_metrics_streamer())
         asyncio.create_task(self._system_monitor())
         
@@ -126,10 +208,14 @@ class WebSocketManager:
         """Stop WebSocket manager"""
         self.running = False
         
-        # Close all connections
+        # Give queued frames a moment to go out, then close all connections
+        await self.drain(timeout=5.0)
         for client_id in list(self.connections.keys()):
             await self.disconnect_client(client_id)
             
+        if self.broker:
+            await self._stop_broker()
+            
         logger.info("WebSocket Manager stopped")
         
     # Connection Management
@@ -137,7 +223,12 @@ class WebSocketManager:
     async def connect_client(self, websocket: WebSocket, user_id: str = None) -> str:
         """Connect a new WebSocket client"""
         try:
-            await websocket.accept()
+            # Binary protocols are opt-in through Sec-WebSocket-Protocol; JSON otherwise
+            protocol = wire_protocol.negotiate(getattr(websocket, "scope", {}).get("subprotocols", []))
+            if protocol:
+                await websocket.accept(subprotocol=protocol)
+            else:
+                await websocket.accept()
             
             client_id = str(uuid.uuid4())
             now = datetime.utcnow()
@@ -149,8 +240,11 @@ class WebSocketManager:
                 connected_at=now,
                 last_heartbeat=now,
                 user_id=user_id,
-                metadata={}
+                metadata={},
+                outbox=asyncio.Queue(maxsize=self.send_queue_size),
+                protocol=protocol or wire_protocol.JSON
             )
+            connection.writer = asyncio.create_task(self._client_writer(connection))
             
             self.connections[client_id] = connection
             self.statistics["total_connections"] += 1
@@ -162,6 +256,7 @@ class WebSocketManager:
                 data={
                     "status": "connected", 
                     "client_id": client_id,
+                    "protocol": connection.protocol,
                     "server_time": now.isoformat()
                 },
                 timestamp=now.isoformat()
@@ -177,18 +272,28 @@ class WebSocketManager:
     async def disconnect_client(self, client_id: str):
         """Disconnect a WebSocket client"""
         try:
-            if client_id not in self.connections:
+            connection = self.connections.pop(client_id, None)
+            if connection is None:
                 return
-                
-            connection = self.connections[client_id]
+            self.statistics["active_connections"] -= 1
             
-            # Remove from subscriptions
+            # Stop the writer, unless it is the writer itself that is disconnecting us
+            if connection.writer and connection.writer is not asyncio.current_task():
+                connection.writer.cancel()
+            while connection.outbox and not connection.outbox.empty():
+                connection.outbox.get_nowait()
+                connection.outbox.task_done()
+
+            # Remove from subscriptions and topic indexes
             for sub_type in connection.subscriptions:
                 self.subscriptions[sub_type].discard(client_id)
+                await self._sync_broker_channel(self._subscription_channel(sub_type), self.subscriptions[sub_type])
+            self._index_topics(connection, self.symbol_index, "symbols", ())
+            self._index_topics(connection, self.agent_index, "agent_ids", ())
                 
             # Remove from rooms
-            for room_clients in self.rooms.values():
-                room_clients.discard(client_id)
+            for room in list(connection.rooms):
+                await self.leave_room(client_id, room)
                 
             # Close connection
             try:
@@ -196,9 +301,6 @@ class WebSocketManager:
             except:
                 pass
                 
-            del self.connections[client_id]
-            self.statistics["active_connections"] -= 1
-            
             logger.info(f"WebSocket client {client_id} disconnected")
             
         except Exception as e:
@@ -241,10 +343,14 @@ class WebSocketManager:
             connection = self.connections[client_id]
             connection.subscriptions.add(subscription_type)
             self.subscriptions[subscription_type].add(client_id)
+            await self._sync_broker_channel(
+                self._subscription_channel(subscription_type), self.subscriptions[subscription_type]
+            )
             
             # Store subscription options
             if options:
                 connection.metadata[f"{subscription_type.value}_options"] = options
+            self._update_topics(connection, subscription_type)
                 
             # Send confirmation
             await self.send_to_client(client_id, WebSocketMessage(
@@ -257,6 +363,9 @@ class WebSocketManager:
                 timestamp=datetime.utcnow().isoformat()
             ))
             
+            # Bring the client up to date; deltas follow from the next flush
+            await self._send_snapshot(client_id, subscription_type)
+            
             logger.info(f"Client {client_id} subscribed to {subscription_type.value}")
             return True
             
@@ -273,10 +382,14 @@ class WebSocketManager:
             connection = self.connections[client_id]
             connection.subscriptions.discard(subscription_type)
             self.subscriptions[subscription_type].discard(client_id)
+            await self._sync_broker_channel(
+                self._subscription_channel(subscription_type), self.subscriptions[subscription_type]
+            )
             
             # Remove subscription options
             if f"{subscription_type.value}_options" in connection.metadata:
                 del connection.metadata[f"{subscription_type.value}_options"]
+            self._update_topics(connection, subscription_type)
                 
             # Send confirmation
             await self.send_to_client(client_id, WebSocketMessage(
@@ -301,20 +414,13 @@ class WebSocketManager:
                                       message: WebSocketMessage):
         """Broadcast message to all clients subscribed to a type"""
         try:
-            client_ids = self.subscriptions.get(subscription_type, set()).copy()
-            
-            if not client_ids:
+            if self.broker:
+                await self._publish(self._subscription_channel(subscription_type), message)
                 return
                 
-            # Send to all subscribed clients
-            tasks = []
-            for client_id in client_ids:
-                if client_id in self.connections:
-                    tasks.append(self.send_to_client(client_id, message))
-                    
-            if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
-                self.statistics["messages_sent"] += len(tasks)
+            client_ids = self.subscriptions.get(subscription_type)
+            if client_ids:
+                self._fan_out(client_ids, message)
                 
         except Exception as e:
             logger.error(f"Error broadcasting to subscription {subscription_type}: {e}")
@@ -322,19 +428,13 @@ class WebSocketManager:
     async def broadcast_to_room(self, room: str, message: WebSocketMessage):
         """Broadcast message to all clients in a room"""
         try:
-            client_ids = self.rooms.get(room, set()).copy()
-            
-            if not client_ids:
+            if self.broker:
+                await self._publish(self._room_channel(room), message)
                 return
                 
-            tasks = []
-            for client_id in client_ids:
-                if client_id in self.connections:
-                    tasks.append(self.send_to_client(client_id, message))
-                    
-            if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
-                self.statistics["messages_sent"] += len(tasks)
+            client_ids = self.rooms.get(room)
+            if client_ids:
+                self._fan_out(client_ids, message)
                 
         except Exception as e:
             logger.error(f"Error broadcasting to room {room}: {e}")
@@ -342,50 +442,145 @@ class WebSocketManager:
     async def broadcast_to_all(self, message: WebSocketMessage):
         """Broadcast message to all connected clients"""
         try:
-            client_ids = list(self.connections.keys())
-            
-            if not client_ids:
+            if self.broker:
+                await self._publish(BROKER_ALL_CHANNEL, message)
                 return
                 
-            tasks = []
-            for client_id in client_ids:
-                tasks.append(self.send_to_client(client_id, message))
-                
-            if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
-                self.statistics["messages_sent"] += len(tasks)
+            if self.connections:
+                self._fan_out(self.connections.keys(), message)
                 
         except Exception as e:
             logger.error(f"Error broadcasting to all clients: {e}")
             
     async def send_to_client(self, client_id: str, message: WebSocketMessage):
-        """Send message to specific client"""
+        """Queue message for a specific client; returns False if it was not queued"""
         try:
-            if client_id not in self.connections:
+            connection = self.connections.get(client_id)
+            if connection is None:
                 return False
                 
-            connection = self.connections[client_id]
-            message_data = {
-                "type": message.type.value,
-                "data": message.data,
-                "timestamp": message.timestamp,
-                "id": message.id
-            }
-            
-            if message.room:
-                message_data["room"] = message.room
-                
-            await connection.websocket.send_text(json.dumps(message_data))
-            return True
+            return self._enqueue(connection, self._frames(message)(connection.protocol))
             
-        except WebSocketDisconnect:
-            await self.disconnect_client(client_id)
-            return False
         except Exception as e:
             logger.error(f"Error sending message to client {client_id}: {e}")
-            await self.disconnect_client(client_id)
             return False
             
+    async def drain(self, timeout: Optional[float] = None):
+        """Wait until every client's outbound queue has been written out"""
+        waits = [
+            connection.outbox.join()
+            for connection in list(self.connections.values())
+            if connection.outbox is not None
+        ]
+        if not waits:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*waits), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Timed out draining WebSocket send queues")
+            
+    @staticmethod
+    def message_payload(message: WebSocketMessage) -> Dict[str, Any]:
+        """The message object every wire protocol encodes"""
+        message_data = {
+            "type": message.type.value,
+            "data": message.data,
+            "timestamp": message.timestamp,
+            "id": message.id
+        }
+        
+        if message.room:
+            message_data["room"] = message.room
+            
+        return message_data
+        
+    @staticmethod
+    def serialize_message(message: WebSocketMessage) -> str:
+        """Encode a message into the JSON text frame sent to clients"""
+        return json.dumps(WebSocketManager.message_payload(message))
+        
+    def _frames(self, message: Optional[WebSocketMessage] = None, json_frame: Optional[str] = None):
+        """Frame lookup by protocol that encodes the message at most once per protocol"""
+        frames: Dict[str, Any] = {}
+        if json_frame is not None:
+            frames[wire_protocol.JSON] = json_frame
+        payload = None
+        
+        def frame_for(protocol: str):
+            nonlocal payload
+            frame = frames.get(protocol)
+            if frame is None:
+                if protocol == wire_protocol.JSON:
+                    frame = self.serialize_message(message)
+                else:
+                    if payload is None:
+                        payload = self.message_payload(message) if message is not None else json.loads(json_frame)
+                    frame = wire_protocol.encode(protocol, payload)
+                frames[protocol] = frame
+            return frame
+            
+        return frame_for
+        
+    def _fan_out(self, client_ids, message: WebSocketMessage) -> int:
+        """Serialize once and queue the frame for each client; never waits on a socket"""
+        return self._deliver(client_ids, self._frames(message))
+        
+    def _deliver(self, client_ids, frame_for) -> int:
+        """Queue the frame in each local client's protocol"""
+        queued = 0
+        for client_id in list(client_ids):
+            connection = self.connections.get(client_id)
+            if connection is not None and self._enqueue(connection, frame_for(connection.protocol)):
+                queued += 1
+        return queued
+        
+    def _enqueue(self, connection: ClientConnection, frame) -> bool:
+        """Put a frame on the client's queue, applying the slow consumer policy when full"""
+        outbox = connection.outbox
+        if outbox.full():
+            if self.slow_consumer_policy == SlowConsumerPolicy.DISCONNECT:
+                logger.warning(f"Client {connection.client_id} send queue full, disconnecting")
+                self.statistics["slow_consumer_disconnects"] += 1
+                asyncio.create_task(self.disconnect_client(connection.client_id))
+                return False
+            # Drop the oldest queued frame to make room for the newest
+            outbox.get_nowait()
+            outbox.task_done()
+            self.statistics["messages_dropped"] += 1
+            self._resync_clients.add(connection.client_id)
+        outbox.put_nowait(frame)
+        return True
+        
+    async def _client_writer(self, connection: ClientConnection):
+        """Drain one client's outbound queue onto its socket"""
+        client_id = connection.client_id
+        outbox = connection.outbox
+        while True:
+            frame = await outbox.get()
+            try:
+                async with asyncio.timeout(self.send_timeout):
+                    if isinstance(frame, bytes):
+                        await connection.websocket.send_bytes(frame)
+                    else:
+                        await connection.websocket.send_text(frame)
+                self.statistics["messages_sent"] += 1
+            except asyncio.CancelledError:
+                raise
+            except WebSocketDisconnect:
+                await self.disconnect_client(client_id)
+                return
+            except asyncio.TimeoutError:
+                logger.warning(f"Send to client {client_id} timed out, disconnecting")
+                self.statistics["slow_consumer_disconnects"] += 1
+                await self.disconnect_client(client_id)
+                return
+            except Exception as e:
+                logger.error(f"Error sending message to client {client_id}: {e}")
+                await self.disconnect_client(client_id)
+                return
+            finally:
+                outbox.task_done()
+                
     async def send_error_to_client(self, client_id: str, error_message: str):
         """Send error message to client"""
         await self.send_to_client(client_id, WebSocketMessage(
@@ -399,35 +594,208 @@ class WebSocketManager:
     async def join_room(self, client_id: str, room: str):
         """Add client to a room"""
         if client_id in self.connections:
+            self.connections[client_id].rooms.add(room)
             self.rooms[room].add(client_id)
+            await self._sync_broker_channel(self._room_channel(room), self.rooms[room])
             
     async def leave_room(self, client_id: str, room: str):
         """Remove client from a room"""
+        connection = self.connections.get(client_id)
+        if connection is not None:
+            connection.rooms.discard(room)
         if room in self.rooms:
             self.rooms[room].discard(client_id)
             
             # Clean up empty rooms
             if not self.rooms[room]:
                 del self.rooms[room]
+                await self._sync_broker_channel(self._room_channel(room), ())
+                
+    # Broker Mode
+    
+    @staticmethod
+    def _subscription_channel(subscription_type: SubscriptionType) -> str:
+        return f"{BROKER_CHANNEL_PREFIX}sub:{subscription_type.value}"
+        
+    @staticmethod
+    def _room_channel(room: str) -> str:
+        return f"{BROKER_CHANNEL_PREFIX}room:{room}"
+        
+    async def _publish(self, channel: str, message: WebSocketMessage):
+        """Publish a serialized message once; every replica's listener delivers it locally"""
+        await self.redis.publish(channel, self.serialize_message(message))
+        self.statistics["broker_published"] += 1
+        
+    def _local_clients(self, channel: str):
+        """Local client ids interested in a broker channel"""
+        if channel == BROKER_ALL_CHANNEL:
+            return self.connections.keys()
+        kind, _, name = channel[len(BROKER_CHANNEL_PREFIX):].partition(":")
+        if kind == "sub":
+            try:
+                return self.subscriptions.get(SubscriptionType(name), ())
+            except ValueError:
+                return ()
+        if kind == "room":
+            return self.rooms.get(name, ())
+        return ()
+        
+    async def _sync_broker_channel(self, channel: str, local_clients):
+        """Listen on a channel only while some local client is interested in it"""
+        if not self.broker or self._pubsub is None:
+            return
+        try:
+            if local_clients and channel not in self._broker_channels:
+                self._broker_channels.add(channel)
+                await self._pubsub.subscribe(channel)
+            elif not local_clients and channel in self._broker_channels:
+                self._broker_channels.discard(channel)
+                await self._pubsub.unsubscribe(channel)
+        except Exception as e:
+            logger.error(f"Error updating broker subscription {channel}: {e}")
+            
+    async def _start_broker(self):
+        """Subscribe to the channels local clients need and start the listener and presence tasks"""
+        self._broker_channels = {BROKER_ALL_CHANNEL}
+        self._broker_channels.update(self._subscription_channel(t) for t, ids in self.subscriptions.items() if ids)
+        self._broker_channels.update(self._room_channel(r) for r, ids in self.rooms.items() if ids)
+        self._pubsub = self.redis.pubsub()
+        await self._pubsub.subscribe(*self._broker_channels)
+        self._broker_active = True
+        self._broker_tasks = [
+            asyncio.create_task(self._broker_listener()),
+            asyncio.create_task(self._presence_publisher()),
+        ]
+        
+    async def _stop_broker(self):
+        # The flag matters as well as cancel(): a cancellation that lands inside the
+        # pub/sub read can be absorbed by the client library
+        self._broker_active = False
+        for task in self._broker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._broker_tasks, return_exceptions=True)
+        self._broker_tasks = []
+        try:
+            await self.redis.delete(PRESENCE_KEY_PREFIX + self.replica_id)
+            if self._pubsub is not None:
+                await self._pubsub.reset()
+        except Exception as e:
+            logger.error(f"Error shutting down WebSocket broker: {e}")
+        self._pubsub = None
+        
+    async def _broker_listener(self):
+        """Fan frames published by any replica out to the local clients of each channel"""
+        while self._broker_active:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None:
+                    continue
+                channel = message["channel"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                frame = message["data"]
+                if isinstance(frame, bytes):
+                    frame = frame.decode()
+                self.statistics["broker_received"] += 1
+                client_ids = self._local_clients(channel)
+                if client_ids:
+                    self._deliver(client_ids, self._frames(json_frame=frame))
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in WebSocket broker listener: {e}")
+                await asyncio.sleep(1)
+                if self._broker_active:
+                    await self._resubscribe()
+                
+    async def _resubscribe(self):
+        """Replace a broken pub/sub connection and listen on the same channels again"""
+        try:
+            if self._pubsub is not None:
+                await self._pubsub.reset()
+        except Exception:
+            pass
+        try:
+            self._pubsub = self.redis.pubsub()
+            await self._pubsub.subscribe(*self._broker_channels)
+        except Exception as e:
+            logger.error(f"Error resubscribing WebSocket broker channels: {e}")
+            
+    def _local_presence(self) -> Dict[str, int]:
+        presence = {"connections": len(self.connections)}
+        for sub_type, clients in self.subscriptions.items():
+            if clients:
+                presence[f"sub:{sub_type.value}"] = len(clients)
+        for room, clients in self.rooms.items():
+            if clients:
+                presence[f"room:{room}"] = len(clients)
+        return presence
+        
+    async def publish_presence(self):
+        """Replace this replica's presence hash; it expires if the replica goes away"""
+        key = PRESENCE_KEY_PREFIX + self.replica_id
+        pipe = self.redis.pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping=self._local_presence())
+        pipe.expire(key, max(1, int(self.presence_interval * 3)))
+        await pipe.execute()
+        
+    async def _presence_publisher(self):
+        while True:
+            try:
+                await self.publish_presence()
+                await asyncio.sleep(self.presence_interval)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error publishing WebSocket presence: {e}")
+                await asyncio.sleep(self.presence_interval)
                 
+    async def get_presence(self) -> Dict[str, Any]:
+        """Connection, subscription and room counts summed over all live replicas"""
+        if not self.broker:
+            return {"replicas": 1, **self._summarize_presence([self._local_presence()])}
+        try:
+            keys = [key async for key in self.redis.scan_iter(match=PRESENCE_KEY_PREFIX + "*")]
+            pipe = self.redis.pipeline()
+            for key in keys:
+                pipe.hgetall(key)
+            hashes = [
+                {(k.decode() if isinstance(k, bytes) else k): int(v) for k, v in h.items()}
+                for h in await pipe.execute() if h
+            ]
+            return {"replicas": len(hashes), **self._summarize_presence(hashes)}
+        except Exception as e:
+            logger.error(f"Error reading WebSocket presence: {e}")
+            return {"replicas": 1, **self._summarize_presence([self._local_presence()])}
+            
+    @staticmethod
+    def _summarize_presence(hashes: List[Dict[str, int]]) -> Dict[str, Any]:
+        summary = {"connections": 0, "subscriptions": defaultdict(int), "rooms": defaultdict(int)}
+        for presence in hashes:
+            for field, count in presence.items():
+                kind, _, name = field.partition(":")
+                if kind == "sub":
+                    summary["subscriptions"][name] += count
+                elif kind == "room":
+                    summary["rooms"][name] += count
+                else:
+                    summary["connections"] += count
+        summary["subscriptions"] = dict(summary["subscriptions"])
+        summary["rooms"] = dict(summary["rooms"])
+        return summary
+        
     # Specialized Broadcasting Methods
     
     async def broadcast_market_data(self, symbol: str, data: Dict[str, Any]):
-        """Broadcast market data update"""
-        message = WebSocketMessage(
-            type=MessageType.MARKET_DATA,
-            data={
-                "symbol": symbol,
-                "price": data.get("price"),
-                "change": data.get("change"),
-                "change_percent": data.get("change_percent"),
-                "volume": data.get("volume"),
-                "timestamp": data.get("timestamp", datetime.utcnow().isoformat())
-            },
-            timestamp=datetime.utcnow().isoformat()
-        )
-        
-        await self.broadcast_to_subscription(SubscriptionType.MARKET_DATA, message)
+        """Queue a market data update; changed fields go out at the next conflation flush"""
+        self.market_stream.update(symbol, {
+            "price": data.get("price"),
+            "change": data.get("change"),
+            "change_percent": data.get("change_percent"),
+            "volume": data.get("volume"),
+            "timestamp": data.get("timestamp", datetime.utcnow().isoformat())
+        })
         
     async def broadcast_pnl_update(self, pnl_data: Dict[str, Any]):
         """Broadcast P&L update"""
@@ -440,17 +808,8 @@ class WebSocketManager:
         await self.broadcast_to_subscription(SubscriptionType.PNL_UPDATES, message)
         
     async def broadcast_agent_status(self, agent_id: str, status_data: Dict[str, Any]):
-        """Broadcast agent status update"""
-        message = WebSocketMessage(
-            type=MessageType.AGENT_STATUS,
-            data={
-                "agent_id": agent_id,
-                **status_data
-            },
-            timestamp=datetime.utcnow().isoformat()
-        )
-        
-        await self.broadcast_to_subscription(SubscriptionType.AGENT_STATUS, message)
+        """Queue an agent status update; changed fields go out at the next conflation flush"""
+        self.agent_stream.update(agent_id, status_data)
         
     async def broadcast_system_alert(self, alert_level: str, message_text: str, 
                                    details: Dict[str, Any] = None):
@@ -543,32 +902,27 @@ class WebSocketManager:
                 await asyncio.sleep(30)
                 
     async def _market_data_streamer(self):
-        """Stream real-time market data"""
+        """Poll quotes for every symbol a client asked for, all symbols concurrently"""
         while self.running:
             try:
-                # Only stream if there are subscribed clients
-                if not self.subscriptions.get(SubscriptionType.MARKET_DATA):
+                # Only stream if there are subscribed clients and a quote source
+                if not self.subscriptions.get(SubscriptionType.MARKET_DATA) or self.market_data_service is None:
                     await asyncio.sleep(5)
                     continue
                     
-                # Get symbols from subscribed clients
-                symbols = set()
-                for client_id in self.subscriptions[SubscriptionType.MARKET_DATA]:
-                    if client_id in self.connections:
-                        options = self.connections[client_id].metadata.get("market_data_options", {})
-                        client_symbols = options.get("symbols", ["AAPL", "GOOGL", "MSFT"])
-                        symbols.update(client_symbols)
-                        
-                # Fetch and broadcast market data
-                for symbol in symbols:
-                    try:
-                        quote = await market_data_service.get_quote(symbol)
-                        if quote:
-                            await self.broadcast_market_data(symbol, quote)
-                    except Exception as e:
-                        logger.error(f"Error streaming market data for {symbol}: {e}")
+                # Fetch every subscribed symbol at once; conflation turns them into deltas
+                symbols = sorted(self.symbol_index)
+                quotes = await asyncio.gather(
+                    *(self.market_data_service.get_quote(symbol) for symbol in symbols),
+                    return_exceptions=True
+                )
+                for symbol, quote in zip(symbols, quotes):
+                    if isinstance(quote, Exception):
+                        logger.error(f"Error streaming market data for {symbol}: {quote}")
+                    elif quote and "error" not in quote:
+                        await self.broadcast_market_data(symbol, quote)
                         
-                await asyncio.sleep(2)  # Update every 2 seconds
+                await asyncio.sleep(2)  # Poll every 2 seconds
                 
             except Exception as e:
                 logger.error(f"Error in market data streamer: {e}")
@@ -606,7 +960,7 @@ class WebSocketManager:
                 await asyncio.sleep(10)
                 
     async def _agent_status_broadcaster(self):
-        """Broadcast agent status updates"""
+        """Feed agent statuses into the conflated agent stream"""
         while self.running:
             try:
                 # Only broadcast if there are subscribed clients
@@ -614,25 +968,139 @@ class WebSocketManager:
                     await asyncio.sleep(10)
                     continue
                     
-                # Get agent statuses
-                if hasattr(agent_manager, 'agents'):
-                    for agent_id, agent_data in agent_manager.agents.items():
-                        status_data = {
-                            "status": agent_data.get("status", "unknown"),
-                            "type": agent_data.get("type", "unknown"),
-                            "last_heartbeat": agent_data.get("last_heartbeat", ""),
-                            "message_count": agent_data.get("message_count", 0),
-                            "clusters": agent_data.get("clusters", [])
-                        }
-                        
-                        await self.broadcast_agent_status(agent_id, status_data)
-                        
-                await asyncio.sleep(15)  # Update every 15 seconds
+                # Get agent statuses; unchanged agents produce no traffic
+                agents = getattr(agent_manager, "agents", {})
+                for agent_id, agent_data in agents.items():
+                    await self.broadcast_agent_status(agent_id, self._agent_status(agent_data))
+                for agent_id in self.agent_stream.keys() - set(agents):
+                    self.agent_stream.remove(agent_id)
+                    
+                await asyncio.sleep(5)  # Poll every 5 seconds
                 
             except Exception as e:
                 logger.error(f"Error in agent status broadcaster: {e}")
                 await asyncio.sleep(15)
                 
+    async def _conflation_flusher(self):
+        """Send the merged market data and agent status deltas once per window"""
+        while self.running:
+            try:
+                await asyncio.sleep(self.conflation_window)
+                self.flush_conflated()
+            except Exception as e:
+                logger.error(f"Error flushing conflated streams: {e}")
+                
+    def flush_conflated(self) -> int:
+        """Queue one delta message per changed symbol/agent for local subscribers"""
+        now = datetime.utcnow().isoformat()
+        sent = 0
+        for symbol, delta in self.market_stream.drain().items():
+            clients = self.symbol_index.get(symbol)
+            if clients:
+                self._fan_out(clients, WebSocketMessage(
+                    type=MessageType.MARKET_DATA,
+                    data=self._stream_update("symbol", symbol, delta),
+                    timestamp=now
+                ))
+                sent += 1
+        for agent_id, delta in self.agent_stream.drain().items():
+            # A client is indexed either under specific agent ids or under ALL_AGENTS, never both
+            filtered = self.agent_index.get(agent_id)
+            unfiltered = self.agent_index.get(ALL_AGENTS)
+            if filtered or unfiltered:
+                frames = self._frames(WebSocketMessage(
+                    type=MessageType.AGENT_STATUS,
+                    data=self._stream_update("agent_id", agent_id, delta),
+                    timestamp=now
+                ))
+                for clients in (filtered, unfiltered):
+                    if clients:
+                        self._deliver(clients, frames)
+                sent += 1
+        self._resync()
+        return sent
+        
+    def _resync(self):
+        """Replace the conflated state of clients that dropped frames with a fresh snapshot"""
+        resync, self._resync_clients = self._resync_clients, set()
+        for client_id in resync:
+            connection = self.connections.get(client_id)
+            if connection is None:
+                continue
+            self.statistics["resyncs"] += 1
+            for subscription_type in (SubscriptionType.MARKET_DATA, SubscriptionType.AGENT_STATUS):
+                if subscription_type in connection.subscriptions:
+                    self._queue_snapshot(connection, subscription_type)
+        
+    @staticmethod
+    def _stream_update(key_field: str, key: str, delta: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if delta is None:
+            return {key_field: key, "update": "removed"}
+        return {key_field: key, "update": "delta", **delta}
+        
+    @staticmethod
+    def _agent_status(agent_data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "status": agent_data.get("status", "unknown"),
+            "type": agent_data.get("type", "unknown"),
+            "last_heartbeat": agent_data.get("last_heartbeat", ""),
+            "message_count": agent_data.get("message_count", 0),
+            "clusters": agent_data.get("clusters", [])
+        }
+        
+    # Topic Indexes
+    
+    def _update_topics(self, connection: ClientConnection, subscription_type: SubscriptionType):
+        """Re-index a client's symbols / agent ids from its current subscription and options"""
+        subscribed = subscription_type in connection.subscriptions
+        options = connection.metadata.get(f"{subscription_type.value}_options") or {}
+        if subscription_type == SubscriptionType.MARKET_DATA:
+            symbols = options.get("symbols") or DEFAULT_MARKET_SYMBOLS
+            self._index_topics(connection, self.symbol_index, "symbols", symbols if subscribed else ())
+        elif subscription_type == SubscriptionType.AGENT_STATUS:
+            agent_ids = options.get("agent_ids") or [ALL_AGENTS]
+            self._index_topics(connection, self.agent_index, "agent_ids", agent_ids if subscribed else ())
+            
+    @staticmethod
+    def _index_topics(connection: ClientConnection, index: Dict[str, Set[str]], attr: str, topics):
+        """Move a client's entries in `index` to `topics`, touching only what changed"""
+        old = getattr(connection, attr)
+        new = {str(topic) for topic in topics}
+        for topic in old - new:
+            clients = index.get(topic)
+            if clients is not None:
+                clients.discard(connection.client_id)
+                if not clients:
+                    del index[topic]
+        for topic in new - old:
+            index.setdefault(topic, set()).add(connection.client_id)
+        setattr(connection, attr, new)
+        
+    async def _send_snapshot(self, client_id: str, subscription_type: SubscriptionType):
+        """Current full values for a new subscriber of a conflated stream"""
+        connection = self.connections.get(client_id)
+        if connection is not None:
+            self._queue_snapshot(connection, subscription_type)
+            
+    def _queue_snapshot(self, connection: ClientConnection, subscription_type: SubscriptionType):
+        """Queue one snapshot message per symbol/agent the client follows"""
+        if subscription_type == SubscriptionType.MARKET_DATA:
+            message_type, key_field = MessageType.MARKET_DATA, "symbol"
+            snapshot = self.market_stream.snapshot(sorted(connection.symbols))
+        elif subscription_type == SubscriptionType.AGENT_STATUS:
+            message_type, key_field = MessageType.AGENT_STATUS, "agent_id"
+            agent_ids = None if ALL_AGENTS in connection.agent_ids else sorted(connection.agent_ids)
+            snapshot = self.agent_stream.snapshot(agent_ids)
+        else:
+            return
+        now = datetime.utcnow().isoformat()
+        for key, values in snapshot.items():
+            self._enqueue(connection, self._frames(WebSocketMessage(
+                type=message_type,
+                data={key_field: key, "update": "snapshot", **values},
+                timestamp=now
+            ))(connection.protocol))
+            
     async def _performance_metrics_streamer(self):
         """Stream performance metrics"""
         while self.running:
@@ -649,7 +1117,8 @@ class WebSocketManager:
                         "total_connections": self.statistics["total_connections"],
                         "messages_sent": self.statistics["messages_sent"],
                         "messages_received": self.statistics["messages_received"],
-                        "errors": self.statistics["errors"]
+                        "errors": self.statistics["errors"],
+                        "cluster": await self.get_presence()
                     },
                     "system": {
                         "timestamp": datetime.utcnow().isoformat(),
@@ -683,26 +1152,27 @@ class WebSocketManager:
                     )
                     
                 # Check market data service health
-                try:
-                    health = await market_data_service.get_system_health()
-                    if health.get("status") == "critical":
-                        await self.broadcast_system_alert(
-                            "critical",
-                            "Market data service critical",
-                            health
-                        )
-                    elif health.get("status") == "degraded":
+                if hasattr(self.market_data_service, "get_system_health"):
+                    try:
+                        health = await self.market_data_service.get_system_health()
+                        if health.get("status") == "critical":
+                            await self.broadcast_system_alert(
+                                "critical",
+                                "Market data service critical",
+                                health
+                            )
+                        elif health.get("status") == "degraded":
+                            await self.broadcast_system_alert(
+                                "warning",
+                                "Market data service degraded",
+                                health
+                            )
+                    except Exception as e:
                         await self.broadcast_system_alert(
-                            "warning",
-                            "Market data service degraded",
-                            health
+                            "error",
+                            "Failed to check market data service health",
+                            {"error": str(e)}
                         )
-                except Exception as e:
-                    await self.broadcast_system_alert(
-                        "error",
-                        "Failed to check market data service health",
-                        {"error": str(e)}
-                    )
                     
                 await asyncio.sleep(60)  # Check every minute
                 
@@ -755,6 +1225,8 @@ class WebSocketManager:
         """Get WebSocket statistics"""
         return {
             **self.statistics,
+            "broker": self.broker,
+            "replica_id": self.replica_id,
             "subscriptions": {
                 sub_type.value: len(clients) 
                 for sub_type, clients in self.subscriptions.items()
@@ -762,6 +1234,14 @@ class WebSocketManager:
             "rooms": {
                 room: len(clients) 
                 for room, clients in self.rooms.items()
+            },
+            "topics": {
+                "symbols": len(self.symbol_index),
+                "agents": len(self.agent_index)
+            },
+            "protocols": {
+                protocol: sum(1 for c in self.connections.values() if c.protocol == protocol)
+                for protocol in wire_protocol.available_protocols()
             }
         }
         
@@ -777,6 +1257,8 @@ class WebSocketManager:
             "connected_at": connection.connected_at.isoformat(),
             "last_heartbeat": connection.last_heartbeat.isoformat(),
             "subscriptions": [sub.value for sub in connection.subscriptions],
+            "protocol": connection.protocol,
+            "queued_messages": connection.outbox.qsize() if connection.outbox else 0,
             "metadata": connection.metadata
         }
 
@@ -0,0 +1,81 @@
+"""
+WebSocket Wire Protocols
+
+Server-to-client frame encodings a client can ask for through the
+Sec-WebSocket-Protocol header, most preferred first:
+
+- "json" (default, text frames): what every client gets if it asks for nothing.
+- "msgpack" (binary frames): the same message object, MessagePack-encoded.
+- "msgpack+zstd" (binary frames): MessagePack, with frames of at least
+  ZSTD_MIN_SIZE bytes zstd-compressed. Small deltas are not worth
+  compressing. A client tells the two apart by the zstd frame magic
+  (28 B5 2F FD), which never starts a MessagePack map.
+
+msgpack and zstandard are optional; protocols whose library is missing are
+simply not offered. Transport-level permessage-deflate is negotiated by the
+ASGI server (uvicorn enables it by default) and applies to any protocol.
+Client-to-server messages stay JSON text.
+"""
+
+import json
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+JSON = "json"
+MSGPACK = "msgpack"
+MSGPACK_ZSTD = "msgpack+zstd"
+
+ZSTD_MIN_SIZE = 512
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+_zstd_compressor = zstandard.ZstdCompressor(level=3) if ZSTD_AVAILABLE else None
+
+
+def available_protocols() -> List[str]:
+    """Protocols this server can speak, in its own order of preference"""
+    protocols = []
+    if MSGPACK_AVAILABLE and ZSTD_AVAILABLE:
+        protocols.append(MSGPACK_ZSTD)
+    if MSGPACK_AVAILABLE:
+        protocols.append(MSGPACK)
+    protocols.append(JSON)
+    return protocols
+
+
+def negotiate(requested: Iterable[str]) -> Optional[str]:
+    """The client's most preferred protocol that we support, or None if it asked for none we know"""
+    supported = available_protocols()
+    for protocol in requested:
+        if protocol in supported:
+            return protocol
+    return None
+
+
+def encode(protocol: str, payload: Dict[str, Any]) -> Union[str, bytes]:
+    """One frame for `payload`: str for JSON text frames, bytes for binary protocols"""
+    if protocol == JSON:
+        return json.dumps(payload)
+    frame = msgpack.packb(payload, use_bin_type=True)
+    if protocol == MSGPACK_ZSTD and len(frame) >= ZSTD_MIN_SIZE:
+        return _zstd_compressor.compress(frame)
+    return frame
+
+
+def decode(frame: Union[str, bytes]) -> Dict[str, Any]:
+    """Inverse of encode(), for any protocol (used by tests and Python clients)"""
+    if isinstance(frame, str):
+        return json.loads(frame)
+    if frame[:4] == ZSTD_MAGIC:
+        frame = zstandard.ZstdDecompressor().decompress(frame)
+    return msgpack.unpackb(frame, raw=False)
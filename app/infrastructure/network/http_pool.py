@@ -0,0 +1,94 @@
+"""
+Shared HTTP Connection Pool
+
+Process-wide registry of pooled httpx clients, one per origin
+(scheme://host:port), so outbound calls reuse keep-alive connections instead
+of paying TCP/TLS setup on every request. Clients are created lazily and
+closed from the FastAPI lifespan.
+"""
+import asyncio
+import logging
+from typing import Any, Dict
+from urllib.parse import urlsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 support in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class HTTPClientPool:
+    """Pooled httpx clients keyed by origin"""
+
+    def __init__(
+        self,
+        max_connections_per_host: int = 20,
+        max_keepalive_per_host: int = 10,
+        keepalive_expiry: float = 30.0,
+        default_timeout: float = 10.0,
+    ):
+        self.max_connections_per_host = max_connections_per_host
+        self.max_keepalive_per_host = max_keepalive_per_host
+        self.keepalive_expiry = keepalive_expiry
+        self.default_timeout = default_timeout
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    @staticmethod
+    def origin(url: str) -> str:
+        """Normalize a URL to the origin used as the pool key"""
+        parts = urlsplit(url)
+        if not parts.scheme or not parts.netloc:
+            raise ValueError(f"Absolute URL required, got: {url!r}")
+        return f"{parts.scheme}://{parts.netloc}".lower()
+
+    def client(self, url: str) -> httpx.AsyncClient:
+        """Get (or create) the pooled client for the origin of `url`"""
+        key = self.origin(url)
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                timeout=self.default_timeout,
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections_per_host,
+                    max_keepalive_connections=self.max_keepalive_per_host,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+            )
+            self._clients[key] = client
+            logger.debug(f"Created pooled HTTP client for {key}")
+        return client
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.client(url).request(method, url, **kwargs)
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def stream(self, method: str, url: str, **kwargs: Any):
+        """Streaming request context manager on the pooled client"""
+        return self.client(url).stream(method, url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http2": HTTP2_AVAILABLE,
+            "origins": sorted(key for key, client in self._clients.items() if not client.is_closed),
+        }
+
+    async def aclose(self):
+        """Close every pooled client (called on application shutdown)"""
+        clients, self._clients = list(self._clients.values()), {}
+        await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+        logger.info(f"Closed {len(clients)} pooled HTTP clients")
+
+
+# Global pool instance
+http_pool = HTTPClientPool()
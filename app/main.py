@@ -78,12 +78,25 @@ async def lifespan(app: FastAPI):
     init_db()
     logger.info("Database initialized")
     
+    # Start batched heartbeat history writer
+    from .core.orchestration.heartbeat_history import heartbeat_history
+    await heartbeat_history.start()
+    
     redis = await get_redis()
     
     # Check Redis connection
     await redis.ping()
     logger.info("Redis connected")
     
+    # Start embodiment command dispatcher (consumer pool for the CommandBus)
+    from .core.embodiment.dispatcher import command_dispatcher
+    await command_dispatcher.start()
+    logger.info("Embodiment command dispatcher started")
+    
+    # Start background endpoint health prober (serves cached orchestrator health)
+    from .core.embodiment.health_probe import endpoint_health_prober
+    await endpoint_health_prober.start()
+    
     # Try Docker connection (optional)
     try:
         docker = get_docker()
@@ -204,6 +217,17 @@ async def lifespan(app: FastAPI):
         await agent_manager.stop()
         await gpu_orchestrator.stop_monitoring()
         await orchestrator.stop()
+    from .core.embodiment.autonomy import autonomy_controller
+    await autonomy_controller.shutdown()
+    await command_dispatcher.stop()
+    await endpoint_health_prober.stop()
+    await heartbeat_history.stop()
+    from .db_async import async_engine
+    await async_engine.dispose()
+    from .core.embodiment.registry import embodiment_registry
+    await embodiment_registry.aclose()
+    from .infrastructure.network.http_pool import http_pool
+    await http_pool.aclose()
     await redis.close()
     if docker:
         docker.close()
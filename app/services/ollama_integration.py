@@ -8,9 +8,10 @@ import asyncio
 import logging
 import json
 from typing import Dict, List, Optional, Any, AsyncGenerator
-import aiohttp
 from datetime import datetime
 
+from ..infrastructure.network.http_pool import http_pool
+
 logger = logging.getLogger(__name__)
 
 
@@ -23,18 +24,17 @@ class OllamaProvider:
     def __init__(self, base_url: str = None, model: str = None):
         self.base_url = base_url or os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
         self.model = model or os.environ.get("OLLAMA_MODEL", "llama2")
-        self.timeout = aiohttp.ClientTimeout(total=300)  # 5 minutes for long responses
+        self.timeout = 300.0  # 5 minutes for long responses
         
     async def check_health(self) -> bool:
         """Check if Ollama is running"""
         try:
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                async with session.get(f"{self.base_url}/api/tags") as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        models = [m["name"] for m in data.get("models", [])]
-                        logger.info(f"Ollama is running with models: {models}")
-                        return True
+            response = await http_pool.get(f"{self.base_url}/api/tags", timeout=self.timeout)
+            if response.status_code == 200:
+                data = response.json()
+                models = [m["name"] for m in data.get("models", [])]
+                logger.info(f"Ollama is running with models: {models}")
+                return True
         except Exception as e:
             logger.error(f"Ollama health check failed: {e}")
         return False
@@ -42,11 +42,10 @@ class OllamaProvider:
     async def list_models(self) -> List[str]:
         """List available Ollama models"""
         try:
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                async with session.get(f"{self.base_url}/api/tags") as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return [m["name"] for m in data.get("models", [])]
+            response = await http_pool.get(f"{self.base_url}/api/tags", timeout=self.timeout)
+            if response.status_code == 200:
+                data = response.json()
+                return [m["name"] for m in data.get("models", [])]
         except Exception as e:
             logger.error(f"Failed to list Ollama models: {e}")
         return []
@@ -54,17 +53,18 @@ class OllamaProvider:
     async def pull_model(self, model_name: str) -> bool:
         """Pull a model from Ollama library"""
         try:
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                async with session.post(
-                    f"{self.base_url}/api/pull",
-                    json={"name": model_name}
-                ) as response:
-                    async for line in response.content:
-                        if line:
-                            data = json.loads(line)
-                            if "status" in data:
-                                logger.info(f"Pulling {model_name}: {data['status']}")
-                    return response.status == 200
+            async with http_pool.stream(
+                "POST",
+                f"{self.base_url}/api/pull",
+                json={"name": model_name},
+                timeout=self.timeout
+            ) as response:
+                async for line in response.aiter_lines():
+                    if line:
+                        data = json.loads(line)
+                        if "status" in data:
+                            logger.info(f"Pulling {model_name}: {data['status']}")
+                return response.status_code == 200
         except Exception as e:
             logger.error(f"Failed to pull model {model_name}: {e}")
         return False
@@ -94,27 +94,28 @@ class OllamaProvider:
         }
         
         try:
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                async with session.post(
-                    f"{self.base_url}/api/generate",
-                    json=payload
-                ) as response:
-                    if stream:
-                        async for line in response.content:
-                            if line:
-                                data = json.loads(line)
-                                if "response" in data:
-                                    yield data["response"]
-                    else:
-                        text = await response.text()
-                        lines = text.strip().split('\n')
-                        full_response = ""
-                        for line in lines:
-                            if line:
-                                data = json.loads(line)
-                                if "response" in data:
-                                    full_response += data["response"]
-                        yield full_response
+            async with http_pool.stream(
+                "POST",
+                f"{self.base_url}/api/generate",
+                json=payload,
+                timeout=self.timeout
+            ) as response:
+                if stream:
+                    async for line in response.aiter_lines():
+                        if line:
+                            data = json.loads(line)
+                            if "response" in data:
+                                yield data["response"]
+                else:
+                    text = (await response.aread()).decode()
+                    lines = text.strip().split('\n')
+                    full_response = ""
+                    for line in lines:
+                        if line:
+                            data = json.loads(line)
+                            if "response" in data:
+                                full_response += data["response"]
+                    yield full_response
                         
         except Exception as e:
             logger.error(f"Ollama generation error: {e}")
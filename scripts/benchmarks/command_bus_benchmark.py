@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Embodiment CommandBus Benchmark
+Compare enqueue/dispatch throughput (commands/sec) of the legacy LPUSH/RPOP
+list against the sorted-set and stream transports. Delivery is stubbed out so
+the numbers reflect Redis queueing cost only.
+
+Usage:
+    REDIS_URL=redis://localhost:6379 python scripts/benchmarks/command_bus_benchmark.py -n 5000
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.dependencies import get_redis
+from app.core.embodiment.command_bus import CommandBus, EmbodimentCommand
+from app.core.embodiment.dispatcher import CommandDispatcher
+
+LEGACY_QUEUE_KEY = "embodiment:bench:legacy"
+
+
+class StubDeliveryBus(CommandBus):
+    """CommandBus that acknowledges every command without HTTP delivery"""
+
+    async def _deliver(self, data):
+        return {"success": True, "agent_id": data["agent_id"], "correlation_id": data["correlation_id"]}
+
+
+def _command(i: int) -> EmbodimentCommand:
+    return EmbodimentCommand(
+        agent_id=f"bench-agent-{i % 16}",
+        action="speak",
+        payload={"text": "benchmark"},
+        priority=1 + i % 10,
+        timeout_ms=600000,
+    )
+
+
+async def _clear(redis, bus: CommandBus) -> None:
+    await redis.delete(LEGACY_QUEUE_KEY, bus.PENDING_KEY, *bus.queue_keys())
+
+
+async def bench_legacy_list(n: int) -> dict:
+    """The original one-command-per-round-trip list implementation"""
+    redis = await get_redis()
+    await redis.delete(LEGACY_QUEUE_KEY)
+    start = time.perf_counter()
+    for i in range(n):
+        cmd = _command(i)
+        cmd.ensure_correlation()
+        await redis.lpush(LEGACY_QUEUE_KEY, json.dumps(cmd.__dict__))
+    enqueue_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    while True:
+        raw = await redis.rpop(LEGACY_QUEUE_KEY)
+        if not raw:
+            break
+        data = json.loads(raw)
+        await redis.set(f"{CommandBus.RESULT_PREFIX}{data['correlation_id']}", json.dumps({"success": True}))
+    dispatch_s = time.perf_counter() - start
+    return {"enqueue_per_sec": n / enqueue_s, "dispatch_per_sec": n / dispatch_s}
+
+
+async def bench_transport(transport: str, n: int, workers: int, batch_size: int) -> dict:
+    redis = await get_redis()
+    # Lift the per-agent depth limit so the whole run can be queued up front
+    bus = StubDeliveryBus(transport=transport, max_queue_depth=n)
+    await _clear(redis, bus)
+
+    start = time.perf_counter()
+    for i in range(n):
+        await bus.enqueue(_command(i))
+    enqueue_s = time.perf_counter() - start
+
+    dispatcher = CommandDispatcher(bus, workers=workers, batch_size=batch_size, idle_sleep=0.01)
+    start = time.perf_counter()
+    await dispatcher.start()
+    while dispatcher.stats["delivered"] + dispatcher.stats["failed"] < n:
+        await asyncio.sleep(0.01)
+    dispatch_s = time.perf_counter() - start
+    await dispatcher.stop()
+    await _clear(redis, bus)
+    return {"enqueue_per_sec": n / enqueue_s, "dispatch_per_sec": n / dispatch_s}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--commands", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    results = {
+        "commands": args.commands,
+        "workers": args.workers,
+        "batch_size": args.batch_size,
+        "backends": {
+            "list": await bench_legacy_list(args.commands),
+            "sorted_set": await bench_transport("sorted_set", args.commands, args.workers, args.batch_size),
+            "stream": await bench_transport("stream", args.commands, args.workers, args.batch_size),
+        },
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+"""
+Performance Suite Fixtures
+
+Redis backend selection and JSON result collection for the benchmarks.
+
+Backend:
+    PERF_REDIS_URL=redis://localhost:6379/15  use a local Redis (the DB is FLUSHED)
+    otherwise                                 fakeredis, or skip if not installed
+
+Results:
+    PERF_RESULTS=perf-results.json            where the JSON report is written
+    PERF_SCALE=1                              multiplier for dataset/iteration sizes
+"""
+import json
+import os
+import platform
+import statistics
+import sys
+from datetime import datetime
+from typing import Any, Dict, List
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+os.environ.update({
+    "JWT_SECRET": "test-jwt-secret-32-chars-minimum-for-testing",
+    "ADMIN_PASSWORD": "test-admin-password-123",
+    "ENVIRONMENT": "test",
+})
+
+PERF_SCALE = max(1, int(os.environ.get("PERF_SCALE", "1")))
+_RESULTS: Dict[str, Dict[str, Any]] = {}
+
+
+def _summarize(samples: List[float], ops_per_sample: int = 1, **extra: Any) -> Dict[str, Any]:
+    """Latency percentiles (ms) and throughput for a list of per-call durations in seconds"""
+    ordered = sorted(samples)
+    total = sum(ordered)
+
+    def pct(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 4)
+
+    return {
+        "iterations": len(ordered),
+        "ops_per_sec": round(len(ordered) * ops_per_sample / total, 2) if total else None,
+        "mean_ms": round(statistics.mean(ordered) * 1000, 4),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "max_ms": round(ordered[-1] * 1000, 4),
+        **extra,
+    }
+
+
+def _backend_name() -> str:
+    return os.environ.get("PERF_REDIS_URL") or "fakeredis"
+
+
+def _new_client():
+    url = os.environ.get("PERF_REDIS_URL")
+    if url:
+        import redis.asyncio as aioredis
+        return aioredis.from_url(url)
+    fakeredis = pytest.importorskip("fakeredis", reason="install fakeredis or set PERF_REDIS_URL")
+    return fakeredis.FakeAsyncRedis()
+
+
+@pytest.fixture
+def perf_redis(monkeypatch):
+    """Async factory returning an empty Redis installed as the app's shared client.
+
+    Clients are bound to the event loop they are created on, so each benchmark
+    calls this from inside its own asyncio.run().
+    """
+    from app import dependencies
+
+    async def connect():
+        client = _new_client()
+        await client.flushdb()
+        monkeypatch.setattr(dependencies, "redis_client", client)
+        return client
+
+    return connect
+
+
+@pytest.fixture
+def record_benchmark():
+    """Summarize per-call durations (seconds) under `name` for the JSON report"""
+    def record(name: str, samples: List[float], ops_per_sample: int = 1, **extra: Any) -> Dict[str, Any]:
+        _RESULTS[name] = _summarize(samples, ops_per_sample, **extra)
+        return _RESULTS[name]
+    return record
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not _RESULTS:
+        return
+    report = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "backend": _backend_name(),
+        "scale": PERF_SCALE,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": dict(sorted(_RESULTS.items())),
+    }
+    path = os.environ.get("PERF_RESULTS", "perf-results.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
@@ -0,0 +1,314 @@
+"""
+Hot Path Benchmarks
+
+Micro-benchmarks for the request paths that dominate load: command
+enqueue/dispatch, registry reads, WebSocket fan-out, audit logging, task
+routing and collective consensus. They run offline against fakeredis (or the
+Redis in PERF_REDIS_URL) with agents stubbed at the HTTP transport, and the
+numbers are written to the JSON report configured in conftest.py.
+"""
+import pytest
+import asyncio
+import importlib
+import itertools
+import os
+import random
+import sys
+import time
+from collections import deque
+from datetime import datetime
+
+import httpx
+
+# Add the app to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.core.embodiment import registry as registry_module
+from app.core.embodiment.command_bus import CommandBus, EmbodimentCommand
+from app.core.embodiment.dispatcher import CommandDispatcher
+from app.core.embodiment.registry import EmbodiedAgent, EmbodimentRegistry
+from app.core.orchestration.container_registry import ContainerRegistration, ContainerRegistry
+from app.core.orchestration.task_coordinator import TaskCoordinator
+from app.infrastructure.network.http_pool import HTTPClientPool, http_pool
+
+SCALE = max(1, int(os.environ.get("PERF_SCALE", "1")))
+STUB_AGENTS = 16
+
+
+async def measure(fn, iterations: int, warmup: int = 5):
+    """Per-call durations (seconds) of `iterations` awaited calls of `fn()`"""
+    for _ in range(warmup):
+        await fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _import_or_skip(module: str):
+    """Import an app module whose runtime dependencies may be unavailable"""
+    try:
+        return importlib.import_module(module)
+    except ImportError as e:
+        pytest.skip(f"{module} unavailable: {e}")
+
+
+def _stub_agent_endpoint(i: int) -> str:
+    return f"http://stub-agent-{i}:8080"
+
+
+async def _register_stub_agents(registry: EmbodimentRegistry, count: int) -> None:
+    for i in range(count):
+        await registry.register(EmbodiedAgent(
+            agent_id=f"bench-agent-{i}",
+            name=f"Bench Agent {i}",
+            endpoint=_stub_agent_endpoint(i),
+            capabilities=["speak", "animate"],
+            status="online",
+            metadata={"region": f"r{i % 4}"},
+        ))
+
+
+def _install_stub_agents(monkeypatch, count: int) -> list:
+    """Route the pooled HTTP clients for every stub agent to an in-process handler"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(202, json={"accepted": True})
+
+    monkeypatch.setattr(http_pool, "_clients", {})
+    clients = []
+    for i in range(count):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        http_pool._clients[HTTPClientPool.origin(_stub_agent_endpoint(i))] = client
+        clients.append(client)
+    return clients
+
+
+class FakeWebSocket:
+    """WebSocket stand-in that only counts outgoing frames"""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.sent += 1
+
+
+class TestCommandBusPerformance:
+    """Enqueue latency and end-to-end dispatch throughput per transport"""
+
+    @pytest.mark.performance
+    @pytest.mark.parametrize("transport", ["sorted_set", "stream"])
+    def test_enqueue_and_dispatch(self, transport, perf_redis, record_benchmark, monkeypatch):
+        commands = 500 * SCALE
+
+        async def run():
+            redis = await perf_redis()
+            registry = EmbodimentRegistry()
+            monkeypatch.setattr(registry_module, "embodiment_registry", registry)
+            clients = _install_stub_agents(monkeypatch, STUB_AGENTS)
+            await _register_stub_agents(registry, STUB_AGENTS)
+            bus = CommandBus(transport=transport, max_queue_depth=commands)
+            counter = itertools.count()
+
+            async def enqueue():
+                i = next(counter)
+                await bus.enqueue(EmbodimentCommand(
+                    agent_id=f"bench-agent-{i % STUB_AGENTS}",
+                    action="speak",
+                    payload={"text": "benchmark"},
+                    priority=1 + i % 10,
+                    timeout_ms=600000,
+                ))
+
+            enqueue_samples = await measure(enqueue, commands)
+            queued = next(counter)  # includes measure()'s warmup calls
+            dispatcher = CommandDispatcher(bus, workers=4, batch_size=32, idle_sleep=0.005)
+            start = time.perf_counter()
+            await dispatcher.start()
+            while sum(dispatcher.stats.values()) < queued:
+                await asyncio.sleep(0.005)
+            dispatch_elapsed = time.perf_counter() - start
+            await dispatcher.stop()
+            await registry.aclose()
+            await asyncio.gather(*(client.aclose() for client in clients))
+            await redis.aclose()
+            return enqueue_samples, dispatch_elapsed, dict(dispatcher.stats)
+
+        enqueue_samples, dispatch_elapsed, stats = asyncio.run(run())
+        record_benchmark(f"command_bus.enqueue[{transport}]", enqueue_samples)
+        record_benchmark(f"command_bus.dispatch[{transport}]", [dispatch_elapsed], ops_per_sample=stats["delivered"], commands=stats["delivered"])
+        assert stats["delivered"] == commands + 5  # plus warmup
+
+
+class TestRegistryPerformance:
+    """Read paths of the embodiment and container registries"""
+
+    @pytest.mark.performance
+    def test_embodiment_registry_list_and_get(self, perf_redis, record_benchmark):
+        agents = 200 * SCALE
+
+        async def run():
+            redis = await perf_redis()
+            registry = EmbodimentRegistry()
+            await _register_stub_agents(registry, agents)
+            reader = EmbodimentRegistry()  # a second replica starting cold
+            start = time.perf_counter()
+            listed = await reader.list_agents()
+            cold = time.perf_counter() - start
+            list_samples = await measure(reader.list_agents, 50)
+            ids = [f"bench-agent-{i}" for i in range(agents)]
+            get_samples = await measure(lambda: reader.get(random.choice(ids)), 1000)
+            await registry.aclose()
+            await reader.aclose()
+            await redis.aclose()
+            return len(listed), cold, list_samples, get_samples
+
+        count, cold, list_samples, get_samples = asyncio.run(run())
+        record_benchmark("embodiment_registry.list_agents.cold", [cold], agents=count)
+        record_benchmark("embodiment_registry.list_agents", list_samples, agents=count)
+        record_benchmark("embodiment_registry.get", get_samples, agents=count)
+        assert count == agents
+
+    @pytest.mark.performance
+    def test_container_registry_get_all_containers(self, perf_redis, record_benchmark):
+        containers = 200 * SCALE
+
+        async def run():
+            registry = ContainerRegistry()
+            registry.redis = await perf_redis()
+            for i in range(containers):
+                await registry.register_container(ContainerRegistration(
+                    container_id=f"bench-container-{i}",
+                    container_name=f"bench-{i}",
+                    host_address=f"10.0.{i // 250}.{i % 250}",
+                    api_endpoint=f"http://10.0.{i // 250}.{i % 250}:8001",
+                    capabilities=["agent_runtime", "gpu" if i % 3 == 0 else "cpu"],
+                    resources={"cpu_count": 4, "memory_limit": 8 * 1024 ** 3},
+                    status="active" if i % 5 else "inactive",
+                ))
+            found = await registry.get_all_containers(include_inactive=True)
+            samples = await measure(lambda: registry.get_all_containers(include_inactive=True), 20, warmup=2)
+            status_samples = await measure(registry.get_cluster_status, 200)
+            query_samples = await measure(
+                lambda: registry.query_containers(capabilities=["gpu"], min_health=70, sort_by="free_memory", limit=10),
+                100,
+            )
+            await registry.redis.aclose()
+            return len(found), samples, status_samples, query_samples
+
+        count, samples, status_samples, query_samples = asyncio.run(run())
+        record_benchmark("container_registry.get_all_containers", samples, containers=count)
+        record_benchmark("container_registry.get_cluster_status", status_samples, containers=count)
+        record_benchmark("container_registry.query_containers", query_samples, containers=count)
+        assert count == containers
+
+
+class TestWebSocketPerformance:
+    """Broadcast fan-out to many subscribed clients"""
+
+    @pytest.mark.performance
+    def test_broadcast_fan_out(self, record_benchmark):
+        ws_module = _import_or_skip("app.infrastructure.messaging.websocket_manager")
+        clients = 500 * SCALE
+
+        async def run():
+            manager = ws_module.WebSocketManager()
+            sockets = [FakeWebSocket() for _ in range(clients)]
+            for websocket in sockets:
+                client_id = await manager.connect_client(websocket)
+                await manager.subscribe_client(client_id, ws_module.SubscriptionType.MARKET_DATA)
+            message = ws_module.WebSocketMessage(
+                type=ws_module.MessageType.MARKET_DATA,
+                data={"symbol": "BTC/USD", "price": 64250.5, "volume": 1234.5, "bid": 64250.0, "ask": 64251.0},
+                timestamp=datetime.utcnow().isoformat(),
+            )
+            samples = await measure(
+                lambda: manager.broadcast_to_subscription(ws_module.SubscriptionType.MARKET_DATA, message), 50
+            )
+            await manager.drain()
+            return samples, sockets
+
+        samples, sockets = asyncio.run(run())
+        record_benchmark("websocket_manager.broadcast_to_subscription", samples, ops_per_sample=clients, clients=clients)
+        assert all(websocket.sent >= 50 for websocket in sockets)
+
+
+class TestAuditLoggerPerformance:
+    """Per-event cost of the audit trail, including buffer flushes to disk"""
+
+    @pytest.mark.performance
+    def test_log_event(self, perf_redis, record_benchmark, tmp_path, monkeypatch):
+        monkeypatch.setenv("AUDIT_DATA_DIR", str(tmp_path / "audit"))
+        audit_module = _import_or_skip("app.infrastructure.monitoring.audit_logger")
+        events = 1000 * SCALE
+
+        async def run():
+            audit = audit_module.AuditLogger()
+            audit.redis = await perf_redis()
+            samples = await measure(
+                lambda: audit.log_event(audit_module.AuditEventType.PRICE_UPDATE, {"symbol": "ETH/USD", "price": 3120.25}),
+                events,
+            )
+            await audit.redis.aclose()
+            return samples
+
+        record_benchmark("audit_logger.log_event", asyncio.run(run()), events=events)
+
+
+class TestTaskRoutingPerformance:
+    """Agent selection cost as the fleet grows"""
+
+    @pytest.mark.performance
+    @pytest.mark.parametrize("agents", [100, 1000])
+    def test_find_best_agent(self, agents, record_benchmark):
+        agents *= SCALE
+        coordinator = TaskCoordinator()
+        rng = random.Random(42)
+        capability_pool = ["trading", "analysis", "risk", "speech", "vision"]
+        for i in range(agents):
+            agent_id = f"agent-{i}"
+            coordinator.agent_capabilities[agent_id] = rng.sample(capability_pool, 3)
+            coordinator.agent_metrics[agent_id] = {
+                "cpu_usage": rng.uniform(0, 100),
+                "memory_usage": rng.uniform(0, 100),
+                "active_tasks": rng.randint(0, 8),
+            }
+            coordinator.agent_performance[agent_id] = deque((rng.uniform(1, 60) for _ in range(100)), maxlen=100)
+        task = {"type": "analysis", "capabilities": ["analysis", "risk"]}
+
+        samples = asyncio.run(measure(lambda: coordinator._find_best_agent(task), 200))
+        record_benchmark(f"task_coordinator.find_best_agent[{agents}]", samples, agents=agents)
+
+
+class TestConsensusPerformance:
+    """Each CollectiveIntelligence consensus algorithm over a large electorate"""
+
+    @pytest.mark.performance
+    @pytest.mark.parametrize("algorithm", [
+        "simple_majority", "weighted_majority", "byzantine_fault_tolerant", "proof_of_stake", "delegated",
+    ])
+    def test_consensus(self, algorithm, record_benchmark):
+        ci_module = _import_or_skip("app.core.agents.collective_intelligence")
+        voters = 500 * SCALE
+        intelligence = ci_module.CollectiveIntelligence()
+        rng = random.Random(7)
+        participants = [f"agent-{i}" for i in range(voters)]
+        for agent_id in participants:
+            intelligence.agent_weights[agent_id] = rng.uniform(0.1, 2.0)
+            intelligence.performance_tracking[agent_id] = {
+                "total_return": rng.uniform(-0.2, 0.5),
+                "sharpe_ratio": rng.uniform(-1.0, 3.0),
+            }
+        intelligence.active_decisions["bench"] = {
+            "participants": participants,
+            "votes": {agent_id: rng.choice(["approve", "approve", "reject", "abstain"]) for agent_id in participants},
+        }
+        consensus = ci_module.ConsensusAlgorithm(algorithm)
+
+        samples = asyncio.run(measure(lambda: intelligence._process_decision("bench", consensus), 200))
+        record_benchmark(f"collective_intelligence.{algorithm}", samples, voters=voters)
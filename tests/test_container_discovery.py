@@ -0,0 +1,447 @@
+"""
+Container Discovery Tests
+
+Tests for ContainerDiscoveryService health scheduling against an in-memory
+fakeredis server, with Docker unavailable (self-registration mode) or served
+by a stub SDK client whose blocking calls sleep.
+"""
+import pytest
+import asyncio
+import json
+import os
+import sys
+import queue
+import time
+from types import SimpleNamespace
+
+# Add the app to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set up test environment variables
+os.environ.update({
+    "JWT_SECRET": "test-jwt-secret-32-chars-minimum-for-testing",
+    "ADMIN_PASSWORD": "test-admin-password-123",
+    "ENVIRONMENT": "test",
+    "REDIS_URL": "redis://localhost:6379",
+})
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.core.orchestration.container_discovery import ContainerDiscoveryService
+from app.core.orchestration.container_stats import ContainerStatsCollector
+from app.infrastructure.containers.docker_adapter import AsyncDockerClient
+
+
+class StubContainer:
+    """Blocking docker SDK container whose stats/exec calls take `delay` seconds"""
+
+    def __init__(self, container_id, delay=0.0, labels=None, exit_code=0, image_id=None, exec_log=None):
+        self.id = container_id.ljust(64, "0")
+        self.name = f"agent-{container_id}"
+        self.status = "running"
+        self.labels = labels or {}
+        self.attrs = {"Config": {"Env": []}, "NetworkSettings": {"Networks": {}}, "Image": image_id}
+        self.image = SimpleNamespace(tags=["stub:latest"])
+        self.delay = delay
+        self.exit_code = exit_code
+        self.exec_log = exec_log if exec_log is not None else []
+        self.sampled = 0
+
+    def stats(self, stream=True, one_shot=False, decode=False):
+        if stream:
+            return self._stream()
+        self.sampled += 1
+        time.sleep(self.delay)
+        return {
+            "cpu_stats": {"cpu_usage": {"total_usage": 200}, "system_cpu_usage": 2000, "online_cpus": 2},
+            "precpu_stats": {"cpu_usage": {"total_usage": 100}, "system_cpu_usage": 1000},
+            "memory_stats": {"usage": 256, "limit": 1024},
+        }
+
+    def _stream(self):
+        # Container uses a quarter of the host's CPU and half its memory limit
+        for tick in range(1, 1000):
+            yield {
+                "cpu_stats": {"cpu_usage": {"total_usage": 250 * tick}, "system_cpu_usage": 1000 * tick, "online_cpus": 2},
+                "memory_stats": {"usage": 512, "limit": 1024},
+            }
+            time.sleep(0.02)
+
+    def exec_run(self, cmd, demux=False):
+        self.exec_log.append(cmd)
+        time.sleep(self.delay)
+        return SimpleNamespace(exit_code=self.exit_code, output=(b"", b""))
+
+
+class StubEventStream:
+    """Blocking event stream fed from the test thread"""
+
+    def __init__(self):
+        self.events = queue.Queue()
+
+    def __iter__(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                return
+            yield event
+
+    def close(self):
+        self.events.put(None)
+
+
+class StubDockerClient:
+    """Just enough of docker.DockerClient for the discovery service"""
+
+    def __init__(self, *containers):
+        self.by_id = {c.id[:12]: c for c in containers}
+        self.containers = SimpleNamespace(list=self._list, get=self._get)
+        self.inspected = []
+        self.event_stream = StubEventStream()
+
+    def events(self, decode=False, filters=None):
+        return self.event_stream
+
+    def _list(self, all=False, sparse=False, filters=None):
+        return [SimpleNamespace(id=c.id) for c in self.by_id.values()]
+
+    def _get(self, container_id):
+        self.inspected.append(container_id)
+        return self.by_id[container_id]
+
+    def ping(self):
+        return True
+
+    def close(self):
+        pass
+
+
+async def _service_with(*container_ids):
+    service = ContainerDiscoveryService(stats_collector=ContainerStatsCollector())
+    service.redis = fakeredis.FakeAsyncRedis()
+    service.registry.redis = service.redis
+    await service.redis.flushdb()
+    for container_id in container_ids:
+        await service.register_container_manually({"id": container_id, "name": f"agent-{container_id}"})
+    return service
+
+
+class TestHealthDeadlines:
+    """Health checks driven by the deadline sorted set"""
+
+    @pytest.mark.unit
+    def test_only_due_containers_are_checked(self):
+        async def run():
+            service = await _service_with("a", "b", "c")
+            checked = []
+            original = service._health_check_container
+
+            async def recording_check(container_id):
+                checked.append(container_id)
+                await original(container_id)
+
+            service._health_check_container = recording_check
+            await service._check_container_health()
+            nothing_due = list(checked)
+            await service.redis.zadd(service.HEALTH_DEADLINES_KEY, {"b": time.time() - 1})
+            await service._check_container_health()
+            next_due = await service.redis.zscore(service.HEALTH_DEADLINES_KEY, "b")
+            return nothing_due, checked, next_due
+
+        nothing_due, checked, next_due = asyncio.run(run())
+        assert nothing_due == []
+        assert checked == ["b"]
+        assert next_due == pytest.approx(time.time() + 15, abs=5)
+
+    @pytest.mark.unit
+    def test_unregister_and_seed_manage_deadlines(self):
+        async def run():
+            service = await _service_with("a", "b")
+            await service._unregister_container("a")
+            # Pre-existing active container without a deadline
+            await service.redis.sadd("containers:active", "legacy")
+            await service._seed_health_deadlines()
+            return {
+                member.decode(): score
+                for member, score in await service.redis.zrange(service.HEALTH_DEADLINES_KEY, 0, -1, withscores=True)
+            }
+
+        deadlines = asyncio.run(run())
+        assert set(deadlines) == {"b", "legacy"}
+        assert deadlines["legacy"] <= time.time()
+        assert deadlines["b"] > time.time()
+
+
+class TestAsyncDockerAdapter:
+    """Docker SDK calls off the event loop, fanned out and time-bounded"""
+
+    @pytest.mark.unit
+    def test_health_checks_fan_out_concurrently(self):
+        containers = [StubContainer(f"c{i}", delay=0.2) for i in range(4)]
+
+        async def run():
+            service = await _service_with()
+            service.docker = AsyncDockerClient(StubDockerClient(*containers), max_workers=8)
+            for container in containers:
+                await service.register_container_manually({"id": container.id[:12]})
+            await service.redis.zadd(service.HEALTH_DEADLINES_KEY, {c.id[:12]: 0 for c in containers})
+            started = time.perf_counter()
+            await service._check_container_health()
+            elapsed = time.perf_counter() - started
+            scores = [await service.redis.hget(f"container:registry:{c.id[:12]}", "health_score") for c in containers]
+            await service.docker.close()
+            return elapsed, scores
+
+        elapsed, scores = asyncio.run(run())
+        # Sequentially this is 4 containers x (stats + exec) x 0.2s = 1.6s
+        assert elapsed < 0.8
+        assert scores == [b"100"] * 4
+
+    @pytest.mark.unit
+    def test_slow_call_times_out_without_blocking_loop(self):
+        async def run():
+            docker = AsyncDockerClient(StubDockerClient(), stats_timeout=0.1)
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.01)
+
+            ticking = asyncio.create_task(ticker())
+            started = time.perf_counter()
+            with pytest.raises(asyncio.TimeoutError):
+                await docker.stats(StubContainer("slow", delay=0.5))
+            elapsed = time.perf_counter() - started
+            ticking.cancel()
+            await docker.close()
+            return elapsed, ticks
+
+        elapsed, ticks = asyncio.run(run())
+        assert elapsed < 0.4
+        assert ticks >= 5
+
+    @pytest.mark.unit
+    def test_discovery_inspects_only_new_containers(self):
+        capable = StubContainer("capable", labels={"autogen.agent.capable": "true"})
+        other = StubContainer("other")
+
+        async def run():
+            service = await _service_with()
+            client = StubDockerClient(capable, other)
+            service.docker = AsyncDockerClient(client)
+            await service._discover_containers()
+            first_pass = sorted(client.inspected)
+            await service._discover_containers()
+            registered = await service.redis.smembers("containers:active")
+            await service.docker.close()
+            return first_pass, client.inspected[len(first_pass):], registered
+
+        first_pass, second_pass, registered = asyncio.run(run())
+        assert first_pass == ["capable00000", "other0000000"]
+        assert second_pass == ["other0000000"]
+        assert registered == {b"capable00000"}
+
+
+class TestEventDrivenDiscovery:
+    """Discovery driven by the Docker events stream"""
+
+    @pytest.mark.unit
+    def test_start_and_die_events_update_registry(self):
+        container = StubContainer("evented", labels={"autogen.agent.capable": "true"})
+
+        async def wait_for(predicate, timeout=2.0):
+            deadline = time.perf_counter() + timeout
+            while not await predicate():
+                assert time.perf_counter() < deadline
+                await asyncio.sleep(0.01)
+
+        async def run():
+            service = await _service_with()
+            client = StubDockerClient(container)
+            service.docker = AsyncDockerClient(client)
+            service.events_task = asyncio.create_task(service._event_loop())
+            await wait_for(lambda: asyncio.sleep(0, result=service.events_connected))
+
+            started = time.perf_counter()
+            client.event_stream.events.put({"status": "start", "id": container.id, "Action": "start"})
+            await wait_for(lambda: service.redis.sismember("containers:active", "evented00000"))
+            latency = time.perf_counter() - started
+
+            client.event_stream.events.put({"status": "die", "id": container.id, "Action": "die"})
+            await wait_for(lambda: service.redis.sismember("containers:terminated", "evented00000"))
+            active = await service.redis.smembers("containers:active")
+
+            service.events_task.cancel()
+            await asyncio.gather(service.events_task, return_exceptions=True)
+            await service.docker.close()
+            return latency, active, service.known_containers
+
+        latency, active, known = asyncio.run(run())
+        assert latency < 1.0
+        assert active == set()
+        assert known == set()
+
+
+class TestRegistryConsistency:
+    """Discovery writes keep the registry's summary and indexes in step"""
+
+    @pytest.mark.unit
+    def test_health_checks_move_summary_and_indexes(self):
+        healthy = StubContainer("healthy")
+        stopped = StubContainer("stopped")
+
+        async def run():
+            service = await _service_with()
+            service.docker = AsyncDockerClient(StubDockerClient(healthy, stopped))
+            for container in (healthy, stopped):
+                await service.register_container_manually({"id": container.id[:12], "resources": {"cpu_count": 2}})
+            before = await service.registry.get_cluster_status()
+            stopped.status = "exited"
+            await service.redis.zadd(service.HEALTH_DEADLINES_KEY, {c.id[:12]: 0 for c in (healthy, stopped)})
+            await service._check_container_health()
+            await service.docker.close()
+            after = await service.registry.get_cluster_status()
+            unhealthy = await service.redis.smembers("containers:status:unhealthy")
+            health = await service.redis.zscore(service.registry.HEALTH_INDEX_KEY, stopped.id[:12])
+            await service.registry.reconcile()
+            return before, after, unhealthy, health, await service.registry.get_cluster_status()
+
+        before, after, unhealthy, health, reconciled = asyncio.run(run())
+        assert before["active_containers"] == 2 and before["total_cpu_cores"] == 2 * 2
+        assert after["active_containers"] == 1 and after["total_containers"] == 2
+        assert unhealthy == {b"stopped00000"}
+        assert health == 0
+        assert {**reconciled, "timestamp": None} == {**after, "timestamp": None}
+
+    @pytest.mark.unit
+    def test_reaped_container_is_rediscovered(self):
+        container = StubContainer("reaped", labels={"autogen.agent.capable": "true"})
+
+        async def run():
+            service = await _service_with()
+            service.docker = AsyncDockerClient(StubDockerClient(container))
+            await service._discover_containers()
+            # Health checks kept failing, so the registry's reaper removed the record
+            await service.registry.deregister_container(container.id[:12], reason="heartbeat_timeout")
+            await service._health_check_container(container.id[:12])
+            forgotten = container.id[:12] not in service.known_containers
+            await service._discover_containers()
+            record = await service.registry.get_container(container.id[:12], fields=["status"])
+            due = await service.redis.zscore(service.HEALTH_DEADLINES_KEY, container.id[:12])
+            await service.stats_collector.stop()
+            await service.docker.close()
+            return forgotten, record, due, service.known_containers
+
+        forgotten, record, due, known = asyncio.run(run())
+        assert forgotten
+        assert record["status"] == "discovered"
+        assert due is not None
+        assert known == {"reaped000000"}
+
+
+class TestCapabilityCache:
+    """Exec probe results cached per image fingerprint"""
+
+    @pytest.mark.unit
+    def test_replicas_of_one_image_share_probes(self):
+        execs = []
+        replicas = [
+            StubContainer(
+                f"replica{i}", delay=0.05, image_id="sha256:agent-v1", exec_log=execs,
+                labels={"autogen.agent.capable": "true", "com.docker.compose.container-number": str(i)},
+            )
+            for i in range(5)
+        ]
+
+        async def run():
+            service = await _service_with()
+            service.docker = AsyncDockerClient(StubDockerClient(*replicas))
+            # Scaling out: all replicas start at once, then more arrive later
+            await asyncio.gather(*(service._discover_container(c.id[:12]) for c in replicas[:3]))
+            for container in replicas[3:]:
+                await service._discover_container(container.id[:12])
+            capabilities = await service.redis.hget("container:registry:replica40000", "capabilities")
+            await service.docker.close()
+            return capabilities
+
+        capabilities = asyncio.run(run())
+        assert len(execs) == len(ContainerDiscoveryService.EXEC_PROBES)
+        assert json.loads(capabilities) == ["agent_runner", "gpu_compute", "storage"]
+
+    @pytest.mark.unit
+    def test_new_image_or_failed_probe_is_not_served_from_cache(self):
+        execs = []
+        v1 = StubContainer("v1", image_id="sha256:agent-v1", exec_log=execs)
+        v2 = StubContainer("v2", image_id="sha256:agent-v2", exec_log=execs, exit_code=1)
+
+        async def run():
+            service = await _service_with()
+            service.docker = AsyncDockerClient(StubDockerClient(v1, v2), exec_timeout=0.1)
+            first = await service._exec_probes(v1)
+            upgraded = await service._exec_probes(v2)
+            # A timed-out probe is not cached, so the next container retries
+            v2_again = StubContainer("v2b", delay=0.3, image_id="sha256:agent-v3", exec_log=execs)
+            await service._exec_probes(v2_again)
+            cached_keys = sorted(k.decode() for k in await service.redis.keys(f"{service.CAPABILITY_CACHE_PREFIX}*"))
+            await service.docker.close()
+            return first, upgraded, cached_keys
+
+        first, upgraded, cached_keys = asyncio.run(run())
+        assert all(first.values())
+        assert not any(upgraded.values())
+        assert len(execs) == 3 * len(ContainerDiscoveryService.EXEC_PROBES)
+        assert [key.split(":")[2:4] for key in cached_keys] == [["sha256", "agent-v1"], ["sha256", "agent-v2"]]
+
+
+class TestStreamingStats:
+    """Health checks read the streaming stats ring buffer"""
+
+    @pytest.mark.unit
+    def test_cpu_percent_from_consecutive_deltas(self):
+        collector = ContainerStatsCollector(buffer_size=3)
+        for tick in range(5):
+            collector.record("c1", {
+                "cpu_stats": {"cpu_usage": {"total_usage": 100 * tick ** 2}, "system_cpu_usage": 1000 * tick},
+                "memory_stats": {"usage": 100, "limit": 400},
+            })
+
+        samples = collector.window("c1")
+        # CPU deltas per tick are 100, 300, 500, 700 against 1000 of system time; the buffer keeps the last 3
+        assert [s.cpu_usage_percent for s in samples] == [30.0, 50.0, 70.0]
+        assert collector.resources("c1")["memory_percent"] == 25.0
+        assert collector.resources("unknown") is None
+
+    @pytest.mark.unit
+    def test_health_check_uses_buffer_instead_of_sampling(self):
+        container = StubContainer("streamed", labels={"autogen.agent.capable": "true"})
+
+        async def run():
+            service = await _service_with()
+            service.docker = AsyncDockerClient(StubDockerClient(container))
+            service.stats_collector.docker = service.docker
+            await service._discover_container(container.id[:12])
+            sampled_at_registration = container.sampled
+
+            deadline = time.perf_counter() + 2
+            while len(service.stats_collector.window(container.id[:12])) < 3:
+                assert time.perf_counter() < deadline
+                await asyncio.sleep(0.02)
+
+            await service._health_check_container(container.id[:12])
+            resources = json.loads(await service.redis.hget("container:registry:streamed0000", "resources"))
+            sampled_after_health_check = container.sampled
+
+            await service._unregister_container(container.id[:12])
+            streams_after_unregister = service.stats_collector.get_stats()["streams"]
+            await service.stats_collector.stop()
+            await service.docker.close()
+            return sampled_at_registration, sampled_after_health_check, resources, streams_after_unregister
+
+        at_registration, after_health_check, resources, streams = asyncio.run(run())
+        assert at_registration == 1
+        assert after_health_check == at_registration
+        assert resources["cpu_usage_percent"] == 25.0
+        assert resources["memory_percent"] == 50.0
+        assert streams == 0
@@ -0,0 +1,368 @@
+"""
+Container Registry Tests
+
+Tests for ContainerRegistry reads and bookkeeping against an in-memory
+fakeredis server.
+"""
+import pytest
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Add the app to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set up test environment variables
+os.environ.update({
+    "JWT_SECRET": "test-jwt-secret-32-chars-minimum-for-testing",
+    "ADMIN_PASSWORD": "test-admin-password-123",
+    "ENVIRONMENT": "test",
+    "REDIS_URL": "redis://localhost:6379",
+})
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.core.orchestration.container_registry import ContainerRegistration, ContainerRegistry
+
+
+def _registration(i, status="active", capabilities=("agent_runner",)):
+    return ContainerRegistration(
+        container_id=f"c{i}",
+        container_name=f"container-{i}",
+        host_address=f"10.0.0.{i}",
+        api_endpoint=f"http://10.0.0.{i}:8001",
+        capabilities=list(capabilities),
+        resources={"cpu_count": 2, "memory_limit": 1024},
+        metadata={"zone": "a"},
+        status=status,
+    )
+
+
+async def _registry_with(*registrations):
+    registry = ContainerRegistry()
+    registry.redis = fakeredis.FakeAsyncRedis()
+    await registry.redis.flushdb()
+    for registration in registrations:
+        await registry.register_container(registration)
+    return registry
+
+
+class TestContainerRegistryBulkReads:
+    """Pipelined bulk reads and field projection"""
+
+    @pytest.mark.unit
+    def test_get_all_containers_uses_one_pipeline(self, monkeypatch):
+        async def run():
+            registry = await _registry_with(
+                _registration(1), _registration(2), _registration(3, status="inactive"),
+            )
+            pipelines = []
+            original = registry.redis.pipeline
+
+            def counting_pipeline(*args, **kwargs):
+                pipelines.append(kwargs)
+                return original(*args, **kwargs)
+
+            monkeypatch.setattr(registry.redis, "pipeline", counting_pipeline)
+
+            async def no_single_reads(*args, **kwargs):
+                raise AssertionError("per-container HGETALL")
+
+            monkeypatch.setattr(registry.redis, "hgetall", no_single_reads)
+            active = await registry.get_all_containers()
+            everything = await registry.get_all_containers(include_inactive=True)
+            return active, everything, pipelines
+
+        active, everything, pipelines = asyncio.run(run())
+        assert sorted(c["container_id"] for c in active) == ["c1", "c2"]
+        assert len(everything) == 3
+        assert len(pipelines) == 2
+        assert active[0]["capabilities"] == ["agent_runner"]
+        assert active[0]["resources"] == {"cpu_count": 2, "memory_limit": 1024}
+
+    @pytest.mark.unit
+    def test_projection_reads_only_requested_fields(self):
+        async def run():
+            registry = await _registry_with(_registration(1), _registration(2, status="inactive"))
+            projected = await registry.get_all_containers(include_inactive=True, fields=["resources"])
+            active = await registry.get_all_containers(fields=["container_name"])
+            single = await registry.get_container("c1", fields=["status", "metadata"])
+            return projected, active, single
+
+        projected, active, single = asyncio.run(run())
+        assert sorted(projected, key=lambda c: c["container_id"]) == [
+            {"container_id": "c1", "resources": {"cpu_count": 2, "memory_limit": 1024}},
+            {"container_id": "c2", "resources": {"cpu_count": 2, "memory_limit": 1024}},
+        ]
+        # Status is read for filtering but not returned unless requested
+        assert active == [{"container_id": "c1", "container_name": "container-1"}]
+        assert single == {"container_id": "c1", "status": "active", "metadata": {"zone": "a"}}
+
+    @pytest.mark.unit
+    def test_capability_lookup_skips_inactive_and_unknown(self):
+        async def run():
+            registry = await _registry_with(
+                _registration(1, capabilities=("gpu",)),
+                _registration(2, status="inactive", capabilities=("gpu",)),
+                _registration(3, capabilities=("cpu",)),
+            )
+            # A stale index entry whose hash is gone
+            await registry.redis.sadd("containers:capability:gpu", "ghost")
+            return await registry.get_containers_by_capability("gpu")
+
+        containers = asyncio.run(run())
+        assert [c["container_id"] for c in containers] == ["c1"]
+
+
+class TestClusterSummary:
+    """Incrementally maintained cluster aggregates"""
+
+    @staticmethod
+    def _totals(status):
+        return {key: status[key] for key in (
+            "total_containers", "active_containers", "inactive_containers",
+            "total_cpu_cores", "total_memory_bytes", "capability_distribution",
+        )}
+
+    @pytest.mark.unit
+    def test_summary_tracks_lifecycle_without_scanning(self, monkeypatch):
+        async def run():
+            registry = await _registry_with(
+                _registration(1, capabilities=("gpu", "agent_runner")),
+                _registration(2, status="inactive", capabilities=("gpu",)),
+                _registration(3),
+            )
+            await registry.heartbeat("c2", {"resources": {"cpu_count": 0.5, "memory_limit": 512}})
+            await registry.update_container(_registration(3, status="inactive", capabilities=("cpu",)))
+            await registry.deregister_container("c1")
+            assert await registry.heartbeat("missing") is False
+
+            async def no_scan(*args, **kwargs):
+                raise AssertionError("get_cluster_status scanned containers")
+
+            monkeypatch.setattr(registry, "iter_containers", no_scan)
+            incremental = await registry.get_cluster_status()
+            monkeypatch.undo()
+            await registry.reconcile()
+            return incremental, await registry.get_cluster_status()
+
+        incremental, rebuilt = asyncio.run(run())
+        assert self._totals(incremental) == {
+            "total_containers": 2,
+            "active_containers": 1,
+            "inactive_containers": 1,
+            "total_cpu_cores": 0.5,
+            "total_memory_bytes": 512,
+            "capability_distribution": {"gpu": 1},
+        }
+        assert self._totals(rebuilt) == self._totals(incremental)
+
+    @pytest.mark.unit
+    def test_concurrent_heartbeats_do_not_double_count(self):
+        async def run():
+            registry = await _registry_with(*(_registration(i, status="inactive") for i in range(5)))
+            await asyncio.gather(*(registry.heartbeat(f"c{i % 5}") for i in range(25)))
+            return await registry.get_cluster_status()
+
+        status = asyncio.run(run())
+        assert status["active_containers"] == 5
+        assert status["total_cpu_cores"] == 10
+        assert status["capability_distribution"] == {"agent_runner": 5}
+
+    @pytest.mark.unit
+    def test_reconcile_corrects_drift(self):
+        async def run():
+            registry = await _registry_with(_registration(1), _registration(2))
+            await registry.redis.hset(registry.SUMMARY_KEY, "active_containers", 40)
+            await registry.redis.hset(registry.SUMMARY_CAPABILITIES_KEY, "stale", 3)
+            await registry.reconcile()
+            return await registry.get_cluster_status()
+
+        status = asyncio.run(run())
+        assert status["active_containers"] == 2
+        assert status["capability_distribution"] == {"agent_runner": 2}
+
+
+class TestSecondaryIndexes:
+    """Status/host sets, sorted indexes and the query API built on them"""
+
+    @staticmethod
+    def _sized(i, host, health, memory_usage, status="active", capabilities=("agent_runner",)):
+        registration = _registration(i, status=status, capabilities=capabilities)
+        registration.host_address = host
+        registration.health_score = health
+        registration.resources = {"cpu_count": 2, "memory_limit": 1000, "memory_usage": memory_usage}
+        return registration
+
+    @pytest.mark.unit
+    def test_query_combines_sets_and_ranges(self, monkeypatch):
+        async def run():
+            registry = await _registry_with(
+                self._sized(1, "host-a", 90, memory_usage=800, capabilities=("gpu",)),
+                self._sized(2, "host-a", 80, memory_usage=100, capabilities=("gpu",)),
+                self._sized(3, "host-b", 95, memory_usage=300, capabilities=("gpu",)),
+                self._sized(4, "host-b", 60, memory_usage=0, capabilities=("gpu",)),
+                self._sized(5, "host-b", 99, memory_usage=0, status="inactive", capabilities=("gpu",)),
+                self._sized(6, "host-a", 99, memory_usage=0, capabilities=("cpu",)),
+            )
+
+            async def no_scan(*args, **kwargs):
+                raise AssertionError("query fell back to a full scan")
+
+            monkeypatch.setattr(registry, "get_all_containers", no_scan)
+            by_memory = await registry.query_containers(
+                capabilities=["gpu"], min_health=70, sort_by="free_memory", fields=["host_address"],
+            )
+            on_host_a = await registry.query_containers(host="host-a", sort_by="health_score", descending=False)
+            top = await registry.query_containers(status=None, sort_by="health_score", limit=2)
+            with pytest.raises(ValueError):
+                await registry.query_containers(sort_by="cpu")
+            return by_memory, on_host_a, top
+
+        by_memory, on_host_a, top = asyncio.run(run())
+        assert by_memory == [
+            {"container_id": "c2", "host_address": "host-a"},
+            {"container_id": "c3", "host_address": "host-b"},
+            {"container_id": "c1", "host_address": "host-a"},
+        ]
+        assert [c["container_id"] for c in on_host_a] == ["c2", "c1", "c6"]
+        assert [c["container_id"] for c in top] == ["c5", "c6"]
+
+    @pytest.mark.unit
+    def test_indexes_follow_heartbeat_update_and_deregister(self):
+        async def run():
+            registry = await _registry_with(self._sized(1, "host-a", 50, memory_usage=0, status="inactive"))
+            before = await registry.query_containers(min_health=70)
+            await registry.heartbeat("c1", {"health_score": 90})
+            after_heartbeat = await registry.query_containers(min_health=70, fields=["status"])
+            moved = self._sized(1, "host-b", 90, memory_usage=0)
+            await registry.update_container(moved)
+            on_old_host = await registry.query_containers(host="host-a")
+            on_new_host = await registry.query_containers(host="host-b", fields=[])
+            await registry.deregister_container("c1")
+            leftovers = [
+                await registry.redis.zcard(key) for key in registry.ZSET_INDEXES
+            ] + [await registry.redis.scard("containers:status:active"), await registry.redis.scard("containers:host:host-b")]
+            return before, after_heartbeat, on_old_host, on_new_host, leftovers
+
+        before, after_heartbeat, on_old_host, on_new_host, leftovers = asyncio.run(run())
+        assert before == []
+        assert after_heartbeat == [{"container_id": "c1", "status": "active"}]
+        assert on_old_host == []
+        assert on_new_host == [{"container_id": "c1"}]
+        assert leftovers == [0] * 6
+
+    @pytest.mark.unit
+    def test_reconcile_backfills_missing_indexes(self):
+        async def run():
+            registry = await _registry_with(self._sized(1, "host-a", 90, memory_usage=0), self._sized(2, "host-b", 40, memory_usage=0))
+            index_keys = [key async for key in registry.redis.scan_iter(match="containers:status:*")]
+            index_keys += [key async for key in registry.redis.scan_iter(match="containers:host:*")]
+            await registry.redis.delete(*index_keys, *registry.ZSET_INDEXES)
+            empty = await registry.query_containers(min_health=0)
+            await registry.reconcile()
+            return empty, await registry.query_containers(min_health=50, host="host-a")
+
+        empty, healthy = asyncio.run(run())
+        assert empty == []
+        assert [c["container_id"] for c in healthy] == ["c1"]
+
+    @pytest.mark.unit
+    def test_reconcile_retries_instead_of_overwriting_concurrent_write(self, monkeypatch):
+        async def run():
+            registry = await _registry_with(_registration(1))
+            scan = registry.iter_containers
+            scans = []
+
+            async def racing_scan(*args, **kwargs):
+                async for container in scan(*args, **kwargs):
+                    yield container
+                scans.append(1)
+                if len(scans) == 1:
+                    # Registered after the scan read it, before the rebuild is written
+                    await registry.register_container(_registration(2))
+
+            monkeypatch.setattr(registry, "iter_containers", racing_scan)
+            await registry.reconcile()
+            deadline = await registry.redis.zscore(registry.DEADLINE_INDEX_KEY, "c2")
+            active = await registry.redis.smembers("containers:status:active")
+            return len(scans), deadline, active, await registry.get_cluster_status()
+
+        scans, deadline, active, status = asyncio.run(run())
+        assert scans == 2
+        assert deadline is not None
+        assert active == {b"c1", b"c2"}
+        assert status["active_containers"] == 2
+
+
+class TestHeartbeatDeadlines:
+    """Reaping through the heartbeat-deadline sorted set"""
+
+    @pytest.mark.unit
+    def test_cleanup_reaps_only_expired_without_scanning(self, monkeypatch):
+        async def run():
+            stale = _registration(1)
+            stale.last_heartbeat = (datetime.utcnow() - timedelta(minutes=5)).isoformat()
+            registry = await _registry_with(stale, _registration(2))
+
+            async def no_scan(*args, **kwargs):
+                raise AssertionError("cleanup scanned every container")
+
+            monkeypatch.setattr(registry, "iter_containers", no_scan)
+            # A deadline left behind by a container whose hash is already gone
+            await registry.redis.zadd(registry.DEADLINE_INDEX_KEY, {"ghost": 0})
+            await registry._cleanup_inactive_containers()
+            monkeypatch.undo()
+            remaining = await registry.get_all_containers(include_inactive=True, fields=[])
+            deadlines = await registry.redis.zrange(registry.DEADLINE_INDEX_KEY, 0, -1)
+            archived = await registry.redis.hget("container:archive:c1", "deregister_reason")
+            return remaining, deadlines, archived
+
+        remaining, deadlines, archived = asyncio.run(run())
+        assert remaining == [{"container_id": "c2"}]
+        assert deadlines == [b"c2"]
+        assert archived == b"heartbeat_timeout"
+
+    @pytest.mark.unit
+    def test_cleanup_pages_past_containers_that_fail_to_deregister(self, monkeypatch):
+        async def run():
+            stale = []
+            for i in range(5):
+                registration = _registration(i)
+                registration.last_heartbeat = (datetime.utcnow() - timedelta(minutes=5)).isoformat()
+                stale.append(registration)
+            registry = await _registry_with(*stale)
+            registry.REAP_BATCH_SIZE = 2
+            attempts = []
+
+            async def failing_deregister(container_id, **kwargs):
+                attempts.append(container_id)
+                return False
+
+            monkeypatch.setattr(registry, "deregister_container", failing_deregister)
+            await asyncio.wait_for(registry._cleanup_inactive_containers(), timeout=2)
+            return attempts
+
+        assert sorted(asyncio.run(run())) == [f"c{i}" for i in range(5)]
+
+    @pytest.mark.unit
+    def test_heartbeat_pushes_deadline_and_wins_race_with_reaper(self):
+        async def run():
+            stale = _registration(1)
+            stale.last_heartbeat = (datetime.utcnow() - timedelta(minutes=5)).isoformat()
+            registry = await _registry_with(stale)
+            expired_at = time.time()
+            before = await registry.redis.zscore(registry.DEADLINE_INDEX_KEY, "c1")
+            # The reaper saw c1 as expired, but a heartbeat lands before it deregisters
+            await registry.heartbeat("c1")
+            after = await registry.redis.zscore(registry.DEADLINE_INDEX_KEY, "c1")
+            reaped = await registry.deregister_container("c1", reason="heartbeat_timeout", expired_before=expired_at)
+            return before, after, reaped, await registry.get_container("c1", fields=["status"])
+
+        before, after, reaped, container = asyncio.run(run())
+        assert before < time.time() < after
+        assert after == pytest.approx(time.time() + 60, abs=5)
+        assert reaped is False
+        assert container == {"container_id": "c1", "status": "active"}
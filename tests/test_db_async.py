@@ -0,0 +1,119 @@
+"""
+Async Cluster Database Tests
+
+Tests for the async cluster tracking helpers against an in-memory SQLite
+database.
+"""
+import pytest
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Add the app to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set up test environment variables
+os.environ.update({
+    "JWT_SECRET": "test-jwt-secret-32-chars-minimum-for-testing",
+    "ADMIN_PASSWORD": "test-admin-password-123",
+    "ENVIRONMENT": "test",
+})
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.db_models import Base, ClusterRegistration
+from app.db_async import (
+    get_active_clusters,
+    mark_cluster_inactive,
+    register_cluster,
+    to_async_url,
+    update_heartbeat,
+)
+
+
+async def _sessions():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+
+class TestClusterRegistration:
+    """register_cluster is a single upsert"""
+
+    @pytest.mark.unit
+    def test_reregistration_updates_connection_info_only(self):
+        async def run():
+            sessions = await _sessions()
+            async with sessions() as db:
+                first = await register_cluster(
+                    db, "c1", "cluster-one", "agent-1", "10.0.0.1", 8000, capabilities='["gpu"]'
+                )
+                await mark_cluster_inactive(db, "c1")
+                second = await register_cluster(db, "c1", "renamed", "agent-2", "10.0.0.2", 9000)
+                return first, second
+
+        first, second = asyncio.run(run())
+        assert second.id == first.id
+        assert (second.cluster_name, second.agent_id, second.registered_at) == ("cluster-one", "agent-1", first.registered_at)
+        assert (second.host_address, second.api_port, second.is_active) == ("10.0.0.2", 9000, True)
+        assert second.capabilities == '["gpu"]'
+
+    @pytest.mark.unit
+    def test_concurrent_registrations_of_one_cluster(self):
+        async def run():
+            sessions = await _sessions()
+
+            async def register(port):
+                async with sessions() as db:
+                    return await register_cluster(db, "c1", "cluster-one", "agent-1", "10.0.0.1", port)
+
+            clusters = await asyncio.gather(*(register(8000 + i) for i in range(10)))
+            async with sessions() as db:
+                return {c.id for c in clusters}, await get_active_clusters(db)
+
+        ids, active = asyncio.run(run())
+        assert len(ids) == 1
+        assert [c.container_id for c in active] == ["c1"]
+
+
+class TestClusterHeartbeats:
+    """Heartbeats, activity window and deactivation"""
+
+    @pytest.mark.unit
+    def test_heartbeat_and_activity_window(self):
+        async def run():
+            sessions = await _sessions()
+            async with sessions() as db:
+                await register_cluster(db, "fresh", "fresh", "a", "10.0.0.1", 8000)
+                await register_cluster(db, "stale", "stale", "b", "10.0.0.2", 8000)
+                await register_cluster(db, "gone", "gone", "c", "10.0.0.3", 8000)
+                await db.execute(
+                    update(ClusterRegistration)
+                    .where(ClusterRegistration.container_id == "stale")
+                    .values(last_heartbeat=datetime.utcnow() - timedelta(minutes=5))
+                )
+                await db.commit()
+                before = sorted(c.container_id for c in await get_active_clusters(db))
+                revived = await update_heartbeat(db, "stale")
+                unknown = await update_heartbeat(db, "missing")
+                deactivated = await mark_cluster_inactive(db, "gone")
+                after = sorted(c.container_id for c in await get_active_clusters(db))
+                return before, revived, unknown, deactivated, after
+
+        before, revived, unknown, deactivated, after = asyncio.run(run())
+        assert before == ["fresh", "gone"]
+        assert (revived, unknown, deactivated) == (True, False, True)
+        assert after == ["fresh", "stale"]
+
+    @pytest.mark.unit
+    def test_async_urls(self):
+        assert to_async_url("sqlite:///./central-manager.db") == "sqlite+aiosqlite:///./central-manager.db"
+        assert to_async_url("postgresql://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+        assert to_async_url("postgresql+asyncpg://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
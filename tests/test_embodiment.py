@@ -0,0 +1,496 @@
+"""
+Embodiment Pipeline Tests
+
+Tests for the embodiment command bus, dispatcher and registry using
+in-memory fakes instead of a live Redis or agent endpoint.
+"""
+import pytest
+import asyncio
+import json
+import os
+import sys
+import time
+
+# Add the app to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set up test environment variables
+os.environ.update({
+    "JWT_SECRET": "test-jwt-secret-32-chars-minimum-for-testing",
+    "ADMIN_PASSWORD": "test-admin-password-123",
+    "ENVIRONMENT": "test",
+    "REDIS_URL": "redis://localhost:6379",
+})
+
+from app.core.embodiment import command_bus as command_bus_module
+from app.core.embodiment.command_bus import CommandBus, EmbodimentCommand
+from app.core.embodiment.dispatcher import CommandDispatcher
+from app.core.embodiment.transports import StreamTransport
+from app.core.embodiment import registry as registry_module
+from app.core.embodiment.registry import EmbodiedAgent, EmbodimentRegistry
+from app.core.embodiment.autonomy import AutonomyController
+from app.core.embodiment.health_probe import EndpointHealthProber, ProbeResult
+
+
+class FakeBus:
+    """Minimal CommandBus stand-in recording deliveries"""
+
+    def __init__(self, batches, delay=0.0):
+        self.batches = list(batches)
+        self.delay = delay
+        self.processed = []
+        self.active = {}
+        self.peak = {}
+
+    async def pop_batch(self, count):
+        return self.batches.pop(0) if self.batches else []
+
+    async def process(self, data):
+        agent = data["agent_id"]
+        self.active[agent] = self.active.get(agent, 0) + 1
+        self.peak[agent] = max(self.peak.get(agent, 0), self.active[agent])
+        await asyncio.sleep(self.delay)
+        self.active[agent] -= 1
+        self.processed.append(data["correlation_id"])
+        if data.get("deadline", float("inf")) < time.time():
+            return {"success": False, "error": "expired"}
+        return {"success": True}
+
+    async def reconcile_pending(self):
+        return {}
+
+    async def aclose(self):
+        pass
+
+
+class FakePubSub:
+    """Pub/sub stand-in fed by FakeRedis.publish"""
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    async def subscribe(self, *channels):
+        pass
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def close(self):
+        pass
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    async def execute(self, raise_on_error=True):
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+class FakeRedis:
+    """Tiny in-memory subset of redis.asyncio used by the embodiment registry"""
+
+    def __init__(self):
+        self.kv = {}
+        self.sets = {}
+        self.calls = []
+        self.channel = asyncio.Queue()
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.kv.pop(key, None)
+
+    async def hset(self, key, mapping):
+        self.kv.setdefault(key, {}).update({k.encode(): v.encode() for k, v in mapping.items()})
+
+    async def hget(self, key, field):
+        return self.kv.get(key, {}).get(field.encode())
+
+    async def hgetall(self, key):
+        self.calls.append("hgetall")
+        return dict(self.kv.get(key, {}))
+
+    async def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(m.encode() for m in members)
+
+    async def smembers(self, key):
+        self.calls.append("smembers")
+        return set(self.sets.get(key, set()))
+
+    async def publish(self, channel, message):
+        await self.channel.put({"type": "message", "data": message})
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def pubsub(self):
+        return FakePubSub(self.channel)
+
+
+def _cmd(cid, agent="a1", deadline=None):
+    return {
+        "agent_id": agent,
+        "action": "speak",
+        "payload": {},
+        "correlation_id": cid,
+        "deadline": deadline if deadline is not None else time.time() + 60,
+    }
+
+
+class TestCommandBus:
+    """Test priority queue key layout"""
+
+    @pytest.mark.unit
+    def test_priority_is_clamped_to_known_queues(self):
+        bus = CommandBus()
+        assert bus.queue_key(0) == bus.queue_key(1)
+        assert bus.queue_key(99) == bus.queue_key(10)
+        assert bus.queue_keys()[0] == bus.queue_key(1)
+        assert len(bus.queue_keys()) == 10
+
+    @pytest.mark.unit
+    def test_stream_transport_uses_separate_keys(self):
+        assert CommandBus(transport="stream").queue_key(3) != CommandBus().queue_key(3)
+        with pytest.raises(ValueError):
+            CommandBus(transport="carrier-pigeon")
+
+    @pytest.mark.unit
+    def test_stream_entry_decoding_keeps_ack_handle(self):
+        transport = StreamTransport(consumer="test")
+        data = transport._decode(b"embodiment:commands:stream:p1", b"1-0", {b"data": b'{"agent_id": "a1"}'})
+        assert data["agent_id"] == "a1"
+        assert data["_stream"] == "embodiment:commands:stream:p1"
+        assert data["_entry_id"] == "1-0"
+
+    @pytest.mark.unit
+    def test_result_resolves_only_matching_waiter(self):
+        bus = CommandBus()
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            bus._waiters = {"c1": loop.create_future(), "c2": loop.create_future()}
+            bus._resolve("c1", {"success": True})
+            bus._resolve("c1", {"success": False})  # duplicate notice is ignored
+            bus._resolve("unknown", {"success": True})
+            return bus._waiters
+
+        waiters = asyncio.run(run())
+        assert waiters["c1"].result() == {"success": True}
+        assert not waiters["c2"].done()
+
+
+class TestPendingReconciliation:
+    """Test that per-agent pending counters recover from lost commands"""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("transport", ["sorted_set", "stream"])
+    def test_lost_commands_release_their_queue_slots(self, monkeypatch, transport):
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        fake = fakeredis.FakeAsyncRedis()
+
+        async def get_fake_redis():
+            return fake
+
+        monkeypatch.setattr(command_bus_module, "get_redis", get_fake_redis)
+        bus = CommandBus(transport=transport, max_queue_depth=3)
+
+        def speak():
+            return EmbodimentCommand(agent_id="a1", action="speak", payload={})
+
+        async def run():
+            await fake.flushdb()
+            await bus.enqueue_many([speak() for _ in range(3)])
+            full = await bus.enqueue_many([speak()])
+            inflight = (await bus.pop_batch(1))[0]
+            # Lose one queued command without it ever reaching _finish
+            if transport == "stream":
+                newest = await fake.xrevrange(bus.queue_key(5), count=1)
+                await fake.xdel(bus.queue_key(5), newest[0][0])
+            else:
+                await fake.zpopmin(bus.queue_key(5), 1)
+            reconciled = await bus.reconcile_pending()
+            await bus._finish(fake, inflight, {"success": True}, "delivered")
+            after_finish = await bus.pending_counts(["a1"])
+            admitted = await bus.enqueue_many([speak()])
+            return full, reconciled, after_finish, admitted
+
+        full, reconciled, after_finish, admitted = asyncio.run(run())
+        assert full == [None]
+        assert reconciled == {"a1": 2}
+        assert after_finish == {"a1": 1}
+        assert admitted[0] is not None
+
+
+class TestCommandDispatcher:
+    """Test batched, per-agent bounded delivery"""
+
+    @pytest.mark.unit
+    def test_batch_is_delivered_with_per_agent_bound(self):
+        batch = [_cmd(f"c{i}", agent="a1") for i in range(6)] + [_cmd("b0", agent="a2")]
+        bus = FakeBus([batch], delay=0.01)
+        dispatcher = CommandDispatcher(bus, workers=1, max_inflight_per_agent=2, idle_sleep=0.01)
+
+        async def run():
+            await dispatcher.start()
+            await asyncio.sleep(0.2)
+            await dispatcher.stop()
+
+        asyncio.run(run())
+        assert len(bus.processed) == 7
+        assert bus.peak["a1"] == 2
+        assert dispatcher.stats["delivered"] == 7
+        # Idle agents leave no semaphore behind
+        assert dispatcher._agent_slots == {} and dispatcher._agent_users == {}
+
+    @pytest.mark.unit
+    def test_expired_commands_are_counted(self):
+        bus = FakeBus([[_cmd("old", deadline=time.time() - 1)]])
+        dispatcher = CommandDispatcher(bus, workers=1, idle_sleep=0.01)
+
+        async def run():
+            await dispatcher.start()
+            await asyncio.sleep(0.1)
+            await dispatcher.stop()
+
+        asyncio.run(run())
+        assert dispatcher.stats["expired"] == 1
+
+
+class TestEmbodimentRegistry:
+    """Test the write-through registry cache"""
+
+    @pytest.mark.unit
+    def test_reads_are_served_from_memory_after_warmup(self, monkeypatch):
+        fake = FakeRedis()
+
+        async def get_fake_redis():
+            return fake
+
+        monkeypatch.setattr(registry_module, "get_redis", get_fake_redis)
+        registry = EmbodimentRegistry()
+
+        async def run():
+            for i in range(3):
+                await registry.register(EmbodiedAgent(agent_id=f"a{i}", name=f"a{i}", endpoint="http://x", capabilities=[]))
+            first = await registry.list_agents()
+            fake.calls.clear()
+            second = await registry.list_agents()
+            agent = await registry.get("a1")
+            await registry.aclose()
+            return first, second, agent
+
+        first, second, agent = asyncio.run(run())
+        assert [a["agent_id"] for a in first] == ["a0", "a1", "a2"]
+        assert second == first
+        assert agent["agent_id"] == "a1"
+        assert fake.calls == []
+
+    @pytest.mark.unit
+    def test_remote_invalidation_refetches_in_one_pipeline(self, monkeypatch):
+        fake = FakeRedis()
+
+        async def get_fake_redis():
+            return fake
+
+        monkeypatch.setattr(registry_module, "get_redis", get_fake_redis)
+        registry = EmbodimentRegistry()
+
+        async def run():
+            await registry.register(EmbodiedAgent(agent_id="a1", name="old", endpoint="http://x", capabilities=[]))
+            await registry.list_agents()
+            # Another replica rewrites the record and announces it
+            await fake.hset("embodiment:agent:a1", {"agent_id": '"a1"', "name": '"new"', "endpoint": '"http://x"'})
+            await fake.publish(registry.INVALIDATION_CHANNEL, '{"agent_id": "a1", "origin": "other"}')
+            await asyncio.sleep(0.01)
+            fake.calls.clear()
+            agents = await registry.list_agents()
+            await registry.aclose()
+            return agents
+
+        agents = asyncio.run(run())
+        assert agents[0]["name"] == "new"
+        assert fake.calls == ["hgetall"]
+
+    @pytest.mark.unit
+    def test_legacy_string_record_is_migrated_on_heartbeat(self, monkeypatch):
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        fake = fakeredis.FakeAsyncRedis()
+
+        async def get_fake_redis():
+            return fake
+
+        monkeypatch.setattr(registry_module, "get_redis", get_fake_redis)
+        registry = EmbodimentRegistry()
+
+        async def run():
+            await fake.flushdb()
+            await registry.register(EmbodiedAgent(agent_id="a1", name="a1", endpoint="http://x", capabilities=[]))
+            # A record in the old JSON string layout, already listed in the index
+            legacy = {"agent_id": "old", "name": "old", "endpoint": "http://y", "capabilities": [], "metadata": {"k": 1}}
+            await fake.set("embodiment:agent:old", json.dumps(legacy))
+            await fake.sadd(registry.INDEX_KEY, "old")
+            results = await registry.heartbeat_many([{"agent_id": "a1"}, {"agent_id": "old"}, {"agent_id": "ghost"}])
+            key_type = await fake.type("embodiment:agent:old")
+            record = await registry.get("old")
+            return results, key_type, record
+
+        results, key_type, record = asyncio.run(run())
+        assert results == {"a1": True, "old": True, "ghost": False}
+        assert key_type == b"hash"
+        assert record["status"] == "online" and record["metadata"] == {"k": 1}
+
+    @pytest.mark.unit
+    def test_hash_layout_round_trips_and_patches_metadata(self):
+        registry = EmbodimentRegistry()
+        record = {"agent_id": "a1", "capabilities": [], "orchestrator_id": None, "metadata": {"type": "vtuber"}}
+        encoded = registry._encode(record)
+        assert encoded["metadata.type"] == '"vtuber"'
+        decoded = registry._decode({k.encode(): v.encode() for k, v in encoded.items()})
+        assert decoded == record
+
+        registry._cache["a1"] = decoded
+        registry._apply_patch("a1", {"status": "online", "metadata.mood": "happy"})
+        assert registry._cache["a1"]["status"] == "online"
+        assert registry._cache["a1"]["metadata"] == {"type": "vtuber", "mood": "happy"}
+
+
+class CountingProber(EndpointHealthProber):
+    """Prober whose probes are slow, counted and always healthy"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.probes = 0
+
+    async def _probe(self, url):
+        self.probes += 1
+        await asyncio.sleep(0.05)
+        return ProbeResult(url=url, ok=True, checked_at=time.time())
+
+
+class TestEndpointHealthProber:
+    """Test stale-while-revalidate probe caching"""
+
+    @pytest.mark.unit
+    def test_concurrent_first_requests_share_one_probe(self):
+        prober = CountingProber()
+
+        async def run():
+            return await asyncio.gather(*(prober.get("http://o1/health") for _ in range(5)))
+
+        results = asyncio.run(run())
+        assert all(r.ok for r in results)
+        assert prober.probes == 1
+
+    @pytest.mark.unit
+    def test_stale_result_is_served_while_refreshing(self):
+        prober = CountingProber(ttl=10.0)
+        stale = ProbeResult(url="http://o1/health", ok=False, checked_at=time.time() - 60)
+        prober._results[stale.url] = stale
+
+        async def run():
+            started = time.perf_counter()
+            first = await prober.get(stale.url)
+            elapsed = time.perf_counter() - started
+            await asyncio.sleep(0.1)
+            second = await prober.get(stale.url)
+            return first, elapsed, second
+
+        first, elapsed, second = asyncio.run(run())
+        assert first is stale and elapsed < 0.05
+        assert second.ok and prober.probes == 1
+
+
+class RecordingBus:
+    """CommandBus stand-in recording enqueue batches"""
+
+    def __init__(self, pending=None):
+        self.batches = []
+        self.pending = pending or {}
+
+    async def enqueue_many(self, cmds):
+        self.batches.append([cmd.agent_id for cmd in cmds])
+        return []
+
+    async def pending_counts(self, agent_ids):
+        return {agent_id: self.pending.get(agent_id, 0) for agent_id in agent_ids}
+
+
+class TestAutonomyController:
+    """Test the single-task autonomy scheduler"""
+
+    @pytest.mark.unit
+    def test_policies_fire_in_batches_and_restart_is_idempotent(self):
+        bus = RecordingBus()
+        controller = AutonomyController(bus)
+
+        async def run():
+            for i in range(50):
+                await controller.start(f"a{i}", {"interval_seconds": 0.1, "jitter": 0})
+            await controller.start("a0", {"interval_seconds": 0.1, "jitter": 0})  # restart must not duplicate
+            await controller.stop("a1")
+            await controller.stop("a1")
+            await asyncio.sleep(0.25)
+            metrics = controller.metrics()
+            await controller.shutdown()
+            return metrics
+
+        metrics = asyncio.run(run())
+        fired = [agent for batch in bus.batches for agent in batch]
+        assert "a1" not in fired
+        assert fired.count("a0") == fired.count("a2")
+        assert len(bus.batches) < len(fired)
+        assert metrics["a2"]["fires"] >= 1
+
+    @pytest.mark.unit
+    def test_agents_with_undelivered_commands_are_skipped(self):
+        bus = RecordingBus(pending={"slow": 3})
+        controller = AutonomyController(bus)
+
+        async def run():
+            await controller.start("slow", {"interval_seconds": 0.1, "jitter": 0})
+            await controller.start("fast", {"interval_seconds": 0.1, "jitter": 0})
+            await controller.start("eager", {"interval_seconds": 0.1, "jitter": 0, "skip_if_behind": False})
+            bus.pending["eager"] = 5
+            await asyncio.sleep(0.15)
+            metrics = controller.metrics()
+            await controller.shutdown()
+            return metrics
+
+        metrics = asyncio.run(run())
+        fired = {agent for batch in bus.batches for agent in batch}
+        assert fired == {"fast", "eager"}
+        assert metrics["slow"]["skipped"] >= 1
+        assert metrics["slow"]["fires"] == 0
+        assert metrics["fast"]["fires"] >= 1 and metrics["fast"]["skipped"] == 0
+
+
+class TestCommandBackpressure:
+    """Test dispatch-time dropping of stale and superseded commands"""
+
+    @pytest.mark.unit
+    def test_superseded_and_expired_commands_are_dropped(self):
+        fake = FakeRedis()
+        bus = CommandBus()
+
+        async def run():
+            await fake.hset(bus.LATEST_KEY, {"a1:speak": "newest"})
+            old = {"agent_id": "a1", "action": "speak", "correlation_id": "older", "coalesce": True, "deadline": time.time() + 60}
+            newest = dict(old, correlation_id="newest")
+            plain = dict(old, coalesce=False)
+            expired = dict(newest, deadline=time.time() - 1)
+            return [await bus._drop_reason(fake, d) for d in (old, newest, plain, expired)]
+
+        assert asyncio.run(run()) == ["superseded", None, None, "expired"]
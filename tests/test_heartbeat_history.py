@@ -0,0 +1,147 @@
+"""
+Heartbeat History Tests
+
+Tests for the buffered heartbeat writer and its rollup tiers against an
+in-memory SQLite database (async engine).
+"""
+import pytest
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Add the app to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set up test environment variables
+os.environ.update({
+    "JWT_SECRET": "test-jwt-secret-32-chars-minimum-for-testing",
+    "ADMIN_PASSWORD": "test-admin-password-123",
+    "ENVIRONMENT": "test",
+})
+
+sqlalchemy = pytest.importorskip("sqlalchemy")
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import create_engine, func, inspect, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.db_models import Base, ClusterHeartbeat, ClusterHeartbeatRollup, init_db
+from app.core.orchestration.heartbeat_history import HeartbeatHistory
+
+
+async def _history(**kwargs):
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return HeartbeatHistory(session_factory=async_sessionmaker(engine, expire_on_commit=False), **kwargs)
+
+
+async def _count(history, model, **filters):
+    async with history.session_factory() as session:
+        return await session.scalar(select(func.count()).select_from(model).filter_by(**filters))
+
+
+class TestHeartbeatBuffering:
+    """Heartbeats are buffered and written in batches"""
+
+    @pytest.mark.unit
+    def test_flushes_merge_into_rollup_buckets(self):
+        minute = datetime(2026, 1, 1, 12, 0)
+
+        async def run():
+            history = await _history()
+            history.record("c1", 90, active_agents=2, timestamp=minute + timedelta(seconds=5))
+            history.record("c1", 70, active_agents=4, timestamp=minute + timedelta(seconds=35))
+            buffered = history.get_stats()["buffered"]
+            first = await history.flush()
+            # A later batch landing in the same buckets is merged, not duplicated
+            history.record("c1", 50, active_agents=1, timestamp=minute + timedelta(seconds=50))
+            history.record("c1", 100, timestamp=minute + timedelta(minutes=1, seconds=10))
+            second = await history.flush()
+            counts = (
+                await _count(history, ClusterHeartbeat),
+                await _count(history, ClusterHeartbeatRollup, resolution=60),
+                await _count(history, ClusterHeartbeatRollup, resolution=3600),
+            )
+            async with history.session_factory() as session:
+                bucket = (await session.scalars(select(ClusterHeartbeatRollup).filter_by(resolution=60, bucket_start=minute))).one()
+                hour = (await session.scalars(select(ClusterHeartbeatRollup).filter_by(resolution=3600))).one()
+            return buffered, first, second, counts, bucket, hour
+
+        buffered, first, second, counts, bucket, hour = asyncio.run(run())
+        assert (buffered, first, second) == (2, 2, 2)
+        assert counts == (4, 2, 1)
+        assert (bucket.samples, bucket.health_score_sum, bucket.health_score_min, bucket.health_score_max) == (3, 210, 50, 90)
+        assert bucket.active_agents_max == 4
+        assert (hour.samples, hour.health_score_min, hour.health_score_max) == (4, 50, 100)
+
+    @pytest.mark.unit
+    def test_failed_flush_keeps_heartbeats_buffered(self):
+        async def broken_write(batch):
+            raise RuntimeError("database is locked")
+
+        async def run():
+            history = await _history(max_buffer=3)
+            for score in (10, 20, 30):
+                history.record("c1", score)
+            history._write_batch = broken_write
+            written = await history.flush()
+            history.record("c1", 40)
+            return history, written
+
+        history, written = asyncio.run(run())
+        assert written == 0
+        assert [hb["health_score"] for hb in history._buffer] == [20, 30, 40]
+        assert history.dropped == 1
+
+
+class TestHeartbeatQueries:
+    """History queries pick a tier and retention prunes each tier"""
+
+    @pytest.mark.unit
+    def test_query_resolution_and_retention(self):
+        now = datetime.utcnow()
+
+        async def run():
+            history = await _history()
+            history.record("c1", 80, timestamp=now - timedelta(minutes=10))
+            history.record("c1", 60, timestamp=now - timedelta(days=3))
+            history.record("c2", 99, timestamp=now - timedelta(minutes=5))
+            await history.flush()
+            recent = await history.query("c1", since=now - timedelta(hours=1))
+            week = await history.query("c1", since=now - timedelta(days=5))
+            month = await history.query("c1", since=now - timedelta(days=30))
+            pruned = await history.prune()
+            after_prune = await history.query("c1", since=now - timedelta(days=5), resolution="raw")
+            with pytest.raises(ValueError):
+                await history.query("c1", since=now, resolution="5m")
+            return recent, week, month, pruned, after_prune
+
+        recent, week, month, pruned, after_prune = asyncio.run(run())
+        assert recent["resolution"] == "raw"
+        assert [p["health_score_avg"] for p in recent["points"]] == [80]
+        assert week["resolution"] == "1m"
+        assert [p["health_score_avg"] for p in week["points"]] == [60, 80]
+        assert month["resolution"] == "1h"
+        assert pruned["raw"] == 1
+        assert [p["health_score_avg"] for p in after_prune["points"]] == [80]
+
+
+class TestSchemaUpgrade:
+    """init_db adds indexes that create_all skips on existing tables"""
+
+    @pytest.mark.unit
+    def test_history_index_is_added_to_existing_table(self):
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+        with engine.begin() as conn:
+            # Heartbeat table as created before the composite index existed
+            conn.execute(text(
+                "CREATE TABLE cluster_heartbeats (id INTEGER PRIMARY KEY, container_id VARCHAR NOT NULL, "
+                "timestamp DATETIME, health_score INTEGER, active_agents INTEGER, resources TEXT)"
+            ))
+        init_db(bind=engine)
+        init_db(bind=engine)  # idempotent on every startup
+        indexes = {index["name"] for index in inspect(engine).get_indexes("cluster_heartbeats")}
+        assert "ix_cluster_heartbeats_container_time" in indexes
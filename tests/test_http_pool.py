@@ -0,0 +1,36 @@
+"""
+Shared HTTP Connection Pool Tests
+
+Tests that outbound clients are pooled per origin and released on shutdown.
+"""
+import pytest
+import asyncio
+import os
+import sys
+
+# Add the app to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.infrastructure.network.http_pool import HTTPClientPool
+
+
+class TestHTTPClientPool:
+    """Test per-origin client reuse"""
+
+    @pytest.mark.unit
+    def test_clients_are_shared_per_origin(self):
+        pool = HTTPClientPool()
+        a = pool.client("http://agent-1:8080/commands")
+        b = pool.client("HTTP://Agent-1:8080/health")
+        c = pool.client("http://agent-1:9090/commands")
+        assert a is b
+        assert a is not c
+        assert pool.stats()["origins"] == ["http://agent-1:8080", "http://agent-1:9090"]
+        asyncio.run(pool.aclose())
+        assert pool.stats()["origins"] == []
+
+    @pytest.mark.unit
+    def test_relative_urls_are_rejected(self):
+        pool = HTTPClientPool()
+        with pytest.raises(ValueError):
+            pool.client("/commands")
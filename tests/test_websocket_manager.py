@@ -0,0 +1,469 @@
+"""
+WebSocket Manager Tests
+
+Tests for broadcast fan-out through per-client send queues, using stub
+sockets that record frames and can be made slow.
+"""
+import pytest
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime
+
+# Add the app to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set up test environment variables
+os.environ.update({
+    "JWT_SECRET": "test-jwt-secret-32-chars-minimum-for-testing",
+    "ADMIN_PASSWORD": "test-admin-password-123",
+    "ENVIRONMENT": "test",
+})
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.infrastructure.messaging import wire_protocol
+from app.infrastructure.messaging.conflation import ConflatedStream
+from app.infrastructure.messaging.websocket_manager import (
+    MessageType,
+    SlowConsumerPolicy,
+    SubscriptionType,
+    WebSocketManager,
+    WebSocketMessage,
+)
+
+
+class StubWebSocket:
+    """Records sent frames; while `blocked` is set, sends wait until it is cleared"""
+
+    def __init__(self, subprotocols=()):
+        self.scope = {"subprotocols": list(subprotocols)}
+        self.frames = []
+        self.raw = []
+        self.closed = False
+        self.blocked = None
+        self.subprotocol = None
+
+    async def accept(self, subprotocol=None):
+        self.subprotocol = subprotocol
+
+    async def send_text(self, text):
+        if self.blocked is not None:
+            await self.blocked.wait()
+        self.raw.append(text)
+        self.frames.append(json.loads(text))
+
+    async def send_bytes(self, data):
+        self.raw.append(data)
+        self.frames.append(wire_protocol.decode(data))
+
+    async def close(self):
+        self.closed = True
+
+    def of_type(self, message_type):
+        return [frame for frame in self.frames if frame["type"] == message_type.value]
+
+
+def _message(n):
+    return WebSocketMessage(
+        type=MessageType.MARKET_DATA,
+        data={"symbol": "AAPL", "price": n},
+        timestamp=datetime.utcnow().isoformat(),
+    )
+
+
+async def _subscribed(manager, count, subscription_type=SubscriptionType.MARKET_DATA):
+    sockets = [StubWebSocket() for _ in range(count)]
+    for websocket in sockets:
+        client_id = await manager.connect_client(websocket)
+        await manager.subscribe_client(client_id, subscription_type)
+    await manager.drain()
+    return sockets
+
+
+async def _replicas(count):
+    server = fakeredis.FakeServer()
+    replicas = []
+    for _ in range(count):
+        manager = WebSocketManager(broker=True)
+        manager.redis = fakeredis.FakeAsyncRedis(server=server)
+        await manager._start_broker()
+        replicas.append(manager)
+    return replicas
+
+
+async def _settle(replicas):
+    await asyncio.sleep(0.1)
+    for manager in replicas:
+        await manager.drain(timeout=1)
+
+
+class TestBroadcastFanOut:
+    """Broadcasts serialize once and are queued per client"""
+
+    @pytest.mark.unit
+    def test_message_is_serialized_once_per_broadcast(self, monkeypatch):
+        async def run():
+            manager = WebSocketManager()
+            sockets = await _subscribed(manager, 20)
+            calls = []
+            serialize = WebSocketManager.serialize_message
+            monkeypatch.setattr(manager, "serialize_message", lambda m: calls.append(m) or serialize(m))
+            await manager.broadcast_to_subscription(SubscriptionType.MARKET_DATA, _message(1))
+            await manager.drain()
+            return sockets, calls, manager.get_statistics()
+
+        sockets, calls, stats = asyncio.run(run())
+        assert len(calls) == 1
+        assert all(ws.of_type(MessageType.MARKET_DATA)[0]["data"]["price"] == 1 for ws in sockets)
+        assert stats["messages_sent"] == 20 * 3  # welcome, subscribe confirmation, broadcast
+
+    @pytest.mark.unit
+    def test_slow_client_does_not_block_broadcast(self):
+        async def run():
+            manager = WebSocketManager(send_queue_size=4)
+            fast, slow = await _subscribed(manager, 2)
+            slow.blocked = asyncio.Event()
+            # The producer is never held up even though one socket never completes a send
+            for n in range(10):
+                await asyncio.wait_for(
+                    manager.broadcast_to_subscription(SubscriptionType.MARKET_DATA, _message(n)), timeout=0.1
+                )
+                await asyncio.sleep(0.001)
+            slow.blocked.set()
+            await manager.drain(timeout=1)
+            return fast, slow, manager.get_statistics()
+
+        fast, slow, stats = asyncio.run(run())
+        assert [f["data"]["price"] for f in fast.of_type(MessageType.MARKET_DATA)] == list(range(10))
+        # The stuck client keeps the frame in flight plus the newest frames that fit its queue
+        assert [f["data"]["price"] for f in slow.of_type(MessageType.MARKET_DATA)] == [0, 6, 7, 8, 9]
+        assert stats["messages_dropped"] == 5
+
+    @pytest.mark.unit
+    def test_disconnect_policy_drops_slow_client(self):
+        async def run():
+            manager = WebSocketManager(send_queue_size=2, slow_consumer_policy=SlowConsumerPolicy.DISCONNECT)
+            fast, slow = await _subscribed(manager, 2)
+            slow.blocked = asyncio.Event()
+            for n in range(5):
+                await manager.broadcast_to_subscription(SubscriptionType.MARKET_DATA, _message(n))
+                await asyncio.sleep(0.001)
+            await manager.drain(timeout=1)
+            return manager, fast, slow
+
+        manager, fast, slow = asyncio.run(run())
+        assert slow.closed and not fast.closed
+        assert len(manager.connections) == 1
+        assert len(manager.subscriptions[SubscriptionType.MARKET_DATA]) == 1
+        assert manager.get_statistics()["slow_consumer_disconnects"] == 1
+        assert len(fast.of_type(MessageType.MARKET_DATA)) == 5
+
+
+class TestBrokerMode:
+    """Broadcasts reach clients on every replica through Redis pub/sub"""
+
+    @pytest.mark.unit
+    def test_broadcast_reaches_subscribers_on_all_replicas(self):
+        async def run():
+            first, second = await _replicas(2)
+            market = await _subscribed(first, 2) + await _subscribed(second, 1)
+            alerts = await _subscribed(second, 1, SubscriptionType.SYSTEM_ALERTS)
+            room_socket = StubWebSocket()
+            room_client = await first.connect_client(room_socket)
+            await first.join_room(room_client, "vtuber-1")
+
+            await first.broadcast_to_subscription(SubscriptionType.MARKET_DATA, _message(42))
+            await second.broadcast_to_room("vtuber-1", _message(7))
+            await _settle([first, second])
+            stats = first.get_statistics(), second.get_statistics()
+            channels = set(first._broker_channels), set(second._broker_channels)
+            for manager in (first, second):
+                await manager.stop()
+            return market, alerts, room_socket, stats, channels
+
+        market, alerts, room_socket, stats, channels = asyncio.run(run())
+        assert all([f["data"]["price"] for f in ws.of_type(MessageType.MARKET_DATA)] == [42] for ws in market)
+        assert alerts[0].of_type(MessageType.MARKET_DATA) == []
+        assert [f["data"]["price"] for f in room_socket.of_type(MessageType.MARKET_DATA)] == [7]
+        # Published once by the producing replica, regardless of how many clients received it
+        assert stats[0]["broker_published"] == 1 and stats[1]["broker_published"] == 1
+        # A replica listens only on the shards its own clients are interested in
+        assert "ws:broadcast:room:vtuber-1" in channels[0]
+        assert "ws:broadcast:room:vtuber-1" not in channels[1]
+        assert "ws:broadcast:sub:system_alerts" in channels[1]
+
+    @pytest.mark.unit
+    def test_presence_is_summed_across_replicas(self):
+        async def run():
+            first, second = await _replicas(2)
+            await _subscribed(first, 2)
+            await _subscribed(second, 3)
+            room_client = await second.connect_client(StubWebSocket())
+            await second.join_room(room_client, "lobby")
+            for manager in (first, second):
+                await manager.publish_presence()
+            presence = await first.get_presence()
+            await second.stop()
+            after_stop = await first.get_presence()
+            await first.stop()
+            return presence, after_stop
+
+        presence, after_stop = asyncio.run(run())
+        assert presence["replicas"] == 2
+        assert presence["connections"] == 6
+        assert presence["subscriptions"] == {"market_data": 5}
+        assert presence["rooms"] == {"lobby": 1}
+        assert (after_stop["replicas"], after_stop["connections"]) == (1, 2)
+
+
+class StubQuoteService:
+    """Quote source whose lookups each take `delay` seconds"""
+
+    def __init__(self, quotes, delay=0.0):
+        self.quotes = quotes
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get_quote(self, symbol):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return dict(self.quotes[symbol])
+
+
+class TestConflatedStreams:
+    """Market data and agent status go out as a snapshot, then merged deltas"""
+
+    @pytest.mark.unit
+    def test_stream_merges_window_and_emits_changed_fields(self):
+        stream = ConflatedStream(volatile_fields=("timestamp",))
+        stream.update("AAPL", {"price": 1, "volume": 10, "timestamp": "t0"})
+        assert stream.drain() == {"AAPL": {"price": 1, "volume": 10, "timestamp": "t0"}}
+
+        # Several updates within one window collapse to the latest value of each field
+        stream.update("AAPL", {"price": 2, "volume": 10, "timestamp": "t1"})
+        stream.update("AAPL", {"price": 3, "volume": 10, "timestamp": "t2"})
+        assert stream.drain() == {"AAPL": {"price": 3, "timestamp": "t2"}}
+
+        # A change that reverts within the window, or only a new timestamp, sends nothing
+        stream.update("AAPL", {"price": 4, "timestamp": "t3"})
+        stream.update("AAPL", {"price": 3, "timestamp": "t4"})
+        assert stream.drain() == {}
+        assert stream.snapshot() == {"AAPL": {"price": 3, "volume": 10, "timestamp": "t4"}}
+
+        stream.remove("AAPL")
+        assert stream.drain() == {"AAPL": None}
+        assert stream.snapshot() == {}
+
+    @pytest.mark.unit
+    def test_market_data_snapshot_then_deltas(self):
+        quotes = {
+            symbol: {"price": 100 + i, "change": 0, "change_percent": 0, "volume": 1000}
+            for i, symbol in enumerate(["AAPL", "GOOGL", "MSFT", "TSLA"])
+        }
+
+        async def run():
+            service = StubQuoteService(quotes, delay=0.05)
+            manager = WebSocketManager(conflation_window=0.01, market_data_service=service)
+            early = (await _subscribed(manager, 1))[0]
+            manager.running = True
+            streamer = asyncio.create_task(manager._market_data_streamer())
+            flusher = asyncio.create_task(manager._conflation_flusher())
+            await asyncio.sleep(0.15)
+
+            # A late subscriber starts from a snapshot of what is already known
+            late = StubWebSocket()
+            client_id = await manager.connect_client(late)
+            await manager.subscribe_client(client_id, SubscriptionType.MARKET_DATA, {"symbols": ["AAPL", "TSLA"]})
+            service.quotes["AAPL"]["price"] = 150
+            await asyncio.sleep(2.2)
+            manager.running = False
+            await asyncio.gather(streamer, flusher)
+            await manager.drain()
+            return service, early, late
+
+        service, early, late = asyncio.run(run())
+        assert service.max_in_flight == 4
+        updates = early.of_type(MessageType.MARKET_DATA)
+        assert all(u["data"]["update"] == "delta" for u in updates)
+        assert sorted(u["data"]["symbol"] for u in updates[:3]) == ["AAPL", "GOOGL", "MSFT"]
+        # The second poll changed one field of one symbol; TSLA only goes to the client that asked for it
+        assert [u["data"] for u in updates[3:]] == [
+            {"symbol": "AAPL", "update": "delta", "price": 150, "timestamp": updates[3]["data"]["timestamp"]}
+        ]
+        late_updates = [(u["data"]["symbol"], u["data"]["update"]) for u in late.of_type(MessageType.MARKET_DATA)]
+        assert late_updates == [("AAPL", "snapshot"), ("AAPL", "delta"), ("TSLA", "delta")]
+
+    @pytest.mark.unit
+    def test_agent_status_only_sends_changes(self, monkeypatch):
+        import app.infrastructure.messaging.websocket_manager as ws_module
+
+        agents = {"a1": {"status": "active", "type": "trader", "message_count": 1}}
+        monkeypatch.setattr(ws_module.agent_manager, "agents", agents)
+
+        async def run():
+            manager = WebSocketManager()
+            watcher = (await _subscribed(manager, 1, SubscriptionType.AGENT_STATUS))[0]
+            for _ in range(3):
+                await manager.broadcast_agent_status("a1", manager._agent_status(agents["a1"]))
+            manager.flush_conflated()
+            agents["a1"]["message_count"] = 2
+            await manager.broadcast_agent_status("a1", manager._agent_status(agents["a1"]))
+            manager.flush_conflated()
+            manager.flush_conflated()
+            manager.agent_stream.remove("a1")
+            manager.flush_conflated()
+            await manager.drain()
+            return watcher
+
+        updates = [u["data"] for u in asyncio.run(run()).of_type(MessageType.AGENT_STATUS)]
+        assert [u["update"] for u in updates] == ["delta", "delta", "removed"]
+        assert updates[0]["status"] == "active"
+        assert updates[1] == {"agent_id": "a1", "update": "delta", "message_count": 2}
+
+    @pytest.mark.unit
+    def test_client_that_dropped_deltas_is_resynced_with_a_snapshot(self):
+        async def run():
+            manager = WebSocketManager(send_queue_size=2)
+            fast, slow = await _subscribed(manager, 2)
+            slow.blocked = asyncio.Event()
+            for price in range(1, 8):
+                await manager.broadcast_market_data("AAPL", {"price": price, "volume": 10})
+                manager.flush_conflated()
+                await asyncio.sleep(0.001)
+            slow.blocked.set()
+            await manager.drain(timeout=1)
+            # The next flush replaces what the slow client lost
+            manager.flush_conflated()
+            await manager.drain(timeout=1)
+            return fast, slow, manager.get_statistics()
+
+        fast, slow, stats = asyncio.run(run())
+        assert [u["data"]["update"] for u in fast.of_type(MessageType.MARKET_DATA)] == ["delta"] * 7
+        last = slow.of_type(MessageType.MARKET_DATA)[-1]["data"]
+        assert last["update"] == "snapshot" and last["price"] == 7 and last["volume"] == 10
+        assert stats["messages_dropped"] > 0
+        assert stats["resyncs"] >= 1
+
+
+class TestWireProtocols:
+    """Clients can negotiate binary frames; JSON stays the default"""
+
+    @pytest.mark.unit
+    def test_negotiation(self):
+        assert wire_protocol.negotiate([]) is None
+        assert wire_protocol.negotiate(["graphql-ws", "json"]) == "json"
+        if wire_protocol.MSGPACK_AVAILABLE:
+            assert wire_protocol.negotiate(["msgpack", "json"]) == "msgpack"
+        else:
+            assert wire_protocol.negotiate(["msgpack", "json"]) == "json"
+
+    @pytest.mark.unit
+    def test_broadcast_encodes_once_per_protocol(self, monkeypatch):
+        pytest.importorskip("msgpack")
+        pytest.importorskip("zstandard")
+        encodes = []
+        encode = wire_protocol.encode
+        monkeypatch.setattr(wire_protocol, "encode", lambda protocol, payload: encodes.append(protocol) or encode(protocol, payload))
+
+        async def run():
+            manager = WebSocketManager()
+            sockets = {
+                name: [StubWebSocket(requested) for _ in range(3)]
+                for name, requested in (("json", ()), ("msgpack", ("msgpack", "json")), ("zstd", ("msgpack+zstd",)))
+            }
+            for group in sockets.values():
+                for websocket in group:
+                    client_id = await manager.connect_client(websocket)
+                    await manager.subscribe_client(client_id, SubscriptionType.PERFORMANCE_METRICS)
+            await manager.drain()
+            encodes.clear()
+            metrics = {f"agent-{i}": {"cpu": 0.5, "memory": 0.25, "status": "healthy"} for i in range(40)}
+            await manager.broadcast_performance_metrics(metrics)
+            await manager.drain()
+            return sockets, metrics, manager.get_statistics()
+
+        sockets, metrics, stats = asyncio.run(run())
+        assert sorted(encodes) == ["msgpack", "msgpack+zstd"]
+        assert stats["protocols"] == {"msgpack+zstd": 3, "msgpack": 3, "json": 3}
+        assert [ws.subprotocol for ws in sockets["json"] + sockets["msgpack"] + sockets["zstd"]] == [None] * 3 + ["msgpack"] * 3 + ["msgpack+zstd"] * 3
+        for group in sockets.values():
+            for websocket in group:
+                assert websocket.of_type(MessageType.PERFORMANCE_METRICS)[0]["data"] == metrics
+        json_frame = sockets["json"][0].raw[-1]
+        zstd_frame = sockets["zstd"][0].raw[-1]
+        assert isinstance(json_frame, str) and isinstance(sockets["msgpack"][0].raw[-1], bytes)
+        assert zstd_frame[:4] == wire_protocol.ZSTD_MAGIC
+        assert len(zstd_frame) < len(json_frame) / 4
+        # Small frames are not compressed
+        assert sockets["zstd"][0].raw[0][:4] != wire_protocol.ZSTD_MAGIC
+
+
+class TestTopicRouting:
+    """Symbol, agent and room indexes follow subscriptions"""
+
+    @pytest.mark.unit
+    def test_each_client_gets_only_its_symbols(self):
+        async def run():
+            manager = WebSocketManager()
+            sockets, clients = [], []
+            for symbols in (["AAPL"], ["AAPL", "TSLA"], None):
+                websocket = StubWebSocket()
+                client_id = await manager.connect_client(websocket)
+                await manager.subscribe_client(client_id, SubscriptionType.MARKET_DATA,
+                                               {"symbols": symbols} if symbols else None)
+                sockets.append(websocket)
+                clients.append(client_id)
+            indexed = {symbol: len(ids) for symbol, ids in manager.symbol_index.items()}
+
+            for symbol in ("AAPL", "TSLA", "MSFT", "NVDA"):
+                await manager.broadcast_market_data(symbol, {"price": 1})
+            manager.flush_conflated()
+            await manager.drain()
+            # Changing options re-indexes; unsubscribing and disconnecting clear the client
+            await manager.subscribe_client(clients[0], SubscriptionType.MARKET_DATA, {"symbols": ["NVDA"]})
+            await manager.unsubscribe_client(clients[1], SubscriptionType.MARKET_DATA)
+            await manager.disconnect_client(clients[2])
+            after = {symbol: sorted(ids) for symbol, ids in manager.symbol_index.items()}
+            await manager.drain()
+            return sockets, clients, indexed, after
+
+        sockets, clients, indexed, after = asyncio.run(run())
+        received = [[(u["data"]["symbol"], u["data"]["update"]) for u in ws.of_type(MessageType.MARKET_DATA)] for ws in sockets]
+        assert indexed == {"AAPL": 3, "TSLA": 1, "GOOGL": 1, "MSFT": 1}
+        # The re-subscribing client gets a snapshot of its new symbol
+        assert received[0] == [("AAPL", "delta"), ("NVDA", "snapshot")]
+        assert received[1] == [("AAPL", "delta"), ("TSLA", "delta")]
+        assert received[2] == [("AAPL", "delta"), ("MSFT", "delta")]
+        assert after == {"NVDA": [clients[0]]}
+
+    @pytest.mark.unit
+    def test_agent_filters_and_rooms(self):
+        async def run():
+            manager = WebSocketManager()
+            one, every = StubWebSocket(), StubWebSocket()
+            one_id = await manager.connect_client(one)
+            every_id = await manager.connect_client(every)
+            await manager.subscribe_client(one_id, SubscriptionType.AGENT_STATUS, {"agent_ids": ["a2"]})
+            await manager.subscribe_client(every_id, SubscriptionType.AGENT_STATUS)
+            for agent_id in ("a1", "a2"):
+                await manager.broadcast_agent_status(agent_id, {"status": "active"})
+            manager.flush_conflated()
+            await manager.drain()
+
+            await manager.join_room(one_id, "lobby")
+            await manager.join_room(one_id, "stage")
+            await manager.join_room(every_id, "stage")
+            await manager.disconnect_client(one_id)
+            await manager.drain()
+            return manager, one, every, every_id
+
+        manager, one, every, every_id = asyncio.run(run())
+        assert [u["data"]["agent_id"] for u in one.of_type(MessageType.AGENT_STATUS)] == ["a2"]
+        assert sorted(u["data"]["agent_id"] for u in every.of_type(MessageType.AGENT_STATUS)) == ["a1", "a2"]
+        assert manager.agent_index == {"*": {every_id}}
+        assert dict(manager.rooms) == {"stage": {every_id}}